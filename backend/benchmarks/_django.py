@@ -0,0 +1,103 @@
+"""
+Shared bootstrap for the scripts in this folder.
+
+Run them from backend/ as modules, e.g. `python -m benchmarks.history_archive`.
+Each run gets a throwaway SQLite database (and archive dir) so the real
+db.sqlite3 is never touched.
+"""
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup():
+    workdir = tempfile.mkdtemp(prefix="enlite-bench-")
+    os.environ["SQLITE_PATH"] = os.path.join(workdir, "bench.sqlite3")
+    os.environ["HISTORY_ARCHIVE_DIR"] = os.path.join(workdir, "archive")
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "energy_backend.settings")
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command("migrate", verbosity=0)
+    # 4xx responses are expected in load tests; keep the output readable.
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+    return workdir
+
+
+def timeit(fn, repeat=5):
+    """Median wall time of `fn()` in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def sqlite_size_bytes():
+    from django.db import connection
+
+    with connection.cursor() as cur:
+        cur.execute("VACUUM")
+        cur.execute("PRAGMA page_count")
+        pages = cur.fetchone()[0]
+        cur.execute("PRAGMA page_size")
+        return pages * cur.fetchone()[0]
+
+
+def seed_history(n_rows, n_users, spread_days):
+    """Creates users and `n_rows` history rows spread over `spread_days`."""
+    import random
+
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+
+    from energy_api.models import PredictionHistory
+    from energy_api.views import DEFAULT_VALUES
+
+    User = get_user_model()
+    users = [
+        User.objects.create_user(username=f"bench{i}", password="x", email=f"bench{i}@example.com")
+        for i in range(n_users)
+    ]
+    types = ["Bungalow", "Detached", "Semi Detached", "Terraced"]
+    rng = random.Random(42)
+
+    batch = []
+    for i in range(n_rows):
+        inputs = {k: str(round(v * rng.uniform(0.8, 1.5), 2)) for k, v in DEFAULT_VALUES.items()}
+        inputs["Building_Type"] = rng.choice(types)
+        energy = rng.uniform(500, 5000)
+        record = PredictionHistory(
+            user=users[i % n_users],
+            building_type=inputs["Building_Type"],
+            total_energy_month_kwh=round(energy, 2),
+            eui_month_kwh_m2=round(energy / 120, 2),
+            performance_category="Moderately High",
+            inputs=inputs,
+            is_deleted_by_user=rng.random() < 0.1,
+        )
+        record.fill_feature_columns()
+        batch.append(record)
+        if len(batch) == 5000:
+            PredictionHistory.objects.bulk_create(batch)
+            batch = []
+    PredictionHistory.objects.bulk_create(batch)
+
+    # auto_now_add ignores explicit values, so spread the dates afterwards.
+    with connection.cursor() as cur:
+        cur.execute(
+            "UPDATE energy_api_predictionhistory "
+            "SET created_at = datetime('now', '-' || (id %% %s) || ' days')",
+            [spread_days],
+        )
+    return users
@@ -0,0 +1,41 @@
+"""
+Cost of drift monitoring on the serving path: per-row observe() and a flush
+of the pending counters, next to one single-row model call for scale.
+
+    python -m benchmarks.drift_overhead --rows 10000
+"""
+import argparse
+import random
+
+from benchmarks._django import setup, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    setup()
+    from energy_api import drift
+    from energy_api.views import DEFAULT_VALUES, get_schema, predict_batch
+
+    schema = get_schema()
+    rng = random.Random(3)
+    rows = []
+    for _ in range(args.rows):
+        data = {k: round(v * rng.uniform(1.0, 1.2), 2) for k, v in DEFAULT_VALUES.items()}
+        data["Building_Type"] = "Detached"
+        rows.append(schema.validate(data)[0])
+
+    drift.monitor.reset()
+    observe_ms = timeit(lambda: [drift.observe_row(schema.features, r) for r in rows], repeat=3)
+    flush_ms = timeit(drift.monitor.flush, repeat=1)
+    predict_ms = timeit(lambda: predict_batch([dict(DEFAULT_VALUES, Building_Type="Detached")]), repeat=5)
+
+    print(f"{'observe_row (us/row)':28}{observe_ms * 1000 / args.rows:>10.1f}")
+    print(f"{'flush (ms, 12 features)':28}{flush_ms:>10.1f}")
+    print(f"{'single-row predict (ms)':28}{predict_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
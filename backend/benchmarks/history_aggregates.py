@@ -0,0 +1,59 @@
+"""
+Aggregate query cost: parsing `inputs` JSON in Python vs SQL over the typed
+feature columns. Example query: mean EUI per wall insulation level (0.5 bins).
+
+    python -m benchmarks.history_aggregates --rows 1000000
+"""
+import argparse
+from collections import defaultdict
+
+from benchmarks._django import seed_history, setup, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    setup()
+    from django.db.models import Avg, Count, F
+    from django.db.models.functions import Floor
+
+    from energy_api.models import PredictionHistory
+
+    seed_history(args.rows, args.users, spread_days=365)
+
+    def json_in_python():
+        sums = defaultdict(lambda: [0.0, 0])
+        rows = PredictionHistory.objects.values_list("input_set__inputs", "eui_month_kwh_m2").iterator(chunk_size=5000)
+        for inputs, eui in rows:
+            try:
+                level = int(float(inputs.get("Wall_Insulation")) * 2) / 2
+            except (TypeError, ValueError):
+                continue
+            bucket = sums[level]
+            bucket[0] += eui or 0
+            bucket[1] += 1
+        return {k: v[0] / v[1] for k, v in sums.items()}
+
+    def typed_sql():
+        return list(
+            PredictionHistory.objects.filter(wall_insulation__isnull=False)
+            .values(level=Floor(F("wall_insulation") * 2) / 2)
+            .annotate(mean_eui=Avg("eui_month_kwh_m2"), n=Count("id"))
+            .order_by("level")
+        )
+
+    python_ms = timeit(json_in_python, repeat=args.repeat)
+    sql_ms = timeit(typed_sql, repeat=args.repeat)
+
+    print(f"rows: {args.rows}")
+    print(f"{'JSON parsed in Python (ms)':32}{python_ms:>12.1f}")
+    print(f"{'SQL over typed columns (ms)':32}{sql_ms:>12.1f}")
+    print(f"{'speedup':32}{python_ms / sql_ms:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
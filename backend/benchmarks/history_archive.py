@@ -0,0 +1,64 @@
+"""
+Table size and history query latency before and after `archive_history`.
+
+    python -m benchmarks.history_archive --rows 200000
+"""
+import argparse
+
+from benchmarks._django import seed_history, setup, sqlite_size_bytes, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--days", type=int, default=730, help="Spread of created_at values")
+    parser.add_argument("--retention", type=int, default=365)
+    args = parser.parse_args()
+
+    setup()
+    from django.core.management import call_command
+
+    from energy_api.archive import load_archived_history
+    from energy_api.models import PredictionHistory
+
+    users = seed_history(args.rows, args.users, args.days)
+    user = users[0]
+
+    def my_history():
+        list(PredictionHistory.objects.filter(user=user, is_deleted_by_user=False).order_by("-created_at"))
+
+    def admin_user_history_live():
+        list(PredictionHistory.objects.filter(user=user).order_by("-created_at"))
+
+    before = {
+        "rows": PredictionHistory.objects.count(),
+        "size": sqlite_size_bytes(),
+        "my_history_ms": timeit(my_history),
+        "admin_user_ms": timeit(admin_user_history_live),
+    }
+
+    call_command("archive_history", days=args.retention, verbosity=0, stdout=open("/dev/null", "w"))
+
+    after = {
+        "rows": PredictionHistory.objects.count(),
+        "size": sqlite_size_bytes(),
+        "my_history_ms": timeit(my_history),
+        "admin_user_ms": timeit(lambda: (admin_user_history_live(), load_archived_history(user_id=user.id))),
+    }
+
+    import os
+    from django.conf import settings
+    archive_dir = str(settings.HISTORY_ARCHIVE_DIR)
+    archive_bytes = sum(os.path.getsize(os.path.join(archive_dir, f)) for f in os.listdir(archive_dir))
+
+    print(f"{'':28}{'before':>14}{'after':>14}")
+    print(f"{'history rows in table':28}{before['rows']:>14}{after['rows']:>14}")
+    print(f"{'database size (MB)':28}{before['size'] / 1e6:>14.2f}{after['size'] / 1e6:>14.2f}")
+    print(f"{'archive files (MB)':28}{0:>14.2f}{archive_bytes / 1e6:>14.2f}")
+    print(f"{'user history query (ms)':28}{before['my_history_ms']:>14.2f}{after['my_history_ms']:>14.2f}")
+    print(f"{'admin user history (ms)':28}{before['admin_user_ms']:>14.2f}{after['admin_user_ms']:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
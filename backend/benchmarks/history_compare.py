@@ -0,0 +1,60 @@
+"""
+Comparing a few past predictions: fetching the whole /api/history/ list
+(what the frontend did) vs /api/history/compare/?ids=..., with and
+without ?rescore=1, for a user with --rows history rows.
+
+Also times scoring the compared rows as two model calls (predict, then
+optimize_batch) vs the single stacked score_with_optimized call.
+
+    python -m benchmarks.history_compare --rows 5000 --compare 2 5 10 20
+"""
+import argparse
+
+from benchmarks._django import seed_history, setup, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--compare", type=int, nargs="+", default=[2, 5, 10, 20])
+    args = parser.parse_args()
+
+    setup()
+    import pandas as pd
+    from rest_framework.test import APIClient
+
+    from energy_api.models import PredictionHistory
+    from energy_api.views import get_schema, load_all, optimize_batch, score_scaled, score_with_optimized
+
+    user, = seed_history(args.rows, 1, 365)
+    client = APIClient()
+    client.force_authenticate(user)
+    history = list(PredictionHistory.objects.filter(user=user, is_deleted_by_user=False).order_by("-created_at"))
+    # Seeded inputs can fall outside FEATURE_RANGES; compare rows that validate.
+    valid, _ = get_schema().validate_many([h.feature_inputs() for h in history])
+    scorable = [history[i].id for i, _, _ in valid]
+    _, _, sc, features = load_all()
+
+    full = timeit(lambda: client.get("/api/history/"))
+    print(f"history rows: {len(history)}; full /api/history/ list: {full:.1f} ms")
+    print(f"{'buildings':>10}{'compare (ms)':>15}{'rescore (ms)':>15}{'2 calls (ms)':>15}{'stacked (ms)':>15}")
+    for n in args.compare:
+        ids = ",".join(str(pk) for pk in scorable[:n])
+        compare = timeit(lambda: client.get(f"/api/history/compare/?ids={ids}"), repeat=20)
+        rescore = timeit(lambda: client.get(f"/api/history/compare/?ids={ids}&rescore=1"), repeat=20)
+
+        records = PredictionHistory.objects.filter(id__in=scorable[:n])
+        valid, _ = get_schema().validate_many([h.feature_inputs() for h in records])
+        rows = [row for _, _, row in valid]
+
+        def two_calls():
+            yearly, _ = score_scaled(sc.transform(pd.DataFrame(rows, columns=features)))
+            optimize_batch(rows, [float(y) / 12.0 for y in yearly])
+
+        separate = timeit(two_calls, repeat=20)
+        stacked = timeit(lambda: score_with_optimized(rows), repeat=20)
+        print(f"{n:>10}{compare:>15.1f}{rescore:>15.1f}{separate:>15.1f}{stacked:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
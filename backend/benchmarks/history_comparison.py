@@ -0,0 +1,67 @@
+"""
+Current-vs-optimized comparison for history pages: re-deriving it per row on
+every view (two predictions per row) vs reading the stored columns, plus the
+throughput of `manage.py backfill_history_comparison`.
+
+    python -m benchmarks.history_comparison --rows 20000 --page 50
+"""
+import argparse
+import io
+import time
+
+from benchmarks._django import seed_history, setup, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup()
+    import pandas as pd
+    from django.core.management import call_command
+
+    from energy_api.models import PredictionHistory
+    from energy_api.views import compute_optimized_performance, get_schema, load_all, score_scaled
+
+    seed_history(args.rows, 20, spread_days=365)
+    model, _, sc, features = load_all()
+
+    started = time.perf_counter()
+    call_command("backfill_history_comparison", batch_size=args.batch_size, stdout=io.StringIO())
+    backfill_s = time.perf_counter() - started
+
+    page = list(PredictionHistory.objects.order_by("-id")[:args.page])
+
+    def rederive():
+        # What a page view would cost without the stored columns.
+        for h in page:
+            row, errors = get_schema().validate(h.feature_inputs())
+            if errors:
+                continue
+            df = pd.DataFrame([row], columns=features)
+            yearly, _ = score_scaled(sc.transform(df))
+            user_vals = df.iloc[0].to_dict()
+            user_vals["__current_monthly_energy__"] = float(yearly[0]) / 12.0
+            compute_optimized_performance(user_vals, model, sc)
+
+    def stored():
+        return [
+            h.comparison()
+            for h in PredictionHistory.objects.order_by("-id")[:args.page]
+        ]
+
+    rederive_ms = timeit(rederive, repeat=3)
+    stored_ms = timeit(stored, repeat=5)
+
+    print(f"rows: {args.rows}, page: {args.page}")
+    print(f"{'backfill (rows/s)':32}{args.rows / backfill_s:>12.0f}")
+    print(f"{'page, re-derived (ms)':32}{rederive_ms:>12.1f}")
+    print(f"{'page, stored columns (ms)':32}{stored_ms:>12.1f}")
+    print(f"{'speedup':32}{rederive_ms / stored_ms:>11.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Storage and insert cost of history inputs: inline JSON per row (schema
+before migration 0011) vs the content-addressed PredictionInput table.
+
+Seeds --rows history rows at migration 0010, where --duplicate-share of
+them repeat a few payloads (DEFAULT_VALUES unchanged, retried buildings).
+It then migrates to 0011 and measures:
+- table size (SQLite dbstat, after VACUUM);
+- single-row and bulk insert speed in both layouts;
+- /predict/ latency for new inputs vs inputs seen before (cached result);
+- the migration time.
+
+    python -m benchmarks.history_inputs --rows 100000 --duplicate-share 0.6
+"""
+import argparse
+import random
+import time
+
+from benchmarks._django import setup, sqlite_size_bytes, timeit
+
+
+def table_bytes(*tables):
+    from django.db import connection
+
+    sqlite_size_bytes()  # VACUUM
+    with connection.cursor() as cur:
+        cur.execute(
+            # Tables plus their indexes.
+            "SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name IN "
+            f"(SELECT name FROM sqlite_master WHERE tbl_name IN ({', '.join(['%s'] * len(tables))}))",
+            list(tables),
+        )
+        return cur.fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--duplicate-share", type=float, default=0.6)
+    parser.add_argument("--single", type=int, default=500, help="Rows inserted one by one with save().")
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.db import connection
+    from django.db.migrations.loader import MigrationLoader
+
+    from energy_api.models import PredictionHistory
+    from energy_api.views import DEFAULT_VALUES
+
+    call_command("migrate", "energy_api", "0010_history_comparison", verbosity=0)
+    old_state = MigrationLoader(connection).project_state(("energy_api", "0010_history_comparison"))
+    OldHistory = old_state.apps.get_model("energy_api", "PredictionHistory")
+
+    user = get_user_model().objects.create_user(username="inputs", password="x", email="inputs@example.com")
+    rng = random.Random(7)
+    repeated = [dict(DEFAULT_VALUES, Building_Type="Detached")] + [
+        {k: str(round(v * rng.uniform(0.8, 1.5), 2)) for k, v in DEFAULT_VALUES.items()} | {"Building_Type": "Terraced"}
+        for _ in range(20)
+    ]
+
+    def payload():
+        if rng.random() < args.duplicate_share:
+            return dict(rng.choice(repeated))
+        return {k: str(round(v * rng.uniform(0.8, 1.5), 2)) for k, v in DEFAULT_VALUES.items()} | {
+            "Building_Type": rng.choice(["Bungalow", "Detached", "Semi Detached", "Terraced"])
+        }
+
+    def fields(inputs):
+        return dict(
+            user_id=user.id, building_type=inputs["Building_Type"], total_energy_month_kwh=1234.5,
+            eui_month_kwh_m2=12.3, performance_category="Average Efficiency", inputs=inputs,
+        )
+
+    def bulk(model, n):
+        started = time.perf_counter()
+        for start in range(0, n, 5000):
+            model.objects.bulk_create([model(**fields(payload())) for _ in range(min(5000, n - start))])
+        return n / (time.perf_counter() - started)
+
+    def single(model, n):
+        started = time.perf_counter()
+        for _ in range(n):
+            model.objects.create(**fields(payload()))
+        return n / (time.perf_counter() - started)
+
+    old_bulk = bulk(OldHistory, args.rows)
+    old_single = single(OldHistory, args.single)
+    old_size = table_bytes("energy_api_predictionhistory")
+
+    started = time.perf_counter()
+    call_command("migrate", "energy_api", verbosity=0)
+    migrate_s = time.perf_counter() - started
+    history_size = table_bytes("energy_api_predictionhistory")
+    inputs_size = table_bytes("energy_api_predictioninput")
+    distinct = connection.cursor().execute("SELECT COUNT(*) FROM energy_api_predictioninput").fetchone()[0]
+
+    new_bulk = bulk(PredictionHistory, args.rows)
+    new_single = single(PredictionHistory, args.single)
+
+    # /predict/ end to end: a payload seen before skips scoring entirely.
+    from django.conf import settings
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+
+    from energy_api import throttling
+    from energy_api.views import load_all
+
+    load_all()
+    staff = get_user_model().objects.create_user(
+        username="inputs-staff", password="x", email="staff@example.com", is_staff=True,
+    )
+    client = APIClient()
+    client.force_authenticate(staff)
+    unthrottled = {
+        "THROTTLE_RATES": {k: (10 ** 9, 10 ** 9) for k in settings.THROTTLE_RATES},
+        "THROTTLE_PLAN_RATES": {k: (10 ** 9, 10 ** 9) for k in settings.THROTTLE_PLAN_RATES},
+    }
+    throttling.reset()
+    novel = [dict(DEFAULT_VALUES, Building_Type="Detached", Total_Building_Area=100 + i) for i in range(50)]
+    with override_settings(**unthrottled):
+        predict_novel = timeit(lambda: [client.post("/api/predict/", p, format="json") for p in novel], repeat=1)
+        predict_repeat = timeit(lambda: [client.post("/api/predict/", p, format="json") for p in novel], repeat=1)
+
+    rows = args.rows + args.single
+    print(f"rows: {rows}, distinct inputs: {distinct} ({distinct / rows:.0%})")
+    print(f"{'':34}{'inline JSON':>14}{'PredictionInput':>17}")
+    print(f"{'history table (MB)':34}{old_size / 1e6:>14.1f}{history_size / 1e6:>17.1f}")
+    print(f"{'history + inputs tables (MB)':34}{old_size / 1e6:>14.1f}{(history_size + inputs_size) / 1e6:>17.1f}")
+    print(f"{'bulk insert (rows/s)':34}{old_bulk:>14.0f}{new_bulk:>17.0f}")
+    print(f"{'save() one by one (rows/s)':34}{old_single:>14.0f}{new_single:>17.0f}")
+    print(f"/predict/ per call: {predict_novel / len(novel):.1f} ms for new inputs, "
+          f"{predict_repeat / len(novel):.1f} ms for inputs seen before")
+    print(f"migration 0011: {migrate_s:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Repeat visits to the history page: refetching /api/history/ vs syncing
+with /api/history/changes/?since=<cursor> after a few rows were added and
+hidden, for a user with --rows history rows. Reports time and response
+size, and the query plan of the delta query.
+
+    python -m benchmarks.history_sync --rows 5000 --new 5
+"""
+import argparse
+import time
+
+from benchmarks._django import seed_history, setup, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--new", type=int, default=5, help="Rows added (and hidden) between visits.")
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+
+    from energy_api.models import PredictionHistory
+    from energy_api.views import DEFAULT_VALUES
+
+    user, = seed_history(args.rows, 1, 365)
+    client = APIClient()
+    client.force_authenticate(user)
+
+    def get(path):
+        return client.get(path, HTTP_ACCEPT_ENCODING="identity")
+
+    full_ms = timeit(lambda: get("/api/history/"))
+    full_bytes = len(get("/api/history/").content)
+
+    # No overlap window, so the delta holds only what changed between visits.
+    with override_settings(HISTORY_SYNC_OVERLAP_SECONDS=0):
+        cursor = get("/api/history/changes/").data["cursor"]
+        time.sleep(0.01)
+        for _ in range(args.new):
+            PredictionHistory.objects.create(
+                user=user, building_type="Detached", total_energy_month_kwh=1000.0, eui_month_kwh_m2=10.0,
+                performance_category="Average Efficiency", inputs=dict(DEFAULT_VALUES, Building_Type="Detached"),
+            )
+        for h in PredictionHistory.objects.filter(user=user, is_deleted_by_user=False)[:args.new]:
+            h.is_deleted_by_user = True
+            h.save()
+
+        path = f"/api/history/changes/?since={cursor}"
+        delta = get(path)
+        delta_ms = timeit(lambda: get(path))
+
+    with connection.cursor() as cur:
+        cur.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM energy_api_predictionhistory WHERE user_id = %s AND updated_at > %s",
+            [user.id, "2026-01-01"],
+        )
+        plan = " | ".join(row[-1] for row in cur.fetchall())
+
+    print(f"history rows: {PredictionHistory.objects.filter(user=user).count()}")
+    print(f"full /api/history/:     {full_ms:7.1f} ms {full_bytes / 1024:9.1f} KiB")
+    print(f"/api/history/changes/:  {delta_ms:7.1f} ms {len(delta.content) / 1024:9.1f} KiB "
+          f"({len(delta.data['changes'])} changes, {len(delta.data['deleted'])} tombstones)")
+    print(f"delta query plan: {plan}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+/predict/ latency and throughput with synchronous history inserts vs the
+write-behind buffer (HISTORY_WRITE_BEHIND).
+
+--write-ms adds that much latency to every INSERT/UPDATE/DELETE on every
+connection, including the writer thread's, to stand in for a slow disk or a
+contended database. The quota UPDATE stays synchronous in both modes, so it
+is slowed down too.
+
+    python -m benchmarks.history_write_behind --requests 400 --threads 4 --write-ms 10
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from benchmarks._django import setup
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--write-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+    from django.test import override_settings
+    from rest_framework.authtoken.models import Token
+    from rest_framework.test import APIClient
+
+    from energy_api import history_buffer, throttling
+    from energy_api.models import PredictionHistory, Subscription
+    from energy_api.views import DEFAULT_VALUES, load_all
+
+    def slow_writes(execute, sql, params, many, context):
+        if args.write_ms and sql.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE"):
+            time.sleep(args.write_ms / 1000.0)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        if slow_writes not in connection.execute_wrappers:
+            connection.execute_wrappers.append(slow_writes)
+
+    connection_created.connect(install)
+    install(None, connection)
+
+    load_all()
+    payload = dict(DEFAULT_VALUES, Building_Type="Detached", Hvac_Efficiency=2.0)
+    tokens = []
+    for i in range(args.threads):
+        user = get_user_model().objects.create_user(username=f"wb{i}", password="x", email=f"wb{i}@example.com")
+        Subscription.objects.filter(user=user).update(
+            plan="premium", allowed_predictions=10 ** 9, remaining_predictions=10 ** 9,
+        )
+        tokens.append(Token.objects.create(user=user).key)
+
+    # Measure the history insert, not the throttle.
+    unthrottled = {
+        "THROTTLE_RATES": {k: (10 ** 9, 10 ** 9) for k in settings.THROTTLE_RATES},
+        "THROTTLE_PLAN_RATES": {k: (10 ** 9, 10 ** 9) for k in settings.THROTTLE_PLAN_RATES},
+    }
+
+    def run(write_behind):
+        throttling.reset()
+        history_buffer.writer.reset()
+        before = PredictionHistory.objects.count()
+        per_thread = args.requests // args.threads
+        latencies = []
+        lock = threading.Lock()
+
+        def client(token):
+            api = APIClient(HTTP_AUTHORIZATION=f"Token {token}")
+            for _ in range(per_thread):
+                start = time.perf_counter()
+                code = api.post("/api/predict/", payload, format="json").status_code
+                ms = (time.perf_counter() - start) * 1000
+                with lock:
+                    latencies.append(ms if code == 200 else float("inf"))
+            connection.close()
+
+        with override_settings(HISTORY_WRITE_BEHIND=write_behind, **unthrottled):
+            started = time.perf_counter()
+            pool = [threading.Thread(target=client, args=(t,)) for t in tokens]
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+            elapsed = time.perf_counter() - started
+            drain_start = time.perf_counter()
+            history_buffer.writer.close()
+            drain_ms = (time.perf_counter() - drain_start) * 1000
+
+        written = PredictionHistory.objects.count() - before
+        latencies.sort()
+        return {
+            "rps": len(latencies) / elapsed,
+            "p50": statistics.median(latencies),
+            "p99": latencies[int(len(latencies) * 0.99) - 1],
+            "written": written,
+            "sent": len(latencies),
+            "drain_ms": drain_ms,
+        }
+
+    print(f"{'mode':14}{'req/s':>8}{'p50 ms':>9}{'p99 ms':>9}{'rows':>10}{'drain ms':>10}")
+    for name, write_behind in (("synchronous", False), ("write-behind", True)):
+        r = run(write_behind)
+        print(f"{name:14}{r['rps']:>8.1f}{r['p50']:>9.1f}{r['p99']:>9.1f}"
+              f"{r['written']:>5}/{r['sent']:<4}{r['drain_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
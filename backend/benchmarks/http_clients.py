@@ -0,0 +1,93 @@
+"""
+Connection reuse and latency: a fresh SendGrid SDK client per email (the old
+code path) vs the pooled client from energy_api.utils.clients, both against a
+local stub server. `--handshake-ms` delays the first request on every new
+connection to stand in for the TLS handshake a real provider costs.
+
+    python -m benchmarks.http_clients --requests 200 --handshake-ms 80
+"""
+import argparse
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks._django import setup, timeit
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Avoid Nagle/delayed-ACK stalls between headers and body.
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.connections += 1
+        if self.server.handshake_s:
+            time.sleep(self.server.handshake_s)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"ok": True}).encode()
+        self.send_response(202)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--handshake-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+    from sendgrid import SendGridAPIClient
+    from sendgrid.helpers.mail import Mail
+
+    from energy_api.utils import clients
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.connections = 0
+    server.handshake_s = args.handshake_ms / 1000.0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"http://127.0.0.1:{server.server_port}"
+    settings.SENDGRID_HOST = host
+
+    def mail():
+        return Mail(from_email="a@example.com", to_emails="b@example.com",
+                    subject="bench", plain_text_content="hello")
+
+    def fresh_clients():
+        for _ in range(args.requests):
+            SendGridAPIClient("key", host=host).send(mail())
+
+    def pooled_client():
+        for _ in range(args.requests):
+            clients.get_sendgrid_client().send(mail())
+
+    server.connections = 0
+    fresh_ms = timeit(fresh_clients, repeat=1)
+    fresh_conns = server.connections
+
+    clients.reset_clients()
+    server.connections = 0
+    pooled_ms = timeit(pooled_client, repeat=1)
+    pooled_conns = server.connections
+
+    n = args.requests
+    print(f"{n} emails, simulated handshake {args.handshake_ms} ms")
+    print(f"{'':24}{'connections':>12}{'ms/request':>12}")
+    print(f"{'fresh client per call':24}{fresh_conns:>12}{fresh_ms / n:>12.2f}")
+    print(f"{'pooled client':24}{pooled_conns:>12}{pooled_ms / n:>12.2f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Boot import profile: django.setup() plus URLconf resolution, the work every
+worker and management command does before serving anything, run in a fresh
+interpreter under `python -X importtime`.
+
+Prints the wall time of the boot (median of --runs) and the packages with
+the largest self import time, then fails (exit 1) when the boot is over
+--budget-ms or when a module that should only load on first use
+(pandas, the model stack, payment/email SDKs) was imported.
+
+    python -m benchmarks.import_time --budget-ms 800
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from benchmarks._django import BACKEND_DIR
+
+# Imported on first prediction / payment / email, never at boot.
+LAZY_MODULES = ("pandas", "numpy", "joblib", "sklearn", "xgboost", "razorpay", "sendgrid")
+
+BOOT = f"""
+import os, sys, time
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "energy_backend.settings")
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print("boot_ms", (time.perf_counter() - start) * 1000)
+print("loaded", *[m for m in {LAZY_MODULES!r} if m in sys.modules])
+"""
+
+
+def run_boot():
+    """Returns (boot_ms, lazy modules loaded, {package: self_us})."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", BOOT],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        env=dict(os.environ, PYTHONPATH=BACKEND_DIR),
+    )
+    per_package = defaultdict(int)
+    for line in proc.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        per_package[name.strip().split(".")[0]] += int(self_us)
+
+    boot_ms, loaded = None, []
+    for line in proc.stdout.splitlines():
+        key, _, rest = line.partition(" ")
+        if key == "boot_ms":
+            boot_ms = float(rest)
+        elif key == "loaded":
+            loaded = rest.split()
+    return boot_ms, loaded, per_package
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("BOOT_BUDGET_MS", "800")))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+
+    runs = [run_boot() for _ in range(args.runs)]
+    boot_ms = statistics.median(r[0] for r in runs)
+    loaded = sorted({m for r in runs for m in r[1]})
+    per_package = runs[-1][2]
+
+    print(f"{'package':24}{'self import (ms)':>18}")
+    for name, us in sorted(per_package.items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        print(f"{name:24}{us / 1000:>18.1f}")
+    print(f"{'total (importtime)':24}{sum(per_package.values()) / 1000:>18.1f}")
+    print(f"\nboot wall time: {boot_ms:.0f} ms (median of {args.runs}), budget {args.budget_ms:.0f} ms")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: imported at boot, should be lazy: {', '.join(loaded)}")
+        failed = True
+    if boot_ms > args.budget_ms:
+        print(f"FAIL: boot is {boot_ms - args.budget_ms:.0f} ms over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Latency of the optional inference modes against plain model.predict, for
+one row and for a batch: ?uncertainty=1 (one pred_leaf pass) and
+?explain=1 (one pred_contribs pass, TreeSHAP).
+
+    python -m benchmarks.inference_modes --rows 10000
+"""
+import argparse
+import random
+
+from benchmarks._django import setup, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    import pandas as pd
+
+    from energy_api.views import DEFAULT_VALUES, get_ensemble, get_schema, load_all
+
+    model, _, sc, features = load_all()
+    schema = get_schema()
+    ensemble = get_ensemble()
+
+    rng = random.Random(11)
+    rows = []
+    for _ in range(args.rows):
+        data = {k: round(v * rng.uniform(1.0, 1.2), 2) for k, v in DEFAULT_VALUES.items()}
+        data["Building_Type"] = rng.choice(["Bungalow", "Detached", "Semi Detached", "Terraced"])
+        rows.append(schema.validate(data)[0])
+
+    print(f"{'rows':>8}{'predict ms':>12}{'pred_leaf ms':>14}{'pred_contribs ms':>18}")
+    for n in (1, args.rows):
+        scaled = sc.transform(pd.DataFrame(rows[:n], columns=features))
+        plain = timeit(lambda: model.predict(scaled), repeat=args.repeat)
+        leaf = timeit(lambda: ensemble.score(scaled), repeat=args.repeat)
+        contribs = timeit(lambda: ensemble.contributions(scaled), repeat=args.repeat)
+        print(f"{n:>8}{plain:>12.2f}{leaf:>14.2f}{contribs:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Password hashing cost and /api/login/ throughput on one core.
+
+Prints the cost of scrypt at several work factors (to pick
+PASSWORD_SCRYPT_LOG2_N for a deployment), then logins/sec through the real
+endpoint with the old PBKDF2 configuration and with the current one.
+
+    python -m benchmarks.login_throughput --logins 20
+"""
+import argparse
+import time
+
+from benchmarks._django import setup, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test.utils import override_settings
+    from rest_framework.test import APIClient
+
+    from energy_api import throttling
+    from energy_api.hashers import TunedScryptPasswordHasher
+
+    print("scrypt cost (r=8, p=1)")
+    print(f"{'log2 N':>8}{'memory MiB':>12}{'ms/hash':>10}")
+    hasher = TunedScryptPasswordHasher()
+    for log2_n in (12, 13, 14, 15, 16):
+        salt = hasher.salt()
+        memory = f"{128 * 2 ** log2_n * 8 / 2 ** 20:>12.0f}"
+        try:
+            with override_settings(PASSWORD_SCRYPT_WORK_FACTOR=2 ** log2_n):
+                ms = timeit(lambda: hasher.encode("correct horse", salt), repeat=3)
+        except ValueError:
+            # Beyond OpenSSL's default scrypt memory limit.
+            print(f"{log2_n:>8}{memory}{'n/a':>10}")
+            continue
+        print(f"{log2_n:>8}{memory}{ms:>10.1f}")
+
+    User = get_user_model()
+    legacy_hashers = ["django.contrib.auth.hashers.PBKDF2PasswordHasher"] + [
+        h for h in settings.PASSWORD_HASHERS if not h.endswith("PBKDF2PasswordHasher")
+    ]
+
+    def run(label, username):
+        client = APIClient()
+        throttling.reset()
+        with override_settings(THROTTLE_RATES=dict(settings.THROTTLE_RATES, auth=(10 ** 6, 10 ** 6))):
+            # The test client resets connection.queries per request, so count
+            # through an execute wrapper instead.
+            queries = []
+            with connection.execute_wrapper(lambda execute, sql, *a: queries.append(sql) or execute(sql, *a)):
+                client.post("/api/login/", {"username": username, "password": "pw"}, format="json")
+            start = time.perf_counter()
+            for _ in range(args.logins):
+                resp = client.post("/api/login/", {"username": username, "password": "pw"}, format="json")
+                assert resp.status_code == 200, resp.content
+            elapsed = time.perf_counter() - start
+        print(f"{label:34}{args.logins / elapsed:>10.1f}{len(queries):>10}")
+
+    print()
+    print(f"{'configuration':34}{'logins/s':>10}{'queries':>10}")
+    with override_settings(PASSWORD_HASHERS=legacy_hashers):
+        User.objects.create_user(username="legacy", password="pw", email="legacy@example.com")
+        run("PBKDF2 (1M iterations, before)", "legacy")
+    User.objects.create_user(username="current", password="pw", email="current@example.com")
+    run(f"scrypt N=2^{settings.PASSWORD_SCRYPT_WORK_FACTOR.bit_length() - 1} (after)", "current")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Bytes on the wire and render time for /api/admin/history/: DRF's stdlib
+JSONRenderer vs orjson, row vs columnar shape, with and without compression.
+
+    python -m benchmarks.response_encoding --rows 10000
+"""
+import argparse
+import gzip
+
+from benchmarks._django import seed_history, setup, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import get_user_model
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIClient
+
+    from energy_api import middleware
+    from energy_api.renderers import ColumnarJSONRenderer, ORJSONRenderer
+
+    seed_history(args.rows, n_users=20, spread_days=30)
+    admin = get_user_model().objects.create_user(username="root", password="x", is_staff=True)
+    client = APIClient()
+    client.force_authenticate(admin)
+    payload = client.get("/api/admin/history/?archived=0").data
+
+    renderers = [
+        ("stdlib json, rows", JSONRenderer()),
+        ("orjson, rows", ORJSONRenderer()),
+        ("orjson, columns", ColumnarJSONRenderer()),
+    ]
+    print(f"rows: {len(payload['all_history'])}")
+    print(f"{'renderer':22}{'render ms':>11}{'raw KiB':>10}{'gzip KiB':>10}{'br KiB':>9}")
+    for label, renderer in renderers:
+        ms = timeit(lambda: renderer.render(payload), repeat=args.repeat)
+        body = renderer.render(payload)
+        gz = len(gzip.compress(body, compresslevel=6))
+        br = f"{len(middleware.brotli.compress(body, quality=5)) / 1024:>9.0f}" if middleware.brotli else f"{'n/a':>9}"
+        print(f"{label:22}{ms:>11.1f}{len(body) / 1024:>10.0f}{gz / 1024:>10.0f}{br}")
+
+    def full_request():
+        return client.get("/api/admin/history/?archived=0", HTTP_ACCEPT_ENCODING="gzip")
+
+    print()
+    print(f"end to end, gzip negotiated: {timeit(full_request, repeat=args.repeat):.1f} ms, "
+          f"{len(full_request().content) / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Sweep gunicorn worker/thread configurations under a mixed local load and
+report throughput against latency.
+
+Each configuration starts gunicorn with gunicorn.conf.py (overriding
+GUNICORN_WORKERS / GUNICORN_THREADS) on a throwaway database. A pool of
+closed-loop clients then sends a mix of two requests:
+- CPU-bound POST /api/predict/ calls.
+- I/O-bound POST /api/create-order/ calls. These wait --io-ms on a local
+  stub that stands in for Razorpay.
+"auto" is the configuration gunicorn.conf.py derives for this machine.
+The best configuration is the highest throughput whose p95 stays within
+--p95-ms, or within 2x the lowest p95 seen when --p95-ms is not given.
+
+The clients run on the same machine as the server, so on a small box they
+compete for the same cores. Compare configurations with each other, not
+with production numbers.
+
+    python -m benchmarks.server_sweep --workers 1,2,3 --threads 1,2,4 --seconds 8
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from benchmarks._django import BACKEND_DIR, setup
+
+
+class RazorpayStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    ids = itertools.count()
+
+    def do_POST(self):
+        order = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.server.delay_s)
+        body = json.dumps({
+            "id": f"order_{os.getpid()}_{next(self.ids)}",
+            "amount": order.get("amount", 0),
+            "currency": order.get("currency", "INR"),
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, threads, env):
+    port = free_port()
+    server_env = dict(env, GUNICORN_BIND=f"127.0.0.1:{port}")
+    if workers:
+        server_env.update(GUNICORN_WORKERS=str(workers), GUNICORN_THREADS=str(threads))
+    proc = subprocess.Popen(
+        ["gunicorn", "--config", "gunicorn.conf.py"],
+        cwd=BACKEND_DIR, env=server_env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base}/api/health/", timeout=1).ok:
+                return proc, base
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"gunicorn did not start:\n{proc.stderr.read()[-2000:]}")
+
+
+def effective_config(proc):
+    """(workers, threads) gunicorn logged at startup."""
+    line = ""
+    while "workers=" not in line:
+        line = proc.stderr.readline()
+        if not line:
+            return None, None
+    fields = dict(part.split("=", 1) for part in line.split() if "=" in part)
+    return int(fields["workers"]), int(fields["threads"])
+
+
+def run_load(base, token, payload, seconds, clients, io_share):
+    stop = time.monotonic() + seconds
+    lock = threading.Lock()
+    samples = []
+
+    def client(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        session.headers["Authorization"] = f"Token {token}"
+        while time.monotonic() < stop:
+            kind = "order" if rng.random() < io_share else "predict"
+            start = time.perf_counter()
+            try:
+                if kind == "order":
+                    code = session.post(f"{base}/api/create-order/", json={"plan": "basic"}, timeout=30).status_code
+                else:
+                    code = session.post(f"{base}/api/predict/", json=payload, timeout=30).status_code
+            except requests.RequestException:
+                code = None
+            with lock:
+                samples.append((kind, code, (time.perf_counter() - start) * 1000))
+
+    started = time.monotonic()
+    pool = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return samples, time.monotonic() - started
+
+
+def p95(values):
+    return statistics.quantiles(values, n=20)[-1] if len(values) > 1 else (values[0] if values else float("nan"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,3")
+    parser.add_argument("--threads", default="1,2,4")
+    parser.add_argument("--seconds", type=float, default=8.0)
+    parser.add_argument("--clients", type=int, default=12)
+    parser.add_argument("--io-share", type=float, default=0.2, help="Share of requests that are payment orders.")
+    parser.add_argument("--io-ms", type=float, default=150.0, help="Stub Razorpay latency.")
+    parser.add_argument("--p95-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import get_user_model
+    from rest_framework.authtoken.models import Token
+
+    from energy_api.views import DEFAULT_VALUES
+
+    user = get_user_model().objects.create_user(
+        username="sweep", password="x", email="sweep@example.com", is_staff=True,
+    )
+    token = Token.objects.create(user=user).key
+    payload = dict(DEFAULT_VALUES, Building_Type="Detached", Hvac_Efficiency=2.0)
+
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), RazorpayStub)
+    stub.delay_s = args.io_ms / 1000.0
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE="benchmarks._server_settings",
+        RAZORPAY_BASE_URL=f"http://127.0.0.1:{stub.server_port}/v1",
+        RAZORPAY_KEY_ID="rzp_test_sweep",
+        RAZORPAY_KEY_SECRET="sweep",
+        GUNICORN_LOG_LEVEL="info",
+    )
+
+    configs = [("auto", None, None)] + [
+        (f"{w}x{t}", w, t)
+        for w in map(int, args.workers.split(","))
+        for t in map(int, args.threads.split(","))
+    ]
+    print(f"{'config':8}{'workers':>8}{'threads':>8}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'predict p95':>13}{'order p95':>11}{'errors':>8}")
+    rows = []
+    for name, workers, threads in configs:
+        proc, base = start_server(workers, threads, env)
+        try:
+            workers, threads = effective_config(proc)
+            # Keep draining the log so the server never blocks on a full pipe.
+            threading.Thread(target=proc.stderr.read, daemon=True).start()
+            # Let every worker serve its first predictions before measuring.
+            run_load(base, token, payload, 1.0, args.clients, args.io_share)
+            samples, elapsed = run_load(base, token, payload, args.seconds, args.clients, args.io_share)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=60)
+
+        ok = [s for s in samples if s[1] == 200]
+        latencies = [ms for _, _, ms in ok]
+        row = {
+            "name": name,
+            "workers": workers,
+            "threads": threads,
+            "rps": len(ok) / elapsed,
+            "p50": statistics.median(latencies) if latencies else float("nan"),
+            "p95": p95(latencies),
+            "predict_p95": p95([ms for kind, _, ms in ok if kind == "predict"]),
+            "order_p95": p95([ms for kind, _, ms in ok if kind == "order"]),
+            "errors": len(samples) - len(ok),
+        }
+        rows.append(row)
+        print(f"{name:8}{workers:>8}{threads:>8}{row['rps']:>8.1f}{row['p50']:>9.0f}{row['p95']:>9.0f}"
+              f"{row['predict_p95']:>13.0f}{row['order_p95']:>11.0f}{row['errors']:>8}")
+
+    measured = [r for r in rows if r["p95"] == r["p95"]]
+    if not measured:
+        print("no successful requests")
+        return
+    budget = args.p95_ms or 2 * min(r["p95"] for r in measured)
+    best = max((r for r in measured if r["p95"] <= budget), key=lambda r: r["rps"])
+    print(f"\nbest within p95 <= {budget:.0f} ms: {best['name']} "
+          f"({best['workers']} workers x {best['threads']} threads), "
+          f"{best['rps']:.1f} req/s, p95 {best['p95']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+/api/simulate/ cost by scenario count: the endpoint scores the whole
+12 x N matrix in one model call; for reference, the same rows scored one
+model call per month and scenario.
+
+    python -m benchmarks.simulation --scenarios 1 4 8
+"""
+import argparse
+
+from benchmarks._django import setup, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    setup()
+    import pandas as pd
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+
+    from energy_api import simulation, throttling
+    from energy_api.views import DEFAULT_VALUES, FEATURE_RANGES, get_schema, load_all, score_scaled
+
+    _, _, sc, features = load_all()
+    user = get_user_model().objects.create_user(username="sim", password="x", email="sim@example.com", is_staff=True)
+    client = APIClient()
+    client.force_authenticate(user)
+    building = dict(DEFAULT_VALUES, Building_Type="Detached", Total_Building_Area=150)
+    names = list(simulation.builtin_profiles()["profiles"])
+    unthrottled = {
+        "THROTTLE_RATES": {k: (10 ** 9, 10 ** 9) for k in settings.THROTTLE_RATES},
+        "THROTTLE_PLAN_RATES": {k: (10 ** 9, 10 ** 9) for k in settings.THROTTLE_PLAN_RATES},
+        "SIMULATION_MAX_SCENARIOS": max(args.scenarios),
+    }
+    throttling.reset()
+
+    print(f"{'scenarios':>10}{'rows':>6}{'/api/simulate/ (ms)':>22}{'per-row predicts (ms)':>24}")
+    with override_settings(**unthrottled):
+        for n in args.scenarios:
+            specs = [{"profiles": [names[i % len(names)]]} for i in range(n)]
+            body = {"building": building, "scenarios": specs}
+            endpoint = timeit(lambda: client.post("/api/simulate/", body, format="json"), repeat=10)
+
+            row, _ = get_schema().validate(building)
+            scenarios = simulation.parse_scenarios(specs, [f for f in features if f in FEATURE_RANGES])
+            matrix, _ = simulation.expand([row] * n, scenarios, features, FEATURE_RANGES)
+            per_row = timeit(
+                lambda: [score_scaled(sc.transform(pd.DataFrame([r], columns=features))) for r in matrix], repeat=3,
+            )
+            print(f"{n:>10}{len(matrix):>6}{endpoint:>22.1f}{per_row:>24.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Abuse load test for the token-bucket throttles.
+
+Several threads hammer /api/predict/ as one free-plan user while a
+premium-plan user sends a request every half second, within its budget. The abuser's accepted requests
+should stay within capacity + refill over the run, rejected ones should be
+cheap 429s, and the well-behaved user should keep being served.
+
+    python -m benchmarks.throttle_load --seconds 10 --threads 4
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from benchmarks._django import setup
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from rest_framework.authtoken.models import Token
+    from rest_framework.test import APIClient
+
+    from energy_api.models import Subscription
+    from energy_api.views import DEFAULT_VALUES, load_all
+
+    load_all()
+    User = get_user_model()
+    payload = dict(DEFAULT_VALUES, Building_Type="Detached", Hvac_Efficiency=2.0)
+
+    def client_for(name, ip, plan):
+        user = User.objects.create_user(username=name, password="x", email=f"{name}@example.com")
+        Subscription.objects.create(user=user, plan=plan, allowed_predictions=10 ** 9, remaining_predictions=10 ** 9)
+        token = Token.objects.create(user=user)
+        return lambda: APIClient(HTTP_AUTHORIZATION=f"Token {token.key}", REMOTE_ADDR=ip)
+
+    abuser, legit = client_for("abuser", "10.0.0.1", "free"), client_for("legit", "10.0.0.2", "premium")
+    stop = time.monotonic() + args.seconds
+    lock = threading.Lock()
+    results = {"abuser": [], "legit": []}
+
+    def run(name, make_client, pause):
+        client = make_client()
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            code = client.post("/api/predict/", payload, format="json").status_code
+            with lock:
+                results[name].append((code, (time.perf_counter() - start) * 1000))
+            if pause:
+                time.sleep(pause)
+        connection.close()
+
+    threads = [threading.Thread(target=run, args=("abuser", abuser, 0)) for _ in range(args.threads)]
+    threads.append(threading.Thread(target=run, args=("legit", legit, 0.5)))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    capacity, per_minute = settings.THROTTLE_PLAN_RATES["free"]
+    budget = capacity + per_minute * args.seconds / 60.0
+
+    for name, rows in results.items():
+        ok = [ms for code, ms in rows if code == 200]
+        limited = [ms for code, ms in rows if code == 429]
+        other = len(rows) - len(ok) - len(limited)
+        print(f"{name}: {len(rows)} requests, {len(ok)} served, {len(limited)} throttled, {other} other")
+        if ok:
+            print(f"  served p50 {statistics.median(ok):.1f} ms")
+        if limited:
+            print(f"  429 p50 {statistics.median(limited):.2f} ms")
+
+    served = sum(1 for code, _ in results["abuser"] if code == 200)
+    print(f"abuser budget (capacity + refill): {budget:.1f}; served {served}")
+    print("capacity held" if served <= budget + 1 else "BUDGET EXCEEDED")
+
+
+if __name__ == "__main__":
+    main()
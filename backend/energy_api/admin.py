@@ -1,6 +1,9 @@
 # energy_api/admin.py
 from django.contrib import admin
-from .models import Subscription, PredictionHistory
+from .models import (
+    Subscription, PredictionHistory, PredictionInput, PredictionJob, PaymentOrder, FeatureDriftStats, DriftReference,
+    HistoryArchiveRun,
+)
 
 
 @admin.register(Subscription)
@@ -20,3 +23,40 @@ class SubscriptionAdmin(admin.ModelAdmin):
 class PredictionHistoryAdmin(admin.ModelAdmin):
     list_display = ("user", "building_type", "created_at")
     search_fields = ("user__username", "building_type")
+    raw_id_fields = ("input_set",)
+
+
+@admin.register(PredictionInput)
+class PredictionInputAdmin(admin.ModelAdmin):
+    list_display = ("digest", "result_model", "created_at")
+    search_fields = ("digest",)
+
+
+@admin.register(PredictionJob)
+class PredictionJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "status", "processed_rows", "total_rows", "failed_rows", "created_at")
+    list_filter = ("status",)
+    search_fields = ("user__username", "filename")
+    exclude = ("rows",)
+
+
+@admin.register(PaymentOrder)
+class PaymentOrderAdmin(admin.ModelAdmin):
+    list_display = ("razorpay_order_id", "user", "plan", "amount", "status", "created_at", "paid_at")
+    list_filter = ("status", "plan")
+    search_fields = ("razorpay_order_id", "razorpay_payment_id", "user__username")
+
+
+@admin.register(FeatureDriftStats)
+class FeatureDriftStatsAdmin(admin.ModelAdmin):
+    list_display = ("feature", "count", "mean", "minimum", "maximum", "updated_at")
+
+
+@admin.register(DriftReference)
+class DriftReferenceAdmin(admin.ModelAdmin):
+    list_display = ("id", "note", "created_at")
+
+
+@admin.register(HistoryArchiveRun)
+class HistoryArchiveRunAdmin(admin.ModelAdmin):
+    list_display = ("id", "cutoff", "archived_rows", "finished_at")
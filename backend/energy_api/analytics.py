@@ -0,0 +1,228 @@
+# energy_api/analytics.py
+"""
+Portfolio analytics over PredictionHistory, aggregated in the database.
+
+All figures are derived from one additive "state" per scope (a user's
+visible history, or everything for admins). The state is cached together
+with a watermark (highest row id, row count and latest updated_at). On the
+next request only rows above the watermark are aggregated and merged in;
+if older rows disappeared (soft delete, archiving) or changed (restore,
+backfill) the state is rebuilt from scratch. Response sizes depend on
+bin/day/limit parameters, never on the number of rows.
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Sum, Value
+from django.db.models.functions import Floor, Least, Lower, TruncDate
+from django.utils import timezone
+
+from .models import PredictionHistory
+
+# Fixed EUI bins (kWh/m² per month) so cached histograms can be merged.
+EUI_BIN_WIDTH = 2.5
+EUI_BIN_COUNT = 24  # last bin collects everything above 60
+
+TOP_SAVINGS_LIMIT = 50
+
+STATE_VERSION = 3
+
+
+def scope_queryset(user=None):
+    """History rows for one user (visible only) or, with user=None, for everyone."""
+    if user is None:
+        return PredictionHistory.objects.all()
+    return PredictionHistory.objects.filter(user=user, is_deleted_by_user=False)
+
+
+def _empty_state():
+    return {
+        "histogram": [0] * (EUI_BIN_COUNT + 1),
+        "categories": {},
+        "building_types": {},  # type -> [count, energy_sum, eui_sum, eui_count]
+        # "YYYY-MM-DD" -> [count, energy_sum, eui_sum, eui_count, savings_sum, savings_count]
+        "daily": {},
+        "top": [],
+    }
+
+
+def _aggregate(qs):
+    """Builds a state dict from `qs` with a handful of GROUP BY queries."""
+    state = _empty_state()
+
+    bins = (
+        qs.filter(eui_month_kwh_m2__isnull=False, eui_month_kwh_m2__gte=0)
+        .values(b=Least(Floor(F("eui_month_kwh_m2") / EUI_BIN_WIDTH), Value(float(EUI_BIN_COUNT))))
+        .annotate(n=Count("id"))
+    )
+    for row in bins:
+        state["histogram"][int(row["b"])] += row["n"]
+
+    for row in qs.values("performance_category").annotate(n=Count("id")):
+        state["categories"][row["performance_category"]] = row["n"]
+
+    per_type = qs.values(bt=Lower("building_type")).annotate(
+        n=Count("id"),
+        energy=Sum("total_energy_month_kwh"),
+        eui=Sum("eui_month_kwh_m2"),
+        eui_n=Count("eui_month_kwh_m2"),
+    )
+    for row in per_type:
+        state["building_types"][row["bt"]] = [row["n"], row["energy"] or 0.0, row["eui"] or 0.0, row["eui_n"]]
+
+    per_day = qs.values(day=TruncDate("created_at")).annotate(
+        n=Count("id"),
+        energy=Sum("total_energy_month_kwh"),
+        eui=Sum("eui_month_kwh_m2"),
+        eui_n=Count("eui_month_kwh_m2"),
+        savings=Sum("energy_savings_kwh"),
+        savings_n=Count("energy_savings_kwh"),
+    )
+    for row in per_day:
+        state["daily"][row["day"].isoformat()] = [
+            row["n"], row["energy"] or 0.0, row["eui"] or 0.0, row["eui_n"],
+            row["savings"] or 0.0, row["savings_n"],
+        ]
+
+    state["top"] = _top_rows(qs)
+    return state
+
+
+def _top_rows(qs):
+    """The rows with the largest stored savings (PredictionHistory.energy_savings_kwh)."""
+    rows = (
+        qs.filter(energy_savings_kwh__isnull=False)
+        .order_by("-energy_savings_kwh", "-id")
+        .values(
+            "id", "building_type", "total_energy_month_kwh", "eui_month_kwh_m2", "performance_category",
+            "energy_savings_kwh", "energy_savings_percent", "optimized_energy_month_kwh", "created_at",
+        )
+        [:TOP_SAVINGS_LIMIT]
+    )
+    return [
+        {
+            "id": r["id"],
+            "building_type": r["building_type"],
+            "energy": r["total_energy_month_kwh"],
+            "eui": r["eui_month_kwh_m2"],
+            "category": r["performance_category"],
+            "savings_kwh": r["energy_savings_kwh"],
+            "savings_percent": r["energy_savings_percent"],
+            "optimized_energy": r["optimized_energy_month_kwh"],
+            "date": r["created_at"],
+        }
+        for r in rows
+    ]
+
+
+def _add_sums(target, source):
+    for key, values in source.items():
+        current = target.get(key)
+        target[key] = values if current is None else [a + b for a, b in zip(current, values)]
+
+
+def merge_states(base, delta):
+    merged = {
+        "histogram": [a + b for a, b in zip(base["histogram"], delta["histogram"])],
+        "categories": dict(base["categories"]),
+        "building_types": dict(base["building_types"]),
+        "daily": dict(base["daily"]),
+        "top": sorted(
+            base["top"] + delta["top"], key=lambda r: (r["savings_kwh"], r["id"]), reverse=True,
+        )[:TOP_SAVINGS_LIMIT],
+    }
+    for key, n in delta["categories"].items():
+        merged["categories"][key] = merged["categories"].get(key, 0) + n
+    _add_sums(merged["building_types"], delta["building_types"])
+    _add_sums(merged["daily"], delta["daily"])
+    return merged
+
+
+def get_state(user=None):
+    """Returns the (possibly incrementally refreshed) analytics state for a scope."""
+    qs = scope_queryset(user)
+    key = f"analytics:v{STATE_VERSION}:{user.pk if user is not None else 'all'}"
+    mark = qs.aggregate(max_id=Max("id"), n=Count("id"), changed=Max("updated_at"))
+    max_id, total, changed = mark["max_id"] or 0, mark["n"], mark["changed"]
+
+    cached = cache.get(key)
+    if cached and (cached["max_id"], cached["total"], cached.get("changed")) == (max_id, total, changed):
+        return cached["state"]
+
+    state = None
+    if cached and max_id > cached["max_id"] and cached.get("changed"):
+        new_rows = qs.filter(id__gt=cached["max_id"])
+        # Only valid if nothing older than the watermark left the scope
+        # (the counts would differ) or entered or changed in it (restores,
+        # backfills: updated_at moved past the cached mark).
+        old_changed = qs.filter(id__lte=cached["max_id"], updated_at__gt=cached["changed"]).exists()
+        if not old_changed and cached["total"] + new_rows.count() == total:
+            state = merge_states(cached["state"], _aggregate(new_rows))
+
+    if state is None:
+        state = _aggregate(qs)
+
+    cache.set(key, {"max_id": max_id, "total": total, "changed": changed, "state": state},
+              settings.ANALYTICS_CACHE_TIMEOUT)
+    return state
+
+
+# -------------------------
+# Response builders
+# -------------------------
+def eui_histogram(state):
+    bins = []
+    for i, n in enumerate(state["histogram"]):
+        low = i * EUI_BIN_WIDTH
+        bins.append({
+            "from": low,
+            "to": None if i == EUI_BIN_COUNT else low + EUI_BIN_WIDTH,
+            "count": n,
+        })
+    return bins
+
+
+def category_counts(state):
+    return dict(sorted(state["categories"].items(), key=lambda kv: -kv[1]))
+
+
+def building_type_averages(state):
+    out = []
+    for bt, (n, energy, eui, eui_n) in sorted(state["building_types"].items()):
+        out.append({
+            "building_type": bt.title(),
+            "count": n,
+            "avg_energy": round(energy / n, 2) if n else None,
+            "avg_eui": round(eui / eui_n, 2) if eui_n else None,
+        })
+    return out
+
+
+def time_series(state, period="day", days=90):
+    since = (timezone.now() - timedelta(days=days)).date()
+    buckets = {}
+    for day_iso, values in state["daily"].items():
+        day = date.fromisoformat(day_iso)
+        if day < since:
+            continue
+        if period == "week":
+            day = day - timedelta(days=day.weekday())
+        _add_sums(buckets, {day.isoformat(): values})
+
+    series = []
+    for day, (n, energy, eui, eui_n, savings, savings_n) in sorted(buckets.items()):
+        series.append({
+            "period_start": day,
+            "count": n,
+            "avg_energy": round(energy / n, 2) if n else None,
+            "avg_eui": round(eui / eui_n, 2) if eui_n else None,
+            # Stored per row (PredictionHistory.energy_savings_kwh), no model calls.
+            "avg_savings_kwh": round(savings / savings_n, 2) if savings_n else None,
+        })
+    return series
+
+
+def top_savings(state, limit=10):
+    """Rows with the biggest savings opportunity (stored energy_savings_kwh), largest first."""
+    return state["top"][:limit]
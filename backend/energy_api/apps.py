@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EnergyApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'energy_api'
+
+    def ready(self):
+        from . import signals, throttling  # noqa: F401  (throttling registers its system check)
@@ -0,0 +1,198 @@
+# energy_api/archive.py
+"""
+Cold storage for old PredictionHistory rows.
+
+Rows are moved out of the database into one gzip-compressed file per month
+(`history-YYYY-MM.json.gz` under HISTORY_ARCHIVE_DIR). Each file is columnar:
+a JSON object mapping every column name to a list of values, which keeps the
+repeated keys out of the file and lets readers filter on `user_id` without
+materialising whole rows.
+"""
+import gzip
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import COMPARISON_COLUMNS, PredictionHistory
+
+COLUMNS = [
+    "id",
+    "user_id",
+    "username",
+    "building_type",
+    "total_energy_month_kwh",
+    "eui_month_kwh_m2",
+    "performance_category",
+    "inputs",
+    "is_deleted_by_user",
+    "created_at",
+    *COMPARISON_COLUMNS,
+]
+
+DELETE_BATCH = 500
+
+# path -> (mtime, columns), least recently read first and capped at
+# HISTORY_ARCHIVE_CACHE_PARTITIONS; partitions are immutable between runs
+_partition_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def archive_dir():
+    return str(settings.HISTORY_ARCHIVE_DIR)
+
+
+def partition_path(year, month):
+    return os.path.join(archive_dir(), f"history-{year:04d}-{month:02d}.json.gz")
+
+
+def list_partitions():
+    root = archive_dir()
+    if not os.path.isdir(root):
+        return []
+    names = sorted(n for n in os.listdir(root) if n.startswith("history-") and n.endswith(".json.gz"))
+    return [os.path.join(root, n) for n in names]
+
+
+def _empty_columns():
+    return {c: [] for c in COLUMNS}
+
+
+def read_partition(path):
+    """Returns the column dict for one partition, cached until the file changes."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return _empty_columns()
+
+    with _cache_lock:
+        cached = _partition_cache.get(path)
+        if cached and cached[0] == mtime:
+            _partition_cache.move_to_end(path)
+            return cached[1]
+
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        columns = json.load(fh)
+
+    with _cache_lock:
+        _partition_cache[path] = (mtime, columns)
+        _partition_cache.move_to_end(path)
+        while len(_partition_cache) > settings.HISTORY_ARCHIVE_CACHE_PARTITIONS:
+            _partition_cache.popitem(last=False)
+    return columns
+
+
+def _write_partition(path, columns):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=9) as fh:
+        json.dump(columns, fh, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+# -------------------------
+# Write path
+# -------------------------
+def archive_queryset(queryset, dry_run=False):
+    """
+    Moves every row of `queryset` into its month partition and deletes it from
+    the database. Partitions are merged by id, so re-running after an
+    interrupted delete never duplicates rows. Returns {"YYYY-MM": count}.
+    """
+    moved = {}
+    for month in queryset.dates("created_at", "month"):
+        rows = list(
+            queryset.filter(created_at__year=month.year, created_at__month=month.month)
+            .order_by("id")
+            .values(
+                "id", "user_id", "user__username", "building_type", "total_energy_month_kwh",
+                "eui_month_kwh_m2", "performance_category", "input_set__inputs", "is_deleted_by_user", "created_at",
+                *COMPARISON_COLUMNS,
+            )
+        )
+        if not rows:
+            continue
+        moved[f"{month.year:04d}-{month.month:02d}"] = len(rows)
+        if dry_run:
+            continue
+
+        path = partition_path(month.year, month.month)
+        columns = read_partition(path) if os.path.exists(path) else _empty_columns()
+        # Partitions written before a column existed get it padded with nulls.
+        size = len(columns.get("id", []))
+        columns = {c: list(columns.get(c) or [None] * size) for c in COLUMNS}
+        known = set(columns["id"])
+
+        for r in rows:
+            if r["id"] in known:
+                continue
+            r["username"] = r.pop("user__username")
+            r["inputs"] = r.pop("input_set__inputs")
+            r["created_at"] = r["created_at"].isoformat()
+            for c in COLUMNS:
+                columns[c].append(r[c])
+
+        _write_partition(path, columns)
+
+        ids = [r["id"] for r in rows]
+        with transaction.atomic():
+            for i in range(0, len(ids), DELETE_BATCH):
+                PredictionHistory.objects.filter(id__in=ids[i:i + DELETE_BATCH]).delete()
+
+    return moved
+
+
+# -------------------------
+# Read path
+# -------------------------
+def load_archived_history(user_id=None, limit=None, offset=0):
+    """
+    Returns archived rows as history list entries, newest first, optionally
+    restricted to one user; rows of all users also carry "user". With
+    `limit`, only the partitions needed for rows offset..offset+limit are
+    read. Only the matching positions are materialised.
+    """
+    rows = []
+    skip = offset
+    for path in reversed(list_partitions()):
+        if limit is not None and len(rows) >= limit:
+            break
+        cols = read_partition(path)
+        user_ids = cols.get("user_id", [])
+        if user_id is None:
+            positions = list(range(len(user_ids)))
+        else:
+            positions = [i for i, uid in enumerate(user_ids) if uid == user_id]
+        positions.sort(key=lambda i: cols["created_at"][i], reverse=True)
+        if skip >= len(positions):
+            skip -= len(positions)
+            continue
+        positions = positions[skip:]
+        skip = 0
+        if limit is not None:
+            positions = positions[:limit - len(rows)]
+
+        missing = [None] * len(user_ids)
+        for i in positions:
+            row = {
+                "id": cols["id"][i],
+                "building_type": cols["building_type"][i],
+                "energy": cols["total_energy_month_kwh"][i],
+                "eui": cols["eui_month_kwh_m2"][i],
+                "category": cols["performance_category"][i],
+                "inputs": cols["inputs"][i],
+                "date": datetime.fromisoformat(cols["created_at"][i]),
+                "optimized_energy": cols.get("optimized_energy_month_kwh", missing)[i],
+                "savings_kwh": cols.get("energy_savings_kwh", missing)[i],
+                "savings_percent": cols.get("energy_savings_percent", missing)[i],
+                "optimized_category": cols.get("optimized_category", missing)[i] or None,
+                "recommendation_codes": cols.get("recommendation_codes", missing)[i],
+            }
+            if user_id is None:
+                row["user"] = cols["username"][i]
+            rows.append(row)
+    return rows
@@ -0,0 +1,275 @@
+# energy_api/drift.py
+"""
+Input drift monitoring on the serving path.
+
+Every scored row is folded into per-feature running statistics kept in
+process memory: count, mean and variance (Welford), min/max and a fixed-bin
+histogram over FEATURE_RANGES with one bin below and one above the range.
+That is a few arithmetic operations per feature under a lock. Every
+DRIFT_FLUSH_SECONDS the pending counters are merged into FeatureDriftStats
+(Chan et al.'s parallel form of Welford), so all workers add up to one
+profile. Drift is scored against the newest DriftReference with the
+population stability index (PSI) per feature over the histogram bins.
+"""
+import atexit
+import logging
+import math
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import DriftReference, FeatureDriftStats
+from .validation import to_number
+
+logger = logging.getLogger(__name__)
+
+# PSI rules of thumb: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 significant.
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+PSI_EPSILON = 1e-4
+
+
+class RunningStats:
+    __slots__ = ("count", "mean", "m2", "minimum", "maximum", "histogram")
+
+    def __init__(self, bins, count=0, mean=0.0, m2=0.0, minimum=None, maximum=None, histogram=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+        self.histogram = list(histogram) if histogram else [0] * (bins + 2)
+
+    def add(self, x, bin_index):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if self.minimum is None or x < self.minimum:
+            self.minimum = x
+        if self.maximum is None or x > self.maximum:
+            self.maximum = x
+        self.histogram[bin_index] += 1
+
+    def merge(self, other):
+        if not other.count:
+            return
+        if not self.count:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.minimum, self.maximum = other.minimum, other.maximum
+        else:
+            total = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / total
+            self.m2 += other.m2 + delta * delta * self.count * other.count / total
+            self.count = total
+            self.minimum = min(self.minimum, other.minimum)
+            self.maximum = max(self.maximum, other.maximum)
+        if len(self.histogram) != len(other.histogram):
+            # Bin layout changed (DRIFT_HISTOGRAM_BINS); restart the histogram.
+            self.histogram = [0] * len(other.histogram)
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    @property
+    def out_of_range(self):
+        return self.histogram[0] + self.histogram[-1]
+
+
+def feature_specs():
+    """(feature, low, high, bin_width, bins) for every monitored feature."""
+    from .views.inference import FEATURE_RANGES
+
+    bins = settings.DRIFT_HISTOGRAM_BINS
+    return [(f, float(lo), float(hi), (hi - lo) / bins, bins) for f, (lo, hi) in FEATURE_RANGES.items()]
+
+
+class DriftMonitor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._specs = None
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def specs(self):
+        if self._specs is None:
+            self._specs = feature_specs()
+        return self._specs
+
+    def observe(self, values):
+        """
+        Records one input row. `values` maps feature -> number; missing or
+        non-numeric features are skipped.
+        """
+        if not settings.DRIFT_MONITORING:
+            return
+        with self._lock:
+            for feature, low, high, width, bins in self.specs():
+                x = values.get(feature)
+                if x is None or x != x:
+                    continue
+                if x < low:
+                    index = 0
+                elif x > high:
+                    index = bins + 1
+                else:
+                    index = 1 + min(int((x - low) / width), bins - 1) if width else 1
+                stats = self._pending.get(feature)
+                if stats is None:
+                    stats = self._pending[feature] = RunningStats(bins)
+                stats.add(x, index)
+            due = time.monotonic() - self._last_flush >= settings.DRIFT_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Merges pending counters into FeatureDriftStats. Never raises. Called
+        from observe() every DRIFT_FLUSH_SECONDS and when a worker exits.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        try:
+            with transaction.atomic():
+                for feature, delta in pending.items():
+                    record, _ = FeatureDriftStats.objects.select_for_update().get_or_create(feature=feature)
+                    stats = stats_from_record(record, len(delta.histogram) - 2)
+                    stats.merge(delta)
+                    record.count, record.mean, record.m2 = stats.count, stats.mean, stats.m2
+                    record.minimum, record.maximum = stats.minimum, stats.maximum
+                    record.histogram = stats.histogram
+                    record.save()
+        except Exception:
+            # Monitoring must never fail a prediction; the counters are lost.
+            logger.exception("Could not flush drift statistics")
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def reset(self):
+        with self._lock:
+            self._pending = {}
+            self._specs = None
+            self._last_flush = time.monotonic()
+
+
+monitor = DriftMonitor()
+
+# Counters observed since the last flush would otherwise be lost when the
+# process exits (gunicorn workers also flush in worker_exit).
+atexit.register(monitor.flush)
+
+if hasattr(os, "register_at_fork"):
+    # Counters collected in a preloaded parent must not be flushed twice.
+    os.register_at_fork(after_in_child=monitor.reset)
+
+
+def observe_row(features, row):
+    """Records a validated, encoded model row."""
+    monitor.observe(dict(zip(features, row)))
+
+
+def observe_payload(data):
+    """Records the numeric values of a rejected payload (out-of-range inputs land here)."""
+    if isinstance(data, Mapping):
+        monitor.observe({f: to_number(data.get(f)) for f, *_ in monitor.specs()})
+
+
+def stats_from_record(record, bins):
+    return RunningStats(
+        bins, count=record.count, mean=record.mean, m2=record.m2,
+        minimum=record.minimum, maximum=record.maximum, histogram=record.histogram,
+    )
+
+
+def current_stats():
+    """Flushed statistics of every worker, {feature: RunningStats}."""
+    bins = settings.DRIFT_HISTOGRAM_BINS
+    return {r.feature: stats_from_record(r, bins) for r in FeatureDriftStats.objects.all()}
+
+
+def profile_from_stats(stats):
+    """JSON-able profile, the shape stored in DriftReference.profile."""
+    return {
+        feature: {
+            "count": s.count,
+            "mean": s.mean,
+            "std": s.std,
+            "histogram": s.histogram,
+        }
+        for feature, s in stats.items()
+    }
+
+
+def psi(expected, actual):
+    """Population stability index between two histograms with the same bins."""
+    e_total, a_total = sum(expected), sum(actual)
+    if not e_total or not a_total or len(expected) != len(actual):
+        return None
+    score = 0.0
+    for e, a in zip(expected, actual):
+        e = max(e / e_total, PSI_EPSILON)
+        a = max(a / a_total, PSI_EPSILON)
+        score += (a - e) * math.log(a / e)
+    return score
+
+
+def drift_level(score):
+    if score is None:
+        return "unknown"
+    if score >= PSI_SIGNIFICANT:
+        return "significant"
+    if score >= PSI_MODERATE:
+        return "moderate"
+    return "stable"
+
+
+def drift_report():
+    stats = current_stats()
+    reference = DriftReference.objects.order_by("-created_at", "-id").first()
+    ref_profile = reference.profile if reference else {}
+
+    features = {}
+    worst = None
+    for feature, low, high, _, _ in monitor.specs():
+        s = stats.get(feature)
+        ref = ref_profile.get(feature)
+        entry = {
+            "range": [low, high],
+            "count": s.count if s else 0,
+            "mean": s.mean if s else None,
+            "std": s.std if s else None,
+            "min": s.minimum if s else None,
+            "max": s.maximum if s else None,
+            "out_of_range_rate": round(s.out_of_range / s.count, 4) if s and s.count else None,
+            "histogram": s.histogram if s else [],
+            "psi": None,
+            "mean_shift_std": None,
+        }
+        if s and ref:
+            entry["psi"] = psi(ref["histogram"], s.histogram)
+            if ref.get("std"):
+                entry["mean_shift_std"] = round((s.mean - ref["mean"]) / ref["std"], 3)
+        entry["level"] = drift_level(entry["psi"])
+        if entry["psi"] is not None:
+            entry["psi"] = round(entry["psi"], 4)
+            worst = entry["psi"] if worst is None else max(worst, entry["psi"])
+        features[feature] = entry
+
+    return {
+        "reference": {"id": reference.id, "note": reference.note, "created_at": reference.created_at} if reference else None,
+        "drift_score": worst,
+        "level": drift_level(worst),
+        "features": features,
+    }
@@ -0,0 +1,145 @@
+# energy_api/ensemble.py
+"""
+Tree-level scoring for the XGBoost energy model.
+
+TreeEnsemble turns the booster's trees into two lookup tables, leaf value
+and leaf cover (training rows that reached the leaf), indexed by
+[tree, node]. One `pred_leaf` call then gives, for a whole batch:
+
+* the prediction: base_score plus the sum of the leaf values the row
+  reached, identical to model.predict;
+* a spread: how much the late boosting rounds still correct this region
+  of the input space. Each late leaf value is eta times the mean residual
+  left in that leaf, so RMS(late leaf values) / eta estimates the local
+  residual scale. Well-fitted regions get small corrections; sparse or
+  conflicting regions keep getting large ones;
+* support: the smallest leaf cover on the row's path. Few training rows
+  behind a leaf means the model is close to extrapolating.
+
+The interval is prediction +- z * spread for UNCERTAINTY_LEVEL. This is a
+heuristic from the fitted trees, not a calibrated quantile model.
+
+`contributions` is the explanation pass: one `pred_contribs` call gives
+exact TreeSHAP values per feature plus the bias term, and their row sum is
+the prediction, so it also replaces model.predict. The scaler is a
+per-column affine map, so the contribution of scaled column j belongs
+one-to-one to raw input feature j.
+"""
+import json
+from statistics import NormalDist
+
+import numpy as np
+from django.conf import settings
+
+
+def _find_param(config, name):
+    """First value of `name` anywhere in a nested booster config dict."""
+    if isinstance(config, dict):
+        if name in config:
+            return config[name]
+        for value in config.values():
+            found = _find_param(value, name)
+            if found is not None:
+                return found
+    return None
+
+
+class TreeEnsemble:
+    def __init__(self, booster):
+        config = json.loads(booster.save_config())
+        if config["learner"]["gradient_booster"]["name"] != "gbtree":
+            raise ValueError("Tree-level scoring needs a gbtree booster")
+
+        self.booster = booster
+        self.feature_names = booster.feature_names
+        self.base_score = float(config["learner"]["learner_model_param"]["base_score"])
+        self.eta = float(_find_param(config["learner"]["gradient_booster"], "eta") or 0.3)
+
+        trees = booster.trees_to_dataframe()
+        leaves = trees[trees["Feature"] == "Leaf"]
+        self.n_trees = int(trees["Tree"].max()) + 1
+        n_nodes = int(trees["Node"].max()) + 1
+        # For leaf rows trees_to_dataframe reports the leaf value as "Gain".
+        self.values = np.zeros((self.n_trees, n_nodes))
+        self.cover = np.zeros((self.n_trees, n_nodes))
+        self.values[leaves["Tree"], leaves["Node"]] = leaves["Gain"]
+        self.cover[leaves["Tree"], leaves["Node"]] = leaves["Cover"]
+        self._trees = np.arange(self.n_trees)
+
+    @property
+    def nbytes(self):
+        """Size of the lookup tables (the booster itself is the cached model)."""
+        return self.values.nbytes + self.cover.nbytes + self._trees.nbytes
+
+    def dmatrix(self, scaled):
+        import xgboost as xgb
+
+        return xgb.DMatrix(np.asarray(scaled, dtype=np.float32), feature_names=self.feature_names)
+
+    def score(self, scaled):
+        """
+        Returns (yearly, spread, support) arrays for already scaled rows,
+        all from a single pred_leaf call.
+        """
+        leaves = self.booster.predict(self.dmatrix(scaled), pred_leaf=True)
+        leaves = np.asarray(leaves, dtype=np.intp).reshape(len(scaled), self.n_trees)
+        per_tree = self.values[self._trees, leaves]
+        yearly = self.base_score + per_tree.sum(axis=1)
+
+        late = per_tree[:, -max(1, round(self.n_trees * settings.UNCERTAINTY_LATE_FRACTION)):]
+        spread = np.sqrt(np.mean(late ** 2, axis=1)) / self.eta
+        support = self.cover[self._trees, leaves].min(axis=1)
+        return yearly, spread, support
+
+
+    def contributions(self, scaled):
+        """
+        Returns (yearly, contributions, baseline) for already scaled rows:
+        contributions is (n_rows, n_features) in feature order, baseline the
+        bias term (the model's average output).
+        """
+        contribs = self.booster.predict(self.dmatrix(scaled), pred_contribs=True)
+        contribs = np.asarray(contribs, dtype=np.float64).reshape(len(scaled), -1)
+        return contribs.sum(axis=1), contribs[:, :-1], contribs[:, -1]
+
+
+def explanation(features, values, contributions, baseline):
+    """
+    The "explanation" block of a prediction response: per raw input feature,
+    its value and how many kWh/month it adds to (or removes from) the
+    model's baseline, largest effect first.
+    """
+    items = [
+        {"feature": f, "value": values.get(f), "month_kwh": round(float(c) / 12.0, 2)}
+        for f, c in zip(features, contributions)
+    ]
+    items.sort(key=lambda item: abs(item["month_kwh"]), reverse=True)
+    return {"baseline_month_kwh": round(float(baseline) / 12.0, 2), "contributions": items}
+
+
+def rank_by_impact(found, features, contributions):
+    """
+    Orders (feature, issue, recommendation) tuples by the kWh/month the
+    model attributes to that feature, biggest energy driver first, and
+    returns them as dicts with the impact attached.
+    """
+    impact = {f: float(c) / 12.0 for f, c in zip(features, contributions)}
+    ranked = sorted(found, key=lambda item: impact.get(item[0], 0.0), reverse=True)
+    return [
+        {"feature": f, "issue": issue, "recommendation": rec, "impact_month_kwh": round(impact.get(f, 0.0), 2)}
+        for f, issue, rec in ranked
+    ]
+
+
+def interval(monthly, spread_monthly, support):
+    """The "uncertainty" block of a prediction response (monthly kWh)."""
+    level = settings.UNCERTAINTY_LEVEL
+    half = NormalDist().inv_cdf(0.5 + level / 2) * spread_monthly
+    return {
+        "level": level,
+        "low_month_kwh": round(max(0.0, monthly - half), 2),
+        "high_month_kwh": round(monthly + half, 2),
+        "spread_month_kwh": round(spread_monthly, 2),
+        "support": int(support),
+        "low_support": support < settings.UNCERTAINTY_MIN_SUPPORT,
+    }
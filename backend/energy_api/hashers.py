@@ -0,0 +1,23 @@
+# energy_api/hashers.py
+from django.conf import settings
+from django.contrib.auth.hashers import ScryptPasswordHasher
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """
+    scrypt with cost parameters taken from settings (PASSWORD_SCRYPT_*), so
+    they can be re-tuned per deployment with benchmarks/login_throughput.py.
+    Hashes made with other parameters are upgraded on the next login.
+    """
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT_PARALLELISM
@@ -0,0 +1,176 @@
+# energy_api/history_buffer.py
+"""
+Write-behind buffering of PredictionHistory inserts (HISTORY_WRITE_BEHIND).
+
+/predict/ hands its history row to `writer.add()` instead of inserting it.
+Rows wait in a bounded in-process buffer and a background thread inserts
+them with one bulk_create once HISTORY_FLUSH_ROWS are waiting or the oldest
+has waited HISTORY_FLUSH_MS. The request only pays for the quota UPDATE,
+which stays synchronous (Subscription.take_predictions).
+
+Semantics:
+
+* Bounded: past HISTORY_BUFFER_SIZE rows, add() inserts the row inline, so
+  a stalled database slows requests down instead of growing memory.
+* Durability: rows are in memory until flushed. A worker that is killed
+  (SIGKILL, OOM, crash) loses at most the rows buffered at that moment;
+  their predictions were already charged to the quota. A clean shutdown
+  drains the buffer: close() runs from gunicorn's worker_exit hook and at
+  interpreter exit.
+* created_at is set when the row is inserted, at most HISTORY_FLUSH_MS
+  (plus the insert itself) after the prediction.
+* A locked or busy database is retried with backoff. A batch the database
+  rejects is retried row by row, so one bad row does not drop the others;
+  rows that still fail are logged and dropped.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+from .models import PredictionHistory
+
+logger = logging.getLogger(__name__)
+
+INSERT_ATTEMPTS = 4
+
+
+class HistoryWriter:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._rows = deque()
+        self._oldest = None
+        self._in_flight = 0
+        self._thread = None
+        self._closed = False
+
+    def add(self, record):
+        """Queues an unsaved PredictionHistory row (written inline when the buffer is full)."""
+        # bulk_create skips save(), so fill the typed columns here.
+        record.fill_feature_columns()
+        with self._cond:
+            if not self._closed and len(self._rows) < settings.HISTORY_BUFFER_SIZE:
+                if not self._rows:
+                    self._oldest = time.monotonic()
+                self._rows.append(record)
+                self._start()
+                # Wake the writer to start the flush timer or to flush a full batch.
+                if len(self._rows) == 1 or len(self._rows) >= settings.HISTORY_FLUSH_ROWS:
+                    self._cond.notify_all()
+                return
+        self._write([record])
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+            self._thread.start()
+
+    def _take_batch(self):
+        """Waits until a batch is due; returns it ([] once closed and empty)."""
+        with self._cond:
+            while True:
+                if self._thread is not threading.current_thread():
+                    return []  # replaced by reset()
+                if self._rows:
+                    due = self._oldest + settings.HISTORY_FLUSH_MS / 1000.0 - time.monotonic()
+                    if self._closed or len(self._rows) >= settings.HISTORY_FLUSH_ROWS or due <= 0:
+                        break
+                    self._cond.wait(due)
+                elif self._closed:
+                    return []
+                else:
+                    self._cond.wait()
+            batch = [self._rows.popleft() for _ in range(min(len(self._rows), settings.HISTORY_FLUSH_ROWS))]
+            self._oldest = time.monotonic() if self._rows else None
+            self._in_flight += len(batch)
+            return batch
+
+    def _run(self):
+        try:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return
+                try:
+                    self._write(batch)
+                finally:
+                    with self._cond:
+                        self._in_flight -= len(batch)
+                        self._cond.notify_all()
+        finally:
+            connection.close()
+
+    def _insert(self, records):
+        for attempt in range(INSERT_ATTEMPTS):
+            try:
+                PredictionHistory.objects.bulk_create(records)
+                return
+            except OperationalError:
+                # Locked or busy database: back off and try again.
+                if attempt == INSERT_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.05 * 2 ** attempt)
+
+    def _write(self, records):
+        try:
+            self._insert(records)
+            return
+        except Exception:
+            logger.exception("Bulk insert of %d history rows failed; retrying row by row", len(records))
+        for record in records:
+            try:
+                self._insert([record])
+            except Exception:
+                logger.exception("Dropped history row for user %s", record.user_id)
+
+    def flush(self, timeout=None):
+        """
+        Writes every buffered row now, in the calling thread, and waits for
+        a batch the background thread is writing. Returns True when nothing
+        is left pending.
+        """
+        with self._cond:
+            batch = list(self._rows)
+            self._rows.clear()
+            self._oldest = None
+        if batch:
+            self._write(batch)
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._in_flight, timeout)
+
+    def close(self, timeout=30):
+        """Drains the buffer and stops the thread; later rows are written inline."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        return self.flush(timeout)
+
+    def pending(self):
+        with self._cond:
+            return len(self._rows) + self._in_flight
+
+    def reset(self):
+        """Discards buffered rows (tests; a forked child starts empty)."""
+        self._cond = threading.Condition()
+        self._rows = deque()
+        self._oldest = None
+        self._in_flight = 0
+        self._thread = None
+        self._closed = False
+
+
+writer = HistoryWriter()
+
+atexit.register(writer.close)
+
+if hasattr(os, "register_at_fork"):
+    # The parent's buffer and thread do not exist in the child.
+    os.register_at_fork(after_in_child=writer.reset)
@@ -0,0 +1,198 @@
+# energy_api/jobs.py
+"""
+Bulk prediction jobs.
+
+Uploads are parsed into a list of input dicts and stored on a PredictionJob.
+`manage.py run_prediction_worker` claims queued jobs and scores them in chunks
+through `predict_batch`; every chunk is committed together with its
+PredictionHistory rows and the job's `processed_rows` cursor, so a worker that
+dies mid-job loses at most one uncommitted chunk and the next worker resumes
+from the cursor once the job's heartbeat goes stale.
+"""
+import csv
+import io
+import json
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import PredictionHistory, PredictionJob, Subscription
+
+MAX_STORED_ERRORS = 1000
+
+
+class JobOwnershipLost(Exception):
+    """Raised when another worker has taken over a job mid-run."""
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# -------------------------
+# Upload parsing
+# -------------------------
+def parse_upload(upload):
+    """
+    Reads an uploaded CSV or JSON file into a list of input dicts.
+    CSV needs a header row with the feature names; JSON may be a list of
+    objects or {"rows": [...]}. Raises ValueError on unreadable files.
+    """
+    name = (getattr(upload, "name", "") or "").lower()
+    raw = upload.read()
+    try:
+        text = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("File must be UTF-8 encoded")
+
+    if name.endswith(".json"):
+        try:
+            payload = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if isinstance(payload, dict):
+            payload = payload.get("rows")
+        if not isinstance(payload, list) or not all(isinstance(r, dict) for r in payload):
+            raise ValueError("JSON upload must be a list of objects")
+        return payload
+
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames:
+        raise ValueError("CSV upload needs a header row")
+    rows = []
+    for record in reader:
+        rows.append({
+            (k or "").strip(): (v.strip() if isinstance(v, str) else v)
+            for k, v in record.items()
+            if k
+        })
+    return rows
+
+
+# -------------------------
+# Worker side
+# -------------------------
+def _claimable(now):
+    stale = now - timedelta(seconds=settings.PREDICTION_JOB_STALE_SECONDS)
+    return Q(status="queued") | Q(status="running", heartbeat_at__lt=stale)
+
+
+def claim_next_job(worker_id):
+    """
+    Atomically takes ownership of the oldest queued job, or of a running job
+    whose worker stopped sending heartbeats. Returns the job or None.
+    """
+    now = timezone.now()
+    candidates = (
+        PredictionJob.objects.filter(_claimable(now))
+        .order_by("created_at")
+        .values_list("pk", flat=True)[:10]
+    )
+    for pk in candidates:
+        claimed = PredictionJob.objects.filter(_claimable(now), pk=pk).update(
+            status="running", worker_id=worker_id, heartbeat_at=now
+        )
+        if claimed:
+            return PredictionJob.objects.select_related("user").get(pk=pk)
+    return None
+
+
+def process_next_chunk(job, worker_id, chunk_size=None):
+    """
+    Scores the next chunk of `job` and commits it. Returns True when the job
+    has no rows left, False when more chunks remain.
+    Raises JobOwnershipLost if another worker took the job over.
+    """
+    # Imported here so the worker only loads the model once it has work.
+    from .views.inference import predict_batch
+
+    chunk_size = chunk_size or settings.PREDICTION_JOB_CHUNK_SIZE
+    start = job.processed_rows
+    chunk = job.rows[start:start + chunk_size]
+
+    results, errors = predict_batch(chunk, compare=True, cache=True)
+    for err in errors:
+        err["row"] += start
+
+    end = start + len(chunk)
+    stored_errors = (job.errors + errors)[:MAX_STORED_ERRORS]
+    done = end >= job.total_rows
+    now = timezone.now()
+
+    with transaction.atomic():
+        fields = {
+            "processed_rows": end,
+            "failed_rows": F("failed_rows") + len(errors),
+            "errors": stored_errors,
+            "heartbeat_at": now,
+        }
+        if done:
+            fields.update(status="completed", finished_at=now, rows=[])
+
+        owned = PredictionJob.objects.filter(
+            pk=job.pk, worker_id=worker_id, processed_rows=start
+        ).update(**fields)
+        if not owned:
+            raise JobOwnershipLost(f"Lost ownership of job {job.pk}")
+
+        records = []
+        for r in results:
+            record = PredictionHistory(
+                user_id=job.user_id,
+                job_id=job.pk,
+                building_type=r["building_type"],
+                total_energy_month_kwh=r["total_energy_month_kwh"],
+                eui_month_kwh_m2=r["eui_month_kwh_m2"],
+                performance_category=r["performance_category"],
+                inputs=r["inputs"],
+            )
+            # bulk_create skips save(), so fill the typed columns here.
+            record.fill_feature_columns()
+            record.set_comparison(r["optimized"], r["recommendation_codes"])
+            records.append(record)
+        PredictionHistory.objects.bulk_create(records)
+
+        if errors:
+            give_back_predictions(job, len(errors))
+
+    job.processed_rows = end
+    job.failed_rows += len(errors)
+    job.errors = stored_errors
+    if done:
+        job.status = "completed"
+        job.finished_at = now
+        job.rows = []
+    return done
+
+
+def give_back_predictions(job, n):
+    """Returns `n` of the predictions reserved for `job` to the user's quota."""
+    if job.reserved_predictions and n > 0:
+        Subscription.objects.filter(user_id=job.user_id, remaining_predictions__isnull=False).update(
+            remaining_predictions=F("remaining_predictions") + n
+        )
+
+
+def run_job(job, worker_id, chunk_size=None):
+    """Processes a claimed job to completion, marking it failed on errors."""
+    try:
+        while not process_next_chunk(job, worker_id, chunk_size):
+            pass
+    except JobOwnershipLost:
+        # Another worker owns the job now; leave it alone.
+        raise
+    except Exception as e:
+        with transaction.atomic():
+            failed = PredictionJob.objects.filter(pk=job.pk, worker_id=worker_id, status="running").update(
+                status="failed",
+                finished_at=timezone.now(),
+                errors=(job.errors + [{"row": None, "error": str(e)}])[:MAX_STORED_ERRORS],
+            )
+            if failed:
+                give_back_predictions(job, job.total_rows - job.processed_rows)
+        raise
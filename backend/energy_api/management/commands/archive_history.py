@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from energy_api.archive import archive_queryset
+from energy_api.models import HistoryArchiveRun, PredictionHistory, PredictionInput
+
+
+class Command(BaseCommand):
+    help = "Move old or user-deleted prediction history into monthly compressed archive files."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.HISTORY_RETENTION_DAYS,
+                            help="Archive rows older than this many days (default: HISTORY_RETENTION_DAYS).")
+        parser.add_argument("--keep-deleted", action="store_true",
+                            help="Do not archive recent rows hidden by their users "
+                                 "(hidden rows are kept HISTORY_SYNC_TOMBSTONE_DAYS either way).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only report what would be archived.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        cutoff = now - timedelta(days=options["days"])
+        condition = Q(created_at__lt=cutoff)
+        if not options["keep_deleted"]:
+            # Recently hidden rows are the tombstones /api/history/changes/
+            # reports; they go once no valid sync cursor can predate them.
+            tombstone_cutoff = now - timedelta(days=settings.HISTORY_SYNC_TOMBSTONE_DAYS)
+            condition |= Q(is_deleted_by_user=True, updated_at__lt=tombstone_cutoff)
+
+        moved = archive_queryset(PredictionHistory.objects.filter(condition), dry_run=options["dry_run"])
+
+        verb = "Would archive" if options["dry_run"] else "Archived"
+        for month, count in sorted(moved.items()):
+            self.stdout.write(f"{verb} {count} rows into {month}")
+        self.stdout.write(self.style.SUCCESS(f"{verb} {sum(moved.values())} rows in total"))
+
+        if not options["dry_run"]:
+            # Sync clients drop cached rows created before the latest cutoff.
+            HistoryArchiveRun.objects.create(cutoff=cutoff, archived_rows=sum(moved.values()))
+
+            # Inputs are shared between rows, so they can only go once no
+            # history row refers to them. The hour spares inputs whose
+            # history row is still being written.
+            removed = PredictionInput.delete_orphans(created_before=now - timedelta(hours=1))
+            self.stdout.write(f"Removed {removed} unused prediction inputs")
@@ -0,0 +1,101 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from energy_api.models import COMPARISON_COLUMNS, FEATURE_COLUMNS, PredictionHistory
+
+
+def update_rows(records):
+    """
+    Writes the comparison columns of `records` with one executemany. Profiling
+    a 10k-row backfill on SQLite put ~90% of the time in bulk_update building
+    its CASE WHEN expressions; a parameterised UPDATE per row avoids that.
+    """
+    fields = [PredictionHistory._meta.get_field(name) for name in [*COMPARISON_COLUMNS, "comparison_skipped"]]
+    # A raw UPDATE skips auto_now; bump updated_at so synced clients refetch the rows.
+    updated_at = PredictionHistory._meta.get_field("updated_at")
+    fields.append(updated_at)
+    now = timezone.now()
+    quote = connection.ops.quote_name
+    sql = "UPDATE {} SET {} WHERE {} = %s".format(
+        quote(PredictionHistory._meta.db_table),
+        ", ".join(f"{quote(f.column)} = %s" for f in fields),
+        quote(PredictionHistory._meta.pk.column),
+    )
+    params = [
+        [f.get_db_prep_save(getattr(record, f.attname), connection) for f in fields[:-1]]
+        + [updated_at.get_db_prep_save(now, connection), record.pk]
+        for record in records
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the stored current-vs-optimized comparison (optimized energy, savings, "
+        "optimized category, recommendation codes) for history rows that lack it, "
+        "one vectorized model call per batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000,
+                            help="Rows scored and updated per batch.")
+        parser.add_argument("--all", action="store_true",
+                            help="Recompute every row, e.g. after a model update.")
+
+    def handle(self, *args, **options):
+        # Imported here so the command only loads the model once it runs.
+        from energy_api.views.inference import (
+            get_feature_recommendations, get_schema, load_all, optimize_batch, recommendation_codes,
+        )
+
+        _, _, _, features = load_all()
+        schema = get_schema()
+        queryset = PredictionHistory.objects.all()
+        if not options["all"]:
+            queryset = queryset.filter(recommendation_codes__isnull=True, comparison_skipped=False)
+        queryset = queryset.order_by("id").only(
+            "id", "building_type", "total_energy_month_kwh", "input_set", *FEATURE_COLUMNS.values()
+        )
+
+        started = time.perf_counter()
+        updated = skipped = 0
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:options["batch_size"]])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            valid, errors = schema.validate_many([h.feature_inputs() for h in batch])
+            if errors:
+                # Marked, so the next run does not select them again.
+                invalid = [batch[e["row"]] for e in errors]
+                PredictionHistory.objects.filter(pk__in=[h.pk for h in invalid]).update(comparison_skipped=True)
+                for h, e in zip(invalid, errors):
+                    self.stdout.write(self.style.WARNING(f"Skipped row {h.pk}: {e['error']}"))
+                skipped += len(errors)
+            if not valid:
+                continue
+
+            records = [batch[i] for i, _, _ in valid]
+            rows = [row for _, _, row in valid]
+            # Savings are relative to the energy recorded on the row.
+            optimized = optimize_batch(rows, [h.total_energy_month_kwh for h in records])
+            for record, row, result in zip(records, rows, optimized):
+                found = get_feature_recommendations(dict(zip(features, row)))
+                record.set_comparison(result, recommendation_codes(found))
+                record.comparison_skipped = False
+            update_rows(records)
+            updated += len(records)
+            self.stdout.write(f"Updated {updated} rows (up to id {last_id})")
+
+        elapsed = time.perf_counter() - started
+        rate = updated / elapsed if elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled {updated} rows in {elapsed:.1f}s ({rate:.0f} rows/s); "
+            f"skipped {skipped} with invalid inputs"
+        ))
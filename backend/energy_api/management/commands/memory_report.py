@@ -0,0 +1,56 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from energy_api import memory
+
+
+def megabytes(value):
+    return "n/a" if value is None else f"{value / (1024 * 1024):.1f} MB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Report process memory for sizing workers: RSS, the model cache and, with "
+        "--profile, tracemalloc top allocators of one sample prediction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profile", action="store_true",
+                            help="Load the model and profile one sample prediction.")
+        parser.add_argument("--json", action="store_true", help="Print the full report as JSON.")
+
+    def handle(self, *args, **options):
+        from energy_api.views import sample_prediction
+
+        profile = None
+        if options["profile"]:
+            sample_prediction()  # cold: loads the model, recorded in load_rss
+            _, profile = memory.profile_call(sample_prediction, top=settings.MEMORY_PROFILE_TOP)
+
+        report = memory.report()
+        if profile:
+            report["sample_profile"] = profile
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"pid {report['pid']}: rss {megabytes(report['rss'])}, peak {megabytes(report['peak_rss'])}")
+        for worker in report["workers"]:
+            if not worker["current"]:
+                self.stdout.write(
+                    f"  worker {worker['pid']}: rss {megabytes(worker['rss'])}, pss {megabytes(worker.get('pss'))}"
+                )
+        for name, delta in report["load_rss"].items():
+            self.stdout.write(f"  loading {name} added {megabytes(delta)} RSS")
+        for key, entry in report["loaded"].items():
+            size = "not loaded" if entry["type"] is None else f"{entry['type']}, {entry['bytes']} bytes"
+            self.stdout.write(f"  _loaded[{key!r}]: {size}")
+        self.stdout.write(f"  heavy modules imported: {', '.join(report['heavy_modules']) or 'none'}")
+        if profile:
+            self.stdout.write(
+                f"sample prediction: {profile['net_bytes']} bytes retained, {profile['peak_bytes']} bytes peak"
+            )
+            for item in profile["top"]:
+                self.stdout.write(f"  {item['size_diff']:>8} B  {item['count_diff']:>4}  {item['where']}")
@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from energy_api.models import PasswordResetOTP
+
+
+class Command(BaseCommand):
+    help = "Delete password reset codes that have expired (run periodically, e.g. from cron)."
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=settings.PASSWORD_RESET_OTP_EXPIRY_SECONDS)
+        deleted, _ = PasswordResetOTP.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired OTPs"))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from energy_api.jobs import JobOwnershipLost, claim_next_job, default_worker_id, run_job
+
+
+class Command(BaseCommand):
+    help = "Process queued bulk prediction jobs (database-backed worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=None,
+                            help="Rows per transaction (default: PREDICTION_JOB_CHUNK_SIZE).")
+        parser.add_argument("--poll-interval", type=float, default=2.0,
+                            help="Seconds to sleep when there is no work.")
+        parser.add_argument("--once", action="store_true",
+                            help="Drain the queue once and exit instead of polling forever.")
+
+    def handle(self, *args, **options):
+        worker_id = default_worker_id()
+        self.stdout.write(f"Prediction worker {worker_id} started")
+
+        while True:
+            job = claim_next_job(worker_id)
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+                continue
+
+            self.stdout.write(f"Job {job.pk}: resuming at row {job.processed_rows}/{job.total_rows}")
+            try:
+                run_job(job, worker_id, options["chunk_size"])
+            except JobOwnershipLost as e:
+                self.stderr.write(str(e))
+                continue
+            except Exception as e:
+                self.stderr.write(f"Job {job.pk} failed: {e}")
+                continue
+
+            self.stdout.write(self.style.SUCCESS(
+                f"Job {job.pk}: done ({job.processed_rows - job.failed_rows} ok, {job.failed_rows} failed)"
+            ))
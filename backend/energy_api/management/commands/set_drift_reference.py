@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from energy_api import drift
+from energy_api.models import DriftReference, FeatureDriftStats
+
+
+class Command(BaseCommand):
+    help = (
+        "Store the reference input profile that /api/admin/drift/ scores against: "
+        "either a JSON profile (e.g. computed from the training data) or a snapshot "
+        "of the statistics collected so far."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", help="JSON file of {feature: {count, mean, std, histogram}}.")
+        parser.add_argument("--note", default="", help="Free-text label, e.g. the model version.")
+        parser.add_argument("--reset", action="store_true",
+                            help="Clear the collected statistics after taking the snapshot.")
+
+    def handle(self, *args, **options):
+        if options["file"]:
+            with open(options["file"]) as fh:
+                profile = json.load(fh)
+            if not isinstance(profile, dict):
+                raise CommandError("Profile must be a JSON object keyed by feature")
+        else:
+            profile = drift.profile_from_stats(drift.current_stats())
+            if not profile:
+                raise CommandError("No statistics collected yet; pass --file instead")
+
+        reference = DriftReference.objects.create(profile=profile, note=options["note"])
+        if options["reset"]:
+            FeatureDriftStats.objects.all().delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored drift reference {reference.id} with {len(profile)} features"
+        ))
@@ -0,0 +1,235 @@
+# energy_api/memory.py
+"""
+Memory instrumentation for sizing workers.
+
+* RSS of this process and of its sibling workers (the other children of the
+  same gunicorn master), read from /proc. PSS and private memory come from
+  smaps_rollup: with a preloaded app, pages shared copy-on-write with the
+  master count once in the container total, so PSS is the number to add up.
+* Size of every object in the views' `_loaded` cache, and how much RSS the
+  first model load added.
+* tracemalloc top allocators of a sampled /predict/ call. Every
+  MEMORY_PROFILE_EVERY-th call in a worker runs traced (0 disables it);
+  the latest profile is kept in process memory. tracemalloc is process
+  wide, so allocations of concurrent requests in other threads land in the
+  same snapshot.
+"""
+import functools
+import os
+import pickle
+import resource
+import sys
+import threading
+import tracemalloc
+
+from django.conf import settings
+
+# Loaded on first use by the views; see benchmarks/import_time.py.
+HEAVY_MODULES = ("pandas", "numpy", "joblib", "sklearn", "xgboost", "razorpay", "sendgrid")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+_lock = threading.Lock()
+_calls = {}
+profiles = {}
+load_rss = {}
+
+
+# -------------------------
+# Process memory
+# -------------------------
+def rss_bytes(pid="self"):
+    """Resident set size of a process, None when /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/statm") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def smaps_rollup(pid="self"):
+    """{"rss", "pss", "shared", "private"} in bytes, {} without smaps_rollup."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as fh:
+            for line in fh:
+                key, _, rest = line.partition(":")
+                parts = rest.split()
+                if len(parts) == 2 and parts[1] == "kB":
+                    fields[key] = int(parts[0]) * 1024
+    except OSError:
+        return {}
+    return {
+        "rss": fields.get("Rss"),
+        "pss": fields.get("Pss"),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def _cmdline(pid):
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as fh:
+            return fh.read()
+    except OSError:
+        return None
+
+
+def sibling_pids():
+    """PIDs of the processes forked from our parent with our command line."""
+    parent = os.getppid()
+    try:
+        with open(f"/proc/{parent}/task/{parent}/children") as fh:
+            children = [int(p) for p in fh.read().split()]
+    except OSError:
+        return [os.getpid()]
+    own = _cmdline(os.getpid())
+    return sorted(p for p in children if p == os.getpid() or _cmdline(p) == own)
+
+
+def worker_memory():
+    workers = []
+    for pid in sibling_pids():
+        entry = {"pid": pid, "current": pid == os.getpid(), "rss": rss_bytes(pid)}
+        entry.update({k: v for k, v in smaps_rollup(pid).items() if k != "rss"})
+        workers.append(entry)
+    return workers
+
+
+# -------------------------
+# Loaded objects
+# -------------------------
+def object_size(obj):
+    """
+    Approximate bytes held by a cached object: `nbytes` when it reports one
+    (numpy-backed tables), otherwise its pickled size, which for the
+    booster and the sklearn transformers is their serialized state.
+    """
+    if obj is None:
+        return 0
+    nbytes = getattr(obj, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    try:
+        return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return None
+
+
+def loaded_objects():
+    from .views.inference import _loaded
+
+    return {
+        key: {"type": type(obj).__name__ if obj is not None else None, "bytes": object_size(obj)}
+        for key, obj in _loaded.items()
+    }
+
+
+class track_rss:
+    """Records the RSS growth of the wrapped block in `load_rss[name]`."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.before = rss_bytes()
+        return self
+
+    def __exit__(self, *exc):
+        after = rss_bytes()
+        if self.before is not None and after is not None:
+            load_rss[self.name] = after - self.before
+        return False
+
+
+# -------------------------
+# tracemalloc profiles
+# -------------------------
+def profile_call(fn, *args, top=10, **kwargs):
+    """
+    Runs fn under tracemalloc. Returns (result, profile) where profile has
+    the bytes still allocated afterwards ("net_bytes"), the traced peak and
+    the `top` source lines by net allocated size.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        result = fn(*args, **kwargs)
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    own = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = after.filter_traces(own).compare_to(before.filter_traces(own), "lineno")
+    return result, {
+        "net_bytes": current - base,
+        "peak_bytes": peak - base,
+        "top": [
+            {
+                "where": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+                "size_diff": s.size_diff,
+                "count_diff": s.count_diff,
+            }
+            for s in stats[:top]
+        ],
+    }
+
+
+def sampled(name):
+    """
+    Decorator: every MEMORY_PROFILE_EVERY-th call of the wrapped function in
+    this process runs under profile_call and its profile replaces
+    `profiles[name]`.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            every = settings.MEMORY_PROFILE_EVERY
+            if every <= 0:
+                return fn(*args, **kwargs)
+            with _lock:
+                _calls[name] = count = _calls.get(name, 0) + 1
+            if count % every or tracemalloc.is_tracing():
+                return fn(*args, **kwargs)
+            result, profile = profile_call(fn, *args, top=settings.MEMORY_PROFILE_TOP, **kwargs)
+            profile["call"] = count
+            profiles[name] = profile
+            return result
+        return wrapper
+    return decorator
+
+
+def report():
+    return {
+        "pid": os.getpid(),
+        "rss": rss_bytes(),
+        "peak_rss": peak_rss_bytes(),
+        "workers": worker_memory(),
+        "loaded": loaded_objects(),
+        "load_rss": dict(load_rss),
+        "heavy_modules": [m for m in HEAVY_MODULES if m in sys.modules],
+        "profiles": dict(profiles),
+    }
+
+
+def reset():
+    with _lock:
+        _calls.clear()
+    profiles.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    # Profiles sampled in a preloaded master do not describe the workers.
+    os.register_at_fork(after_in_child=reset)
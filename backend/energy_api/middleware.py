@@ -0,0 +1,108 @@
+# energy_api/middleware.py
+"""
+Negotiated response compression.
+
+Like django.middleware.gzip.GZipMiddleware, but with a configurable size
+threshold (COMPRESSION_MIN_BYTES) so small JSON replies are not worth the
+CPU, and with brotli preferred over gzip when the optional `brotli` package
+is installed and the client accepts it. Streaming responses (CSV exports)
+are gzipped on the fly when the client accepts gzip.
+
+Only API responses are touched: JSON and CSV under /api/. Admin pages and
+static files (served by WhiteNoise, precompressed) pass through as is.
+"""
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+API_PREFIX = "/api/"
+COMPRESSIBLE_TYPES = ("application/json", "text/csv")
+
+
+def parse_accept_encoding(header):
+    """{coding: q} from an Accept-Encoding header."""
+    qualities = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        qualities[coding] = q
+    return qualities
+
+
+def choose_encoding(header, codings=("br", "gzip")):
+    """The first of `codings` the client accepts (and we can produce), or None."""
+    qualities = parse_accept_encoding(header)
+    wildcard = qualities.get("*", 0.0)
+    for coding in codings:
+        if coding == "br" and brotli is None:
+            continue
+        if qualities.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+class CompressionMiddleware:
+    # Same BREACH mitigation as Django's GZipMiddleware.
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if response.has_header("Content-Encoding") or not request.path.startswith(API_PREFIX):
+            return response
+        content_type = response.get("Content-Type", "")
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_BYTES:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if response.streaming and response.is_async:
+            return response
+        # Streams are only gzipped; a client that accepts just br gets them as is.
+        codings = ("gzip",) if response.streaming else ("br", "gzip")
+        encoding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""), codings)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_sequence(
+                response.streaming_content, max_random_bytes=self.max_random_bytes
+            )
+            del response.headers["Content-Length"]
+        else:
+            if encoding == "br":
+                compressed = brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+            else:
+                compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # The compressed body is no longer byte-identical to the original.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,117 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:01
+
+from django.db import migrations, models
+
+# Frozen copy of models.FEATURE_COLUMNS at the time of this migration
+FEATURE_COLUMNS = {
+    "Floor_Insulation": "floor_insulation",
+    "Door_Insulation": "door_insulation",
+    "Roof_Insulation": "roof_insulation",
+    "Window_Insulation": "window_insulation",
+    "Wall_Insulation": "wall_insulation",
+    "Hvac_Efficiency": "hvac_efficiency",
+    "Domestic_Hot_Water_Usage": "domestic_hot_water_usage",
+    "Lighting_Density": "lighting_density",
+    "Occupancy_Level": "occupancy_level",
+    "Equipment_Density": "equipment_density",
+    "Window_To_Wall_Ratio": "window_to_wall_ratio",
+    "Total_Building_Area": "total_building_area",
+}
+
+BATCH_SIZE = 2000
+
+
+def backfill_feature_columns(apps, schema_editor):
+    PredictionHistory = apps.get_model("energy_api", "PredictionHistory")
+    columns = list(FEATURE_COLUMNS.values())
+
+    last_id = 0
+    while True:
+        batch = list(
+            PredictionHistory.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .only("id", "inputs")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for row in batch:
+            inputs = row.inputs if isinstance(row.inputs, dict) else {}
+            for feature, column in FEATURE_COLUMNS.items():
+                try:
+                    value = float(inputs.get(feature))
+                except (TypeError, ValueError):
+                    value = None
+                setattr(row, column, value)
+        PredictionHistory.objects.bulk_update(batch, columns)
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('energy_api', '0003_prediction_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='domestic_hot_water_usage',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='door_insulation',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='equipment_density',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='floor_insulation',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='hvac_efficiency',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='lighting_density',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='occupancy_level',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='roof_insulation',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='total_building_area',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='wall_insulation',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='window_insulation',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='window_to_wall_ratio',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_feature_columns, migrations.RunPython.noop),
+    ]
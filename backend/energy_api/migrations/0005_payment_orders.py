@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('energy_api', '0004_typed_feature_columns'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('razorpay_order_id', models.CharField(max_length=64, unique=True)),
+                ('plan', models.CharField(max_length=30)),
+                ('amount', models.IntegerField(help_text='Amount in paise')),
+                ('currency', models.CharField(default='INR', max_length=8)),
+                ('status', models.CharField(choices=[('created', 'Created'), ('paid', 'Paid')], default='created', max_length=20)),
+                ('razorpay_payment_id', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('paid_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
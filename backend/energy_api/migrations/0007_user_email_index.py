@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_email_index(apps, schema_editor):
+    """
+    Indexes every existing user's email, lowercased. When several accounts
+    share an address only the oldest one is indexed (that is the account
+    the old `filter(email=...).first()` lookups found).
+    """
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    UserEmail = apps.get_model("energy_api", "UserEmail")
+
+    seen = set()
+    entries = []
+    for user_id, email in User.objects.order_by("id").values_list("id", "email").iterator():
+        normalized = (email or "").strip().lower()
+        if not normalized or normalized in seen:
+            continue
+        seen.add(normalized)
+        entries.append(UserEmail(user_id=user_id, email=normalized))
+    UserEmail.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('energy_api', '0006_otp_attempts_and_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.CharField(max_length=254, unique=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='email_index', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(populate_email_index, migrations.RunPython.noop),
+    ]
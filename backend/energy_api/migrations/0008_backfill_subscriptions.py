@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:14
+
+from django.conf import settings
+from django.db import migrations
+
+
+def create_missing_subscriptions(apps, schema_editor):
+    """Login no longer creates subscriptions, so give every older account one now."""
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    Subscription = apps.get_model("energy_api", "Subscription")
+
+    missing = User.objects.filter(subscription__isnull=True).values_list("id", flat=True)
+    Subscription.objects.bulk_create(
+        [
+            Subscription(user_id=user_id, plan="free", allowed_predictions=10, remaining_predictions=10, active=False)
+            for user_id in missing.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('energy_api', '0007_user_email_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_subscriptions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,131 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:20
+
+import hashlib
+import json
+import re
+from collections.abc import Mapping
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+# Frozen copy of models.canonical_inputs / inputs_digest at the time of this migration
+_NUMBER = re.compile(r"\s*[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?\s*")
+
+
+def canonical_inputs(data):
+    if not isinstance(data, Mapping):
+        return data
+    canonical = {}
+    for key, value in data.items():
+        key = str(key).strip()
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = float(value)
+        elif isinstance(value, str) and _NUMBER.fullmatch(value):
+            value = float(value)
+        elif isinstance(value, str):
+            value = value.strip()
+            if key == "Building_Type":
+                value = value.lower()
+        canonical[key] = value
+    return canonical
+
+
+def inputs_digest(canonical):
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def move_inputs(apps, schema_editor):
+    PredictionHistory = apps.get_model("energy_api", "PredictionHistory")
+    PredictionInput = apps.get_model("energy_api", "PredictionInput")
+
+    last_id = 0
+    while True:
+        batch = list(
+            PredictionHistory.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .only("id", "inputs")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        canonicals = {}
+        digests = []
+        for row in batch:
+            canonical = canonical_inputs(row.inputs)
+            digest = inputs_digest(canonical)
+            canonicals[digest] = canonical
+            digests.append(digest)
+
+        PredictionInput.objects.bulk_create(
+            [PredictionInput(digest=d, inputs=c) for d, c in canonicals.items()],
+            ignore_conflicts=True,
+        )
+        ids = dict(
+            PredictionInput.objects.filter(digest__in=list(canonicals)).values_list("digest", "id")
+        )
+        for row, digest in zip(batch, digests):
+            row.input_set_id = ids[digest]
+        PredictionHistory.objects.bulk_update(batch, ["input_set"])
+        last_id = batch[-1].id
+
+
+def restore_inputs(apps, schema_editor):
+    PredictionHistory = apps.get_model("energy_api", "PredictionHistory")
+
+    last_id = 0
+    while True:
+        batch = list(
+            PredictionHistory.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .select_related("input_set")
+            .only("id", "input_set__inputs")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for row in batch:
+            row.inputs = row.input_set.inputs
+        PredictionHistory.objects.bulk_update(batch, ["inputs"])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('energy_api', '0010_history_comparison'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionInput',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('inputs', models.JSONField()),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('result_model', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='input_set',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='history', to='energy_api.predictioninput'),
+        ),
+        migrations.AlterField(
+            model_name='predictionhistory',
+            name='inputs',
+            field=models.JSONField(null=True),
+        ),
+        migrations.RunPython(move_inputs, restore_inputs),
+        migrations.RemoveField(
+            model_name='predictionhistory',
+            name='inputs',
+        ),
+        migrations.AlterField(
+            model_name='predictionhistory',
+            name='input_set',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='history', to='energy_api.predictioninput'),
+        ),
+    ]
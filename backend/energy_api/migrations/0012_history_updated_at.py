@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:16
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def stamp_existing_rows(apps, schema_editor):
+    # AddField stamps every existing row with the migration time; the best
+    # known last change of an existing row is when it was created.
+    PredictionHistory = apps.get_model("energy_api", "PredictionHistory")
+    PredictionHistory.objects.update(updated_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('energy_api', '0011_prediction_inputs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(stamp_existing_rows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='predictionhistory',
+            index=models.Index(fields=['user', 'updated_at'], name='history_user_updated_idx'),
+        ),
+    ]
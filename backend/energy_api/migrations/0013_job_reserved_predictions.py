@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('energy_api', '0012_history_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionjob',
+            name='reserved_predictions',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('energy_api', '0013_job_reserved_predictions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryArchiveRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cutoff', models.DateTimeField()),
+                ('archived_rows', models.IntegerField(default=0)),
+                ('finished_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
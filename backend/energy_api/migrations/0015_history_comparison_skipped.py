@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('energy_api', '0014_history_archive_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='comparison_skipped',
+            field=models.BooleanField(default=False),
+        ),
+    ]
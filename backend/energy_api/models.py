@@ -1,26 +1,405 @@
 # energy_api/models.py
-from django.db import models
+import hashlib
+import json
+from collections.abc import Mapping
+
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
 from django.utils import timezone
 
+from .validation import to_number
+
 # If you previously imported User directly, that's fine too:
 # from django.contrib.auth.models import User
 # but using settings.AUTH_USER_MODEL is more flexible.
 
+# Numeric model features -> typed PredictionHistory columns
+FEATURE_COLUMNS = {
+    "Floor_Insulation": "floor_insulation",
+    "Door_Insulation": "door_insulation",
+    "Roof_Insulation": "roof_insulation",
+    "Window_Insulation": "window_insulation",
+    "Wall_Insulation": "wall_insulation",
+    "Hvac_Efficiency": "hvac_efficiency",
+    "Domestic_Hot_Water_Usage": "domestic_hot_water_usage",
+    "Lighting_Density": "lighting_density",
+    "Occupancy_Level": "occupancy_level",
+    "Equipment_Density": "equipment_density",
+    "Window_To_Wall_Ratio": "window_to_wall_ratio",
+    "Total_Building_Area": "total_building_area",
+}
+
+# Columns written by PredictionHistory.set_comparison
+COMPARISON_COLUMNS = [
+    "optimized_energy_month_kwh",
+    "energy_savings_kwh",
+    "energy_savings_percent",
+    "optimized_category",
+    "recommendation_codes",
+]
+
+
+def canonical_inputs(data):
+    """
+    The form of a prediction payload that is hashed and stored: keys
+    stripped, numbers and numeric strings as floats, other strings stripped
+    and the building type lowercased (it is matched case-insensitively).
+    Payloads that predict the same thing map to the same dict.
+    """
+    if not isinstance(data, Mapping):
+        return data
+    canonical = {}
+    for key, value in data.items():
+        key = str(key).strip()
+        number = to_number(value)
+        if number is not None:
+            value = number
+        elif isinstance(value, str):
+            value = value.strip()
+            if key == "Building_Type":
+                value = value.lower()
+        canonical[key] = value
+    return canonical
+
+
+def inputs_digest(canonical):
+    """SHA-256 of the canonical inputs, serialized with sorted keys."""
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class PredictionInput(models.Model):
+    """
+    Content-addressed prediction inputs: one row per distinct canonical
+    payload (see canonical_inputs), shared by every history row that
+    submitted it. `result` caches the scored prediction for these inputs
+    ({"monthly", "optimized"}) and `result_model` the model_version() that
+    produced it; a result from another model is ignored.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    inputs = models.JSONField()
+    result = models.JSONField(null=True, blank=True)
+    result_model = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def result_for(self, model_version):
+        """The cached result if it was produced by `model_version`, else None."""
+        return self.result if self.result and self.result_model == model_version else None
+
+    @classmethod
+    def resolve(cls, records):
+        """
+        Points history rows whose inputs were (re)assigned at their
+        PredictionInput, creating the missing ones. One digest -> id lookup
+        for the whole batch, plus one insert and one lookup when some inputs
+        are new.
+        """
+        pending = [r for r in records if r._new_inputs is not None]
+        if not pending:
+            return
+        canonicals = {}
+        digests = []
+        for record in pending:
+            canonical = canonical_inputs(record._new_inputs)
+            digest = inputs_digest(canonical)
+            canonicals[digest] = canonical
+            digests.append(digest)
+
+        ids = cls._ids_for(list(canonicals))
+        missing = [cls(digest=d, inputs=c) for d, c in canonicals.items() if d not in ids]
+        if missing:
+            # Another request may insert the same inputs concurrently.
+            cls.objects.bulk_create(missing, ignore_conflicts=True)
+            ids.update(cls._ids_for([m.digest for m in missing]))
+
+        for record, digest in zip(pending, digests):
+            # The canonical dict is what is stored, so no need to fetch the row.
+            record.input_set = cls(id=ids[digest], digest=digest, inputs=canonicals[digest])
+            record._new_inputs = None
+
+    @staticmethod
+    def _ids_for(digests, chunk=500):
+        ids = {}
+        for start in range(0, len(digests), chunk):
+            ids.update(
+                PredictionInput.objects.filter(digest__in=digests[start:start + chunk]).values_list("digest", "id")
+            )
+        return ids
+
+    @classmethod
+    def store_results(cls, entries, model_version):
+        """Caches results; `entries` maps digest -> (canonical inputs, result)."""
+        stored = cls.objects.in_bulk(list(entries), field_name="digest")
+        for digest, obj in stored.items():
+            obj.result = entries[digest][1]
+            obj.result_model = model_version
+        cls.objects.bulk_update(list(stored.values()), ["result", "result_model"])
+        cls.objects.bulk_create(
+            [
+                cls(digest=digest, inputs=canonical, result=result, result_model=model_version)
+                for digest, (canonical, result) in entries.items()
+                if digest not in stored
+            ],
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def delete_orphans(cls, ids=None, created_before=None, batch=500):
+        """
+        Deletes inputs no history row refers to any more, `batch` at a time:
+        among `ids` if given, else across the table. `created_before` spares
+        newer inputs, whose history row may not be committed yet. Returns
+        the number deleted.
+        """
+        orphans = cls.objects.filter(history__isnull=True)
+        if created_before is not None:
+            orphans = orphans.filter(created_at__lt=created_before)
+        if ids is not None:
+            ids = sorted(set(ids))
+            pages = (ids[i:i + batch] for i in range(0, len(ids), batch))
+        else:
+            pages = cls._orphan_pages(orphans, batch)
+        return sum(cls._delete_unreferenced(orphans, page) for page in pages)
+
+    @staticmethod
+    def _orphan_pages(orphans, batch):
+        last = 0
+        while True:
+            page = list(orphans.filter(id__gt=last).order_by("id").values_list("id", flat=True)[:batch])
+            if not page:
+                return
+            yield page
+            last = page[-1]
+
+    @staticmethod
+    def _delete_unreferenced(orphans, page):
+        try:
+            # A concurrent write may have pointed a new history row at one.
+            with transaction.atomic():
+                return orphans.filter(id__in=page).delete()[0]
+        except (models.ProtectedError, IntegrityError):
+            return 0
+
+    def __str__(self):
+        return self.digest[:12]
+
+
+class PredictionHistoryQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # save() is skipped, so resolve the rows' inputs here.
+        objs = list(objs)
+        PredictionInput.resolve(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class PredictionHistory(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     building_type = models.CharField(max_length=200)
     total_energy_month_kwh = models.FloatField()
     eui_month_kwh_m2 = models.FloatField(null=True)
     performance_category = models.CharField(max_length=200)
-    inputs = models.JSONField()
+    # Submitted inputs, stored once per distinct payload; read and assign
+    # them through the `inputs` property.
+    input_set = models.ForeignKey(PredictionInput, on_delete=models.PROTECT, related_name="history")
     is_deleted_by_user = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped by every write, including hiding a row, so clients can sync
+    # history incrementally (/api/history/changes/). Queryset .update()
+    # calls skip auto_now and must set it themselves.
+    updated_at = models.DateTimeField(auto_now=True)
+    job = models.ForeignKey(
+        "PredictionJob", on_delete=models.SET_NULL, null=True, blank=True, related_name="results"
+    )
+
+    # Typed copies of the numeric features in `inputs` (see FEATURE_COLUMNS),
+    # so analytics can aggregate in SQL instead of parsing JSON in Python.
+    floor_insulation = models.FloatField(null=True, blank=True)
+    door_insulation = models.FloatField(null=True, blank=True)
+    roof_insulation = models.FloatField(null=True, blank=True)
+    window_insulation = models.FloatField(null=True, blank=True)
+    wall_insulation = models.FloatField(null=True, blank=True)
+    hvac_efficiency = models.FloatField(null=True, blank=True)
+    domestic_hot_water_usage = models.FloatField(null=True, blank=True)
+    lighting_density = models.FloatField(null=True, blank=True)
+    occupancy_level = models.FloatField(null=True, blank=True)
+    equipment_density = models.FloatField(null=True, blank=True)
+    window_to_wall_ratio = models.FloatField(null=True, blank=True)
+    total_building_area = models.FloatField(null=True, blank=True)
+
+    objects = PredictionHistoryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "updated_at"], name="history_user_updated_idx"),
+        ]
+
+    # Inputs assigned but not yet resolved to a PredictionInput (see save()).
+    _new_inputs = None
+
+    @property
+    def inputs(self):
+        if self._new_inputs is not None:
+            return self._new_inputs
+        return self.input_set.inputs if self.input_set_id else None
+
+    @inputs.setter
+    def inputs(self, value):
+        self._new_inputs = value
+
+    # "Current vs optimized" comparison, stored with the row so history views
+    # need no model calls. recommendation_codes lists the features flagged by
+    # get_feature_recommendations; NULL means the comparison was never
+    # computed (see `manage.py backfill_history_comparison`). The optimized
+    # fields stay NULL for inputs that are already at their targets.
+    optimized_energy_month_kwh = models.FloatField(null=True, blank=True)
+    energy_savings_kwh = models.FloatField(null=True, blank=True)
+    energy_savings_percent = models.FloatField(null=True, blank=True)
+    optimized_category = models.CharField(max_length=200, blank=True, default="")
+    recommendation_codes = models.JSONField(null=True, blank=True)
+    # Set by the backfill for rows whose stored inputs fail validation, so
+    # later runs do not scan them again (--all retries them).
+    comparison_skipped = models.BooleanField(default=False)
+
+    def fill_feature_columns(self):
+        """Copies the numeric features from `inputs` into the typed columns."""
+        inputs = self.inputs or {}
+        for feature, column in FEATURE_COLUMNS.items():
+            try:
+                value = float(inputs.get(feature))
+            except (TypeError, ValueError):
+                value = None
+            setattr(self, column, value)
+
+    def feature_inputs(self):
+        """
+        The model inputs rebuilt from the typed columns, so list views need
+        not load the PredictionInput. Falls back to `inputs` for rows that
+        could not be fully typed (see prefetch_inputs).
+        """
+        if not self.is_fully_typed():
+            return self.inputs
+        values = {"Building_Type": self.building_type}
+        for feature, column in FEATURE_COLUMNS.items():
+            values[feature] = getattr(self, column)
+        return values
+
+    def is_fully_typed(self):
+        return all(getattr(self, column) is not None for column in FEATURE_COLUMNS.values())
+
+    @staticmethod
+    def prefetch_inputs(records):
+        """
+        Loads, in one query, the PredictionInput of the rows feature_inputs()
+        cannot rebuild from typed columns, so list views do not fetch it row
+        by row. Returns `records` as a list.
+        """
+        records = list(records)
+        models.prefetch_related_objects(
+            [h for h in records if h.input_set_id and not h.is_fully_typed()], "input_set"
+        )
+        return records
+
+    def set_comparison(self, optimized, codes):
+        """Stores a compute_optimized_performance result (or None) and the recommendation codes."""
+        optimized = optimized or {}
+        self.optimized_energy_month_kwh = optimized.get("optimized_energy_month_kwh")
+        self.energy_savings_kwh = optimized.get("energy_savings_kwh")
+        self.energy_savings_percent = optimized.get("energy_savings_percent")
+        self.optimized_category = optimized.get("optimized_category") or ""
+        self.recommendation_codes = list(codes)
+
+    def comparison(self):
+        """The stored comparison as history list fields."""
+        return {
+            "optimized_energy": self.optimized_energy_month_kwh,
+            "savings_kwh": self.energy_savings_kwh,
+            "savings_percent": self.energy_savings_percent,
+            "optimized_category": self.optimized_category or None,
+            "recommendation_codes": self.recommendation_codes,
+        }
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.fill_feature_columns()
+        # One commit for a new PredictionInput and the row that uses it.
+        with transaction.atomic(using=kwargs.get("using")):
+            PredictionInput.resolve([self])
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.username} - {self.building_type}"
 
 
+def normalize_email(email):
+    return (email or "").strip().lower()
+
+
+class UserEmail(models.Model):
+    """
+    Lowercased, unique copy of User.email. Django's default user table has no
+    index (or uniqueness) on email, so auth flows look users up through here.
+    Kept in sync by the post_save signal in signals.py.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="email_index")
+    email = models.CharField(max_length=254, unique=True)
+
+    @classmethod
+    def find_user(cls, email):
+        """The user owning `email` (case-insensitive), or None."""
+        normalized = normalize_email(email)
+        if not normalized:
+            return None
+        entry = cls.objects.select_related("user").filter(email=normalized).first()
+        return entry.user if entry else None
+
+    @classmethod
+    def is_taken(cls, email):
+        return cls.objects.filter(email=normalize_email(email)).exists()
+
+    def __str__(self):
+        return self.email
+
+
+class PredictionJob(models.Model):
+    """
+    Bulk prediction upload. Rows are kept on the job itself and processed in
+    chunks by `manage.py run_prediction_worker`; `processed_rows` is advanced in
+    the same transaction as each chunk's history rows, so a crashed worker can
+    be resumed from where it stopped.
+    """
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="prediction_jobs")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued", db_index=True)
+    filename = models.CharField(max_length=255, blank=True)
+    rows = models.JSONField(default=list)
+    total_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    failed_rows = models.IntegerField(default=0)
+    # Predictions taken from the quota at submission (0 for staff and
+    # unlimited plans); failed and unprocessed rows are given back.
+    reserved_predictions = models.IntegerField(default=0)
+    errors = models.JSONField(default=list)
+    worker_id = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def progress(self):
+        if not self.total_rows:
+            return 100.0
+        return round(self.processed_rows * 100.0 / self.total_rows, 2)
+
+    def __str__(self):
+        return f"{self.user.username} - job {self.pk} ({self.status})"
+
+
 class Subscription(models.Model):
     PLAN_CHOICES = [
         ("free", "Free"),
@@ -53,6 +432,19 @@ class Subscription(models.Model):
         self.end_date = None
         self.save()
 
+    def take_predictions(self, n=1):
+        """
+        Takes `n` predictions from the quota in one conditional UPDATE, so
+        concurrent requests (in any worker) can never overspend it. Returns
+        False, taking nothing, when fewer than `n` are left.
+        """
+        taken = Subscription.objects.filter(pk=self.pk, remaining_predictions__gte=n).update(
+            remaining_predictions=models.F("remaining_predictions") - n
+        )
+        if taken:
+            self.remaining_predictions -= n
+        return bool(taken)
+
     def consume_prediction(self, n=1):
         if self.remaining_predictions is None:
             return
@@ -64,16 +456,129 @@ class Subscription(models.Model):
 
 
 
+class PaymentOrder(models.Model):
+    """
+    Ledger of Razorpay orders, written when the order is created. Payment
+    verification moves an order from "created" to "paid" exactly once; the
+    plan granted is the one recorded here, not whatever the callback sends.
+    """
+    STATUS_CHOICES = [
+        ("created", "Created"),
+        ("paid", "Paid"),
+    ]
+
+    razorpay_order_id = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="payment_orders")
+    plan = models.CharField(max_length=30)
+    amount = models.IntegerField(help_text="Amount in paise")
+    currency = models.CharField(max_length=8, default="INR")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="created")
+    razorpay_payment_id = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    paid_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.plan} ({self.razorpay_order_id}, {self.status})"
+
+
 class PasswordResetOTP(models.Model):
+    """
+    At most one live code per user: requesting a new code replaces the old
+    one, failed guesses are counted on the row itself, and
+    `manage.py purge_expired_otps` clears codes that were never used.
+    """
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="password_otps")
     otp = models.CharField(max_length=6)
-    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
-    def is_expired(self, expiry_seconds=300):
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="otp_user_created_idx"),
+        ]
+
+    @classmethod
+    def latest_for(cls, user):
+        """The user's newest code (an index seek on (user, created_at))."""
+        return cls.objects.filter(user=user).order_by("-created_at").first()
+
+    def is_expired(self, expiry_seconds=None):
         """
-        Default expiry: 300 seconds (5 minutes).
+        Default expiry: PASSWORD_RESET_OTP_EXPIRY_SECONDS (300 seconds).
         """
+        if expiry_seconds is None:
+            expiry_seconds = settings.PASSWORD_RESET_OTP_EXPIRY_SECONDS
         return (timezone.now() - self.created_at).total_seconds() > expiry_seconds
 
+    def is_locked(self):
+        return self.attempts >= settings.PASSWORD_RESET_OTP_MAX_ATTEMPTS
+
+    def take_attempt(self):
+        """
+        Counts one guess in a conditional UPDATE before the code is compared,
+        so concurrent guesses cannot all get past a stale lock check. Returns
+        False once PASSWORD_RESET_OTP_MAX_ATTEMPTS have been taken.
+        """
+        taken = PasswordResetOTP.objects.filter(
+            pk=self.pk, attempts__lt=settings.PASSWORD_RESET_OTP_MAX_ATTEMPTS,
+        ).update(attempts=models.F("attempts") + 1)
+        if taken:
+            self.attempts += 1
+        return bool(taken)
+
+    def return_attempt(self):
+        PasswordResetOTP.objects.filter(pk=self.pk, attempts__gt=0).update(attempts=models.F("attempts") - 1)
+        self.attempts = max(0, self.attempts - 1)
+
     def __str__(self):
         return f"{self.user.username} - OTP {self.otp} at {self.created_at}"
+
+
+class FeatureDriftStats(models.Model):
+    """
+    Running statistics of one model input feature over all served
+    predictions, merged in periodically from each worker's in-memory
+    counters (see drift.py). `m2` is Welford's sum of squared deviations;
+    `histogram` has a below-range bin, DRIFT_HISTOGRAM_BINS bins over
+    FEATURE_RANGES, and an above-range bin.
+    """
+    feature = models.CharField(max_length=64, unique=True)
+    count = models.BigIntegerField(default=0)
+    mean = models.FloatField(default=0.0)
+    m2 = models.FloatField(default=0.0)
+    minimum = models.FloatField(null=True, blank=True)
+    maximum = models.FloatField(null=True, blank=True)
+    histogram = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.feature} (n={self.count})"
+
+
+class DriftReference(models.Model):
+    """Reference input profile (per-feature stats) that drift is scored against; the newest one is used."""
+    profile = models.JSONField()
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Drift reference {self.pk} ({self.created_at:%Y-%m-%d})"
+
+
+class HistoryArchiveRun(models.Model):
+    """
+    One completed `manage.py archive_history` run. Every history row created
+    before `cutoff` had been moved to the archive when it finished, so sync
+    clients may drop cached rows older than the latest cutoff.
+    """
+    cutoff = models.DateTimeField()
+    archived_rows = models.IntegerField(default=0)
+    finished_at = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def archived_before(cls):
+        """The latest cutoff of any run, or None if history was never archived."""
+        return cls.objects.aggregate(latest=models.Max("cutoff"))["latest"]
+
+    def __str__(self):
+        return f"Archive run {self.pk} (before {self.cutoff:%Y-%m-%d})"
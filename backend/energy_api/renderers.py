@@ -0,0 +1,57 @@
+# energy_api/renderers.py
+"""
+JSON renderers for API responses.
+
+ORJSONRenderer is a drop-in for DRF's JSONRenderer backed by orjson, which
+serializes the large history payloads several times faster and handles
+numpy scalars natively. ColumnarJSONRenderer is selected with
+`?format=columns` and turns every list of row dicts in the payload into one
+array per field, so repeated keys are sent once instead of once per row.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+_drf_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Indented output (browsable API, ?indent) stays on the stdlib path.
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(
+            data,
+            default=_drf_encoder.default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
+        )
+
+
+def to_columns(rows):
+    """[{"a": 1, "b": 2}, {"a": 3}] -> {"a": [1, 3], "b": [2, None]}"""
+    fields = {}
+    for row in rows:
+        for key in row:
+            fields.setdefault(key, None)
+    return {key: [row.get(key) for row in rows] for key in fields}
+
+
+def _is_row_list(value):
+    return isinstance(value, list) and bool(value) and all(isinstance(row, dict) for row in value)
+
+
+class ColumnarJSONRenderer(ORJSONRenderer):
+    format = "columns"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if _is_row_list(data):
+            data = to_columns(data)
+        elif isinstance(data, dict):
+            data = {key: to_columns(value) if _is_row_list(value) else value for key, value in data.items()}
+        return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,63 @@
+# energy_api/signals.py
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import PredictionHistory, PredictionInput, Subscription, UserEmail, normalize_email
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def sync_email_index(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """
+    Mirrors User.email into the unique, lowercased UserEmail index. A new
+    account whose address is taken fails its save; an existing one (e.g. a
+    legacy account sharing an address) is saved and left out of the index.
+    """
+    if raw:
+        return
+    # e.g. login's save(update_fields=["last_login"]) cannot change the email
+    if update_fields is not None and "email" not in update_fields:
+        return
+    email = normalize_email(instance.email)
+    if not email:
+        UserEmail.objects.filter(user=instance).delete()
+        return
+    try:
+        # Savepoint, so a conflict does not break the caller's transaction.
+        with transaction.atomic():
+            UserEmail.objects.update_or_create(user=instance, defaults={"email": email})
+    except IntegrityError:
+        if created:
+            raise  # register_user reports "Email already exists"
+        logger.warning("Email of user %s is indexed for another account; not indexing it", instance.pk)
+        UserEmail.objects.filter(user=instance).delete()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_subscription(sender, instance, created, raw=False, **kwargs):
+    """Every new account starts on the free plan (once, not on every login)."""
+    if created and not raw:
+        Subscription.objects.get_or_create(
+            user=instance,
+            defaults={"plan": "free", "allowed_predictions": 10, "remaining_predictions": 10, "active": False},
+        )
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def remember_history_inputs(sender, instance, **kwargs):
+    instance._history_input_ids = list(
+        PredictionHistory.objects.filter(user=instance).values_list("input_set_id", flat=True).distinct()
+    )
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def delete_orphan_inputs(sender, instance, **kwargs):
+    """Inputs only the deleted account's history used go with it."""
+    ids = getattr(instance, "_history_input_ids", None)
+    if ids:
+        PredictionInput.delete_orphans(ids)
@@ -0,0 +1,156 @@
+# energy_api/simulation.py
+"""
+Monthly scenario simulation (/api/simulate/).
+
+The model predicts a yearly figure for fixed inputs, so /predict/'s
+monthly energy is that figure divided by 12. A simulation instead varies
+the inputs month by month: each scenario applies monthly modifier
+profiles (multipliers per feature, e.g. occupancy or HVAC curves) to the
+building, giving 12 feature rows per scenario. All scenarios are stacked
+into one 12 x N matrix and scored with a single model call. Month m then
+uses m's share of the year (days / 365) of the yearly prediction for m's
+inputs, so a scenario without modifiers adds up to the plain prediction.
+
+Built-in profiles ship as static data in data/monthly_profiles.json.
+"""
+import json
+import os
+
+from django.conf import settings
+
+PROFILES_PATH = os.path.join(os.path.dirname(__file__), "data", "monthly_profiles.json")
+
+DAYS_IN_MONTH = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+# Largest multiplier a modifier may apply in one month.
+MAX_FACTOR = 10.0
+
+_builtin = {}
+
+
+def builtin_profiles():
+    """{"months": [...], "profiles": {name: {"description", "modifiers"}}}, read once."""
+    if not _builtin:
+        with open(PROFILES_PATH, encoding="utf-8") as fh:
+            _builtin.update(json.load(fh))
+    return _builtin
+
+
+def months():
+    return builtin_profiles()["months"]
+
+
+def _factors(feature, values):
+    if not isinstance(values, list) or len(values) != 12:
+        raise ValueError(f"Modifier for {feature} must be a list of 12 monthly factors")
+    factors = []
+    for value in values:
+        if type(value) not in (int, float) or not 0 < value <= MAX_FACTOR:
+            raise ValueError(f"Modifier factors for {feature} must be numbers in (0, {MAX_FACTOR:g}]")
+        factors.append(float(value))
+    return factors
+
+
+def parse_scenarios(specs, modifiable):
+    """
+    Normalizes the "scenarios" of a simulation request. Each spec is an
+    object with an optional "name", "profiles" (built-in names), "modifiers"
+    ({feature: 12 factors}) and "overrides" ({feature: value} applied to
+    the building before the modifiers). `modifiable` lists the features
+    modifiers may touch. Returns [{"name", "profiles", "overrides",
+    "modifiers"}], the modifiers of all profiles multiplied together.
+    Raises ValueError for malformed specs.
+    """
+    if not isinstance(specs, list) or not specs:
+        raise ValueError("scenarios must be a non-empty list")
+    if len(specs) > settings.SIMULATION_MAX_SCENARIOS:
+        raise ValueError(f"At most {settings.SIMULATION_MAX_SCENARIOS} scenarios per request")
+
+    profiles = builtin_profiles()["profiles"]
+    scenarios = []
+    for i, spec in enumerate(specs):
+        if not isinstance(spec, dict):
+            raise ValueError("Each scenario must be an object")
+        name = str(spec.get("name") or f"Scenario {i + 1}")
+        names = spec.get("profiles") or []
+        overrides = spec.get("overrides") or {}
+        if not isinstance(names, list) or not isinstance(overrides, dict):
+            raise ValueError(f"{name}: profiles must be a list and overrides an object")
+
+        combined = {}
+        layers = []
+        for profile in names:
+            if profile not in profiles:
+                raise ValueError(f"{name}: unknown profile {profile!r} (available: {', '.join(profiles)})")
+            layers.append(profiles[profile]["modifiers"])
+        custom = spec.get("modifiers") or {}
+        if not isinstance(custom, dict):
+            raise ValueError(f"{name}: modifiers must be an object")
+        layers.append(custom)
+
+        for layer in layers:
+            for feature, values in layer.items():
+                if feature not in modifiable:
+                    raise ValueError(f"{name}: {feature} cannot be modified by month")
+                factors = _factors(feature, values)
+                current = combined.get(feature, [1.0] * 12)
+                combined[feature] = [a * b for a, b in zip(current, factors)]
+
+        scenarios.append({"name": name, "profiles": names, "overrides": overrides, "modifiers": combined})
+    return scenarios
+
+
+def expand(rows, scenarios, features, ranges):
+    """
+    The 12 x N feature matrix: for each scenario (in order) and month, the
+    scenario's validated row (model feature order) with the month's factors
+    applied and clipped to `ranges`. Returns (matrix, clipped), clipped[k]
+    naming the features scenario k pushed outside their range.
+    """
+    positions = {feature: i for i, feature in enumerate(features)}
+    matrix = []
+    clipped = []
+    for row, scenario in zip(rows, scenarios):
+        outside = set()
+        for month in range(12):
+            values = list(row)
+            for feature, factors in scenario["modifiers"].items():
+                position = positions[feature]
+                low, high = ranges[feature]
+                value = values[position] * factors[month]
+                if not low <= value <= high:
+                    outside.add(feature)
+                    value = min(max(value, low), high)
+                values[position] = value
+            matrix.append(values)
+        clipped.append(sorted(outside))
+    return matrix, clipped
+
+
+def breakdown(yearly, scenarios, areas, clipped):
+    """
+    Per-scenario monthly kWh from the yearly predictions of expand()'s
+    matrix (12 consecutive values per scenario), with EUI when the area is
+    known.
+    """
+    names = months()
+    results = []
+    for k, scenario in enumerate(scenarios):
+        monthly = [
+            float(y) * days / 365.0
+            for y, days in zip(yearly[k * 12:(k + 1) * 12], DAYS_IN_MONTH)
+        ]
+        area = areas[k]
+        total = sum(monthly)
+        peak = max(range(12), key=monthly.__getitem__)
+        results.append({
+            "name": scenario["name"],
+            "profiles": scenario["profiles"],
+            "monthly_kwh": [round(m, 2) for m in monthly],
+            "monthly_eui": [round(m / area, 3) for m in monthly] if area else None,
+            "total_kwh": round(total, 2),
+            "average_month_kwh": round(total / 12.0, 2),
+            "peak_month": names[peak],
+            "clipped": clipped[k],
+        })
+    return results
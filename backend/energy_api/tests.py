@@ -1,3 +1,1748 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import timedelta
 
-# Create your tests here.
\ No newline at end of file
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .archive import load_archived_history
+from . import drift, history_buffer, memory, throttling
+from .jobs import claim_next_job, process_next_chunk, run_job
+from .models import (
+    DriftReference, FeatureDriftStats, PasswordResetOTP, PaymentOrder, PredictionHistory, PredictionInput,
+    PredictionJob, Subscription, UserEmail, canonical_inputs, inputs_digest,
+)
+
+User = get_user_model()
+
+SAMPLE_INPUT = {
+    "Building_Type": "Detached",
+    "Floor_Insulation": 0.5,
+    "Door_Insulation": 2.0,
+    "Roof_Insulation": 0.4,
+    "Window_Insulation": 2.5,
+    "Wall_Insulation": 0.6,
+    "Hvac_Efficiency": 2.5,
+    "Domestic_Hot_Water_Usage": 2.0,
+    "Lighting_Density": 5,
+    "Occupancy_Level": 4,
+    "Equipment_Density": 10,
+    "Window_To_Wall_Ratio": 40,
+    "Total_Building_Area": 120,
+}
+
+
+def make_user(username="alice", staff=False, remaining=10):
+    user = User.objects.create_user(username=username, password="pw", email=f"{username}@example.com", is_staff=staff)
+    Subscription.objects.update_or_create(
+        user=user, defaults={"allowed_predictions": remaining, "remaining_predictions": remaining}
+    )
+    return user
+
+
+def auth_client(user):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+    return client
+
+
+def csv_upload(rows, name="buildings.csv"):
+    cols = list(SAMPLE_INPUT)
+    lines = [",".join(cols)] + [",".join(str(r.get(c, "")) for c in cols) for r in rows]
+    return SimpleUploadedFile(name, "\n".join(lines).encode(), content_type="text/csv")
+
+
+def tearDownModule():
+    # Counters left by the last tests would be flushed at exit (atexit),
+    # after the test database is gone.
+    drift.monitor.reset()
+
+
+class APITestCase(TestCase):
+    """Starts every test with empty throttle buckets, caches, drift counters and memory profiles."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        throttling.reset()
+        drift.monitor.reset()
+        memory.reset()
+
+
+@override_settings(PREDICTION_JOB_CHUNK_SIZE=2)
+class PredictionJobTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user(remaining=10)
+        self.client = auth_client(self.user)
+
+    def submit(self, rows):
+        resp = self.client.post("/api/jobs/", {"file": csv_upload(rows)}, format="multipart")
+        self.assertEqual(resp.status_code, 202, resp.content)
+        return PredictionJob.objects.get(pk=resp.data["job_id"])
+
+    def test_job_runs_in_chunks_and_streams_results(self):
+        bad = dict(SAMPLE_INPUT, Building_Type="Castle")
+        job = self.submit([SAMPLE_INPUT, SAMPLE_INPUT, bad, SAMPLE_INPUT, SAMPLE_INPUT])
+
+        claimed = claim_next_job("w1")
+        self.assertEqual(claimed.pk, job.pk)
+        run_job(claimed, "w1")
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "completed")
+        self.assertEqual((job.processed_rows, job.failed_rows), (5, 1))
+        self.assertEqual(job.errors[0]["row"], 2)
+        self.assertEqual(PredictionHistory.objects.filter(job=job).count(), 4)
+        self.assertFalse(PredictionHistory.objects.filter(job=job, recommendation_codes__isnull=True).exists())
+        self.assertEqual(Subscription.objects.get(user=self.user).remaining_predictions, 6)
+
+        status = self.client.get(f"/api/jobs/{job.pk}/")
+        self.assertEqual(status.data["progress"], 100.0)
+
+        resp = self.client.get(f"/api/jobs/{job.pk}/results/")
+        lines = b"".join(resp.streaming_content).decode().strip().splitlines()
+        self.assertEqual(len(lines), 5)
+
+    def test_stale_job_resumes_from_cursor(self):
+        job = self.submit([SAMPLE_INPUT] * 5)
+        first = claim_next_job("crashed")
+        self.assertFalse(process_next_chunk(first, "crashed"))
+
+        # Not stale yet: nobody else may take it.
+        self.assertIsNone(claim_next_job("w2"))
+
+        with override_settings(PREDICTION_JOB_STALE_SECONDS=-1):
+            resumed = claim_next_job("w2")
+        self.assertEqual(resumed.processed_rows, 2)
+        run_job(resumed, "w2")
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "completed")
+        self.assertEqual(PredictionHistory.objects.filter(job=job).count(), 5)
+
+    def test_upload_larger_than_quota_rejected(self):
+        resp = self.client.post("/api/jobs/", {"file": csv_upload([SAMPLE_INPUT] * 11)}, format="multipart")
+        self.assertEqual(resp.status_code, 403)
+
+    def test_submission_reserves_quota(self):
+        self.submit([SAMPLE_INPUT] * 6)
+        self.assertEqual(Subscription.objects.get(user=self.user).remaining_predictions, 4)
+        # Not processed yet, but the reservation already counts.
+        resp = self.client.post("/api/jobs/", {"file": csv_upload([SAMPLE_INPUT] * 5)}, format="multipart")
+        self.assertEqual(resp.status_code, 403)
+        self.assertEqual(resp.data["remaining_predictions"], 4)
+
+    def test_failed_job_gives_back_unprocessed_rows(self):
+        from unittest import mock
+
+        job = self.submit([SAMPLE_INPUT] * 5)
+        claimed = claim_next_job("w1")
+        self.assertFalse(process_next_chunk(claimed, "w1"))
+        with mock.patch("energy_api.views.inference.predict_batch", side_effect=RuntimeError("model gone")):
+            with self.assertRaises(RuntimeError):
+                run_job(claimed, "w1")
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(Subscription.objects.get(user=self.user).remaining_predictions, 8)
+
+    def test_other_users_cannot_see_job(self):
+        job = self.submit([SAMPLE_INPUT])
+        other = auth_client(make_user("bob"))
+        self.assertEqual(other.get(f"/api/jobs/{job.pk}/").status_code, 403)
+
+
+class HistoryArchiveTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir, ignore_errors=True)
+        override = override_settings(HISTORY_ARCHIVE_DIR=self.archive_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = make_user()
+        self.admin = make_user("root", staff=True)
+
+    def add_history(self, days_ago, deleted=False, inputs=SAMPLE_INPUT, user=None):
+        h = PredictionHistory.objects.create(
+            user=user or self.user, building_type="Detached", total_energy_month_kwh=100.0,
+            eui_month_kwh_m2=1.0, performance_category="Very Efficient",
+            inputs=inputs, is_deleted_by_user=deleted,
+        )
+        moment = timezone.now() - timedelta(days=days_ago)
+        PredictionHistory.objects.filter(pk=h.pk).update(created_at=moment, updated_at=moment)
+        return h
+
+    def test_old_and_deleted_rows_move_to_archive(self):
+        old = self.add_history(400)
+        hidden = self.add_history(40, deleted=True)
+        # Still a sync tombstone (HISTORY_SYNC_TOMBSTONE_DAYS).
+        tombstone = self.add_history(3, deleted=True)
+        live = self.add_history(1)
+
+        call_command("archive_history", days=365, stdout=open(os.devnull, "w"))
+
+        self.assertEqual(sorted(PredictionHistory.objects.values_list("id", flat=True)), [tombstone.id, live.id])
+        archived = {r["id"] for r in load_archived_history(user_id=self.user.id)}
+        self.assertEqual(archived, {old.id, hidden.id})
+
+        # Re-running is a no-op and never duplicates rows.
+        call_command("archive_history", days=365, stdout=open(os.devnull, "w"))
+        self.assertEqual(len(load_archived_history()), 2)
+
+    def test_archiving_removes_inputs_no_row_uses(self):
+        old = self.add_history(400, inputs=dict(SAMPLE_INPUT, Occupancy_Level=1))
+        self.add_history(400)
+        live = self.add_history(1)  # shares its inputs with the second old row
+        PredictionInput.objects.update(created_at=timezone.now() - timedelta(days=1))
+        just_written = PredictionInput.objects.create(digest="f" * 64, inputs={})
+
+        call_command("archive_history", days=365, stdout=open(os.devnull, "w"))
+
+        self.assertEqual(
+            set(PredictionInput.objects.values_list("id", flat=True)), {live.input_set_id, just_written.id}
+        )
+        archived = {r["id"]: r for r in load_archived_history(user_id=self.user.id)}
+        self.assertEqual(archived[old.id]["inputs"]["Occupancy_Level"], 1.0)
+
+    def test_deleting_user_removes_inputs_only_they_used(self):
+        self.add_history(1, inputs=dict(SAMPLE_INPUT, Occupancy_Level=1))
+        self.add_history(1)
+        kept = self.add_history(1, user=self.admin)
+
+        self.user.delete()
+        self.assertEqual(list(PredictionInput.objects.values_list("id", flat=True)), [kept.input_set_id])
+
+    def test_admin_history_includes_archive_on_request(self):
+        old = self.add_history(400)
+        live = self.add_history(1)
+        call_command("archive_history", days=365, stdout=open(os.devnull, "w"))
+
+        client = auth_client(self.admin)
+        resp = client.get(f"/api/admin/user-history/{self.user.username}/?include_archived=1")
+        self.assertEqual([h["id"] for h in resp.data["history"]], [live.id, old.id])
+        # One row shape for database and archived rows.
+        self.assertEqual(set(resp.data["history"][0]), set(resp.data["history"][1]))
+
+        resp = client.get("/api/admin/history/?include_archived=1")
+        self.assertEqual(set(resp.data["all_history"][0]), set(resp.data["all_history"][1]))
+        self.assertEqual(resp.data["all_history"][1]["user"], self.user.username)
+
+        resp = client.get("/api/admin/history/")
+        self.assertEqual([h["id"] for h in resp.data["all_history"]], [live.id])
+
+    def test_archived_rows_are_paged_newest_first(self):
+        rows = [self.add_history(400 + 20 * i) for i in range(5)]  # spread over several partitions
+        call_command("archive_history", days=365, stdout=open(os.devnull, "w"))
+        client = auth_client(self.admin)
+
+        seen, offset = [], 0
+        while offset is not None:
+            resp = client.get(f"/api/admin/history/?include_archived=1&limit=2&offset={offset}")
+            self.assertLessEqual(len(resp.data["all_history"]), 2)
+            seen += [h["id"] for h in resp.data["all_history"]]
+            offset = resp.data["archived_next_offset"]
+        self.assertEqual(seen, [h.id for h in rows])
+
+    @override_settings(HISTORY_ARCHIVE_CACHE_PARTITIONS=2)
+    def test_partition_cache_is_bounded(self):
+        from . import archive
+
+        for i in range(4):
+            self.add_history(400 + 40 * i)
+        call_command("archive_history", days=365, stdout=open(os.devnull, "w"))
+        archive._partition_cache.clear()
+        self.assertEqual(len(load_archived_history()), 4)
+        self.assertEqual(len(archive._partition_cache), 2)
+
+
+class InputValidationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        from .views import get_schema
+
+        self.schema = get_schema()
+
+    def test_valid_input_is_encoded_in_model_order(self):
+        row, errors = self.schema.validate(dict(SAMPLE_INPUT, Building_Type=" SEMI Detached ", Lighting_Density="5.0"))
+        self.assertEqual(errors, {})
+        self.assertEqual(row[0], self.schema.building_types["semi detached"])
+        self.assertEqual(row[self.schema.features.index("Lighting_Density")], 5.0)
+
+    def test_all_errors_are_reported_at_once(self):
+        data = dict(SAMPLE_INPUT, Building_Type="Castle", Wall_Insulation="thick", Window_To_Wall_Ratio=95)
+        del data["Occupancy_Level"]
+        row, errors = self.schema.validate(data)
+        self.assertIsNone(row)
+        self.assertEqual(
+            set(errors), {"Building_Type", "Wall_Insulation", "Window_To_Wall_Ratio", "Occupancy_Level"}
+        )
+
+        row, errors = self.schema.validate(dict(SAMPLE_INPUT, Hvac_Efficiency=float("nan"), Lighting_Density=True))
+        self.assertEqual(set(errors), {"Hvac_Efficiency", "Lighting_Density"})
+
+    def test_batch_validation_keeps_row_indexes(self):
+        valid, failed = self.schema.validate_many([SAMPLE_INPUT, {"Building_Type": "Detached"}, "oops", SAMPLE_INPUT])
+        self.assertEqual([i for i, _, _ in valid], [0, 3])
+        self.assertEqual([f["row"] for f in failed], [1, 2])
+        self.assertEqual(len(failed[0]["fields"]), 12)
+
+    def test_out_of_range_prediction_is_rejected_without_using_quota(self):
+        user = make_user(remaining=3)
+        resp = auth_client(user).post("/api/predict/", dict(SAMPLE_INPUT, Total_Building_Area=10), format="json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("Total_Building_Area", resp.data["errors"])
+        self.assertIn("between", resp.data["error"])
+        self.assertEqual(Subscription.objects.get(user=user).remaining_predictions, 3)
+
+
+class InputDriftTests(APITestCase):
+    def test_flushed_moments_match_direct_computation(self):
+        import statistics
+
+        values = [0.2, 0.25, 0.9, 1.4, 0.6, 0.33, 2.3, 0.11]
+        for i, v in enumerate(values):
+            drift.monitor.observe({"Wall_Insulation": v})
+            if i == 3:
+                drift.monitor.flush()
+        drift.monitor.flush()
+
+        stats = drift.current_stats()["Wall_Insulation"]
+        self.assertEqual(stats.count, len(values))
+        self.assertAlmostEqual(stats.mean, statistics.mean(values))
+        self.assertAlmostEqual(stats.std, statistics.stdev(values))
+        self.assertEqual((stats.minimum, stats.maximum), (0.11, 2.3))
+        self.assertEqual(sum(stats.histogram), len(values))
+
+    def test_worker_exit_flushes_pending_counters(self):
+        import runpy
+        from unittest import mock
+        from django.conf import settings
+
+        drift.monitor.observe({"Wall_Insulation": 0.4})
+        hooks = runpy.run_path(os.path.join(settings.BASE_DIR, "gunicorn.conf.py"))
+        self.addCleanup(history_buffer.writer.reset)  # the hook also closes the writer
+        hooks["worker_exit"](mock.Mock(), mock.Mock())
+
+        self.assertEqual(drift.monitor.pending(), {})
+        self.assertEqual(drift.current_stats()["Wall_Insulation"].count, 1)
+
+    def test_admin_report_counts_served_and_rejected_inputs(self):
+        client = auth_client(make_user(remaining=5))
+        client.post("/api/predict/", SAMPLE_INPUT, format="json")
+        resp = client.post("/api/predict/", dict(SAMPLE_INPUT, Window_To_Wall_Ratio=90), format="json")
+        self.assertEqual(resp.status_code, 400)
+
+        self.assertEqual(client.get("/api/admin/drift/").status_code, 403)
+        report = auth_client(make_user("root", staff=True)).get("/api/admin/drift/").data
+        wwr = report["features"]["Window_To_Wall_Ratio"]
+        self.assertEqual(wwr["count"], 2)
+        self.assertEqual(wwr["out_of_range_rate"], 0.5)
+        self.assertIsNone(report["reference"])
+        self.assertEqual(report["level"], "unknown")
+
+    def test_shift_against_reference_is_scored(self):
+        for i in range(200):
+            drift.monitor.observe({"Occupancy_Level": 1 + (i % 5)})
+        drift.monitor.flush()
+        call_command("set_drift_reference", "--note", "baseline", "--reset", stdout=open(os.devnull, "w"))
+        self.assertFalse(FeatureDriftStats.objects.exists())
+
+        for i in range(200):
+            drift.monitor.observe({"Occupancy_Level": 5.5 + (i % 2) * 0.5})
+        drift.monitor.flush()
+
+        report = drift.drift_report()
+        self.assertEqual(report["reference"]["note"], "baseline")
+        self.assertEqual(report["features"]["Occupancy_Level"]["level"], "significant")
+        self.assertGreater(report["features"]["Occupancy_Level"]["mean_shift_std"], 1)
+        self.assertEqual(report["level"], "significant")
+        self.assertEqual(DriftReference.objects.count(), 1)
+
+
+class UncertaintyTests(APITestCase):
+    def test_leaf_scoring_reproduces_model_predictions(self):
+        import numpy as np
+        import pandas as pd
+
+        from .views import get_ensemble, get_schema, load_all
+
+        model, _, sc, features = load_all()
+        rows = [get_schema().validate(dict(SAMPLE_INPUT, Building_Type=bt, Occupancy_Level=occ))[0]
+                for bt in ("Bungalow", "Terraced") for occ in (1, 6)]
+        scaled = sc.transform(pd.DataFrame(rows, columns=features))
+        yearly, spread, support = get_ensemble().score(scaled)
+        np.testing.assert_allclose(yearly, model.predict(scaled), rtol=1e-4)
+        self.assertTrue((spread > 0).all())
+        self.assertTrue((support > 0).all())
+
+    def test_predict_returns_interval_only_when_asked(self):
+        client = auth_client(make_user(remaining=5))
+        resp = client.post("/api/predict/", SAMPLE_INPUT, format="json")
+        self.assertNotIn("uncertainty", resp.data)
+
+        resp = client.post("/api/predict/?uncertainty=1", SAMPLE_INPUT, format="json")
+        self.assertEqual(resp.status_code, 200)
+        block = resp.data["uncertainty"]
+        self.assertLessEqual(block["low_month_kwh"], resp.data["total_energy_month_kwh"])
+        self.assertGreaterEqual(block["high_month_kwh"], resp.data["total_energy_month_kwh"])
+        self.assertEqual(block["level"], 0.9)
+
+    def test_batch_results_carry_intervals(self):
+        from .views import predict_batch
+
+        plain, _ = predict_batch([SAMPLE_INPUT, SAMPLE_INPUT])
+        results, errors = predict_batch([SAMPLE_INPUT, {"Building_Type": "Castle"}, SAMPLE_INPUT], uncertainty=True)
+        self.assertEqual([r["row"] for r in results], [0, 2])
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(results[0]["total_energy_month_kwh"], plain[0]["total_energy_month_kwh"])
+        self.assertEqual(results[0]["uncertainty"], results[1]["uncertainty"])
+
+
+class ExplanationTests(APITestCase):
+    POOR = dict(SAMPLE_INPUT, Hvac_Efficiency=1.0, Wall_Insulation=2.0, Lighting_Density=8, Window_To_Wall_Ratio=65)
+
+    def test_contributions_add_up_to_the_prediction(self):
+        from .views import predict_batch
+
+        results, _ = predict_batch([SAMPLE_INPUT, self.POOR], explain=True)
+        for result in results:
+            block = result["explanation"]
+            total = block["baseline_month_kwh"] + sum(c["month_kwh"] for c in block["contributions"])
+            self.assertAlmostEqual(total, result["total_energy_month_kwh"], delta=0.1)
+            self.assertEqual(len(block["contributions"]), 13)
+            by_feature = {c["feature"]: c["value"] for c in block["contributions"]}
+            self.assertEqual(by_feature["Building_Type"], "Detached")
+            self.assertEqual(by_feature["Total_Building_Area"], 120.0)
+
+    def test_recommendations_are_ranked_by_model_impact(self):
+        client = auth_client(make_user(remaining=5))
+        plain = client.post("/api/predict/", self.POOR, format="json").data
+        resp = client.post("/api/predict/?explain=1", self.POOR, format="json")
+        self.assertEqual(resp.status_code, 200)
+
+        ranked = resp.data["ranked_recommendations"]
+        impacts = [r["impact_month_kwh"] for r in ranked]
+        self.assertEqual(impacts, sorted(impacts, reverse=True))
+        self.assertEqual(resp.data["recommendations"], [r["recommendation"] for r in ranked])
+        self.assertEqual(sorted(resp.data["recommendations"]), sorted(plain["recommendations"]))
+        self.assertEqual(resp.data["total_energy_month_kwh"], plain["total_energy_month_kwh"])
+        self.assertNotIn("explanation", plain)
+
+
+class TypedFeatureColumnTests(APITestCase):
+    def test_columns_filled_on_write_and_used_by_history(self):
+        user = make_user()
+        h = PredictionHistory.objects.create(
+            user=user, building_type="Detached", total_energy_month_kwh=100.0,
+            eui_month_kwh_m2=1.0, performance_category="Very Efficient",
+            inputs={k: str(v) for k, v in SAMPLE_INPUT.items()},
+        )
+        h.refresh_from_db()
+        self.assertEqual(h.wall_insulation, 0.6)
+        self.assertEqual(h.total_building_area, 120.0)
+
+        resp = auth_client(user).get("/api/history/")
+        self.assertEqual(resp.data["history"][0]["inputs"]["Lighting_Density"], 5.0)
+
+    def test_untyped_rows_fall_back_to_json(self):
+        user = make_user()
+        h = PredictionHistory.objects.create(
+            user=user, building_type="Detached", total_energy_month_kwh=100.0,
+            eui_month_kwh_m2=1.0, performance_category="Very Efficient",
+            inputs={"Building_Type": "Detached", "Wall_Insulation": "n/a"},
+        )
+        self.assertIsNone(h.wall_insulation)
+        self.assertEqual(h.feature_inputs()["Wall_Insulation"], "n/a")
+
+    def test_history_lists_load_untyped_inputs_in_one_query(self):
+        user = make_user()
+        admin = make_user("root", staff=True)
+        for i in range(6):
+            PredictionHistory.objects.create(
+                user=user, building_type="Detached", total_energy_month_kwh=100.0,
+                eui_month_kwh_m2=1.0, performance_category="Very Efficient",
+                inputs=dict(SAMPLE_INPUT, Wall_Insulation="n/a" if i % 2 else 0.6, Lighting_Density=i),
+            )
+
+        for client, path, key in [
+            (auth_client(user), "/api/history/", "history"),
+            (auth_client(user), "/api/history/changes/", "changes"),
+            (auth_client(admin), "/api/admin/user-history/alice/", "history"),
+            (auth_client(admin), "/api/admin/history/", "all_history"),
+        ]:
+            with CaptureQueriesContext(connection) as queries:
+                resp = client.get(path)
+            self.assertEqual(resp.status_code, 200, path)
+            self.assertEqual(len(resp.data[key]), 6)
+            self.assertEqual(
+                sum('FROM "energy_api_predictioninput"' in q["sql"] for q in queries), 1, path,
+            )
+
+
+class HistoryComparisonTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user(remaining=10)
+        self.client = auth_client(self.user)
+
+    def predict(self, data):
+        resp = self.client.post("/api/predict/", data, format="json")
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return resp.data
+
+    def test_history_shows_stored_comparison_without_model_calls(self):
+        from unittest import mock
+        from .views import DEFAULT_VALUES
+
+        result = self.predict(SAMPLE_INPUT)
+        self.predict(dict(DEFAULT_VALUES, Building_Type="Detached"))
+
+        with mock.patch("energy_api.views.inference.load_all", side_effect=AssertionError("model call")):
+            history = self.client.get("/api/history/").data["history"]
+        optimal, poor = history
+        self.assertEqual(poor["optimized_energy"], result["optimized_energy_month_kwh"])
+        self.assertEqual(poor["savings_kwh"], result["energy_savings_kwh"])
+        self.assertEqual(poor["savings_percent"], result["energy_savings_percent"])
+        self.assertEqual(poor["optimized_category"], result["optimized_category"])
+        self.assertIn("Hvac_Efficiency", poor["recommendation_codes"])
+        # Already at the targets: nothing to recommend, no optimized prediction.
+        self.assertEqual(optimal["recommendation_codes"], [])
+        self.assertIsNone(optimal["savings_kwh"])
+
+    def test_backfill_matches_the_live_computation(self):
+        from .views import DEFAULT_VALUES
+
+        self.predict(SAMPLE_INPUT)
+        self.predict(dict(SAMPLE_INPUT, Hvac_Efficiency=4.0, Total_Building_Area=300))
+        self.predict(dict(DEFAULT_VALUES, Building_Type="Detached"))
+        broken = PredictionHistory.objects.create(
+            user=self.user, building_type="Castle", total_energy_month_kwh=1.0,
+            performance_category="Unknown", inputs={"Building_Type": "Castle"},
+        )
+        live = {h.id: h.comparison() for h in PredictionHistory.objects.exclude(pk=broken.pk)}
+        PredictionHistory.objects.update(
+            optimized_energy_month_kwh=None, energy_savings_kwh=None, energy_savings_percent=None,
+            optimized_category="", recommendation_codes=None,
+        )
+
+        import io
+
+        out = io.StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command("backfill_history_comparison", batch_size=2, stdout=out)
+        # One select and one executemany per batch, plus the final empty select,
+        # the stored inputs of the one row without typed columns and marking it.
+        statements = [q for q in queries if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))]
+        self.assertEqual(len(statements), 2 * 2 + 1 + 1 + 1)
+        self.assertIn(f"Skipped row {broken.pk}:", out.getvalue())
+
+        for h in PredictionHistory.objects.exclude(pk=broken.pk):
+            stored, expected = h.comparison(), live[h.id]
+            self.assertEqual(stored["optimized_energy"], expected["optimized_energy"])
+            self.assertEqual(stored["optimized_category"], expected["optimized_category"])
+            self.assertEqual(stored["recommendation_codes"], expected["recommendation_codes"])
+            if expected["savings_kwh"] is None:
+                self.assertIsNone(stored["savings_kwh"])
+            else:
+                # Recomputed against the rounded energy stored on the row.
+                self.assertAlmostEqual(stored["savings_kwh"], expected["savings_kwh"], delta=0.02)
+        broken.refresh_from_db()
+        self.assertIsNone(broken.recommendation_codes)
+        self.assertTrue(broken.comparison_skipped)
+
+        # Nothing is left to backfill: the invalid row is not scanned again.
+        out = io.StringIO()
+        call_command("backfill_history_comparison", batch_size=2, stdout=out)
+        self.assertNotIn("Skipped row", out.getvalue())
+        self.assertIn("Backfilled 0 rows", out.getvalue())
+
+
+class PredictionInputTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user(remaining=20)
+        self.client = auth_client(self.user)
+
+    def predict(self, data, query=""):
+        resp = self.client.post(f"/api/predict/{query}", data, format="json")
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return resp.data
+
+    def test_equivalent_payloads_share_one_digest(self):
+        import importlib
+
+        variants = [
+            SAMPLE_INPUT,
+            {k: str(v) for k, v in reversed(list(SAMPLE_INPUT.items()))},
+            dict(SAMPLE_INPUT, Building_Type=" detached ", Lighting_Density=5.0),
+        ]
+        digests = {inputs_digest(canonical_inputs(v)) for v in variants}
+        self.assertEqual(len(digests), 1)
+        self.assertNotEqual(digests, {inputs_digest(canonical_inputs(dict(SAMPLE_INPUT, Lighting_Density=6)))})
+
+        # The data migration hashes existing rows with a frozen copy.
+        migration = importlib.import_module("energy_api.migrations.0011_prediction_inputs")
+        for v in variants + [{"Building_Type": "Castle", "Wall_Insulation": "n/a"}]:
+            self.assertEqual(migration.inputs_digest(migration.canonical_inputs(v)), inputs_digest(canonical_inputs(v)))
+
+    def test_duplicate_prediction_reuses_inputs_and_cached_result(self):
+        from unittest import mock
+
+        first = self.predict(SAMPLE_INPUT)
+        with mock.patch("energy_api.views.inference.score_scaled", side_effect=AssertionError("scored again")):
+            again = self.predict({k: str(v) for k, v in SAMPLE_INPUT.items()})
+        for key in ("total_energy_month_kwh", "optimized_energy_month_kwh", "energy_savings_kwh", "recommendations"):
+            self.assertEqual(again[key], first[key])
+
+        self.assertEqual(PredictionInput.objects.count(), 1)
+        rows = PredictionHistory.objects.order_by("id")
+        self.assertEqual({h.input_set_id for h in rows}, {PredictionInput.objects.get().id})
+        self.assertEqual(rows[1].inputs["Lighting_Density"], 5.0)
+
+        # Explanations still need a scoring pass; a new model invalidates the cache.
+        self.assertIn("explanation", self.predict(SAMPLE_INPUT, "?explain=1"))
+        from .views import inference
+        with mock.patch.dict(inference._loaded, version="other-model"), \
+                mock.patch("energy_api.views.inference.score_scaled", wraps=inference.score_scaled) as scored:
+            self.predict(SAMPLE_INPUT)
+        self.assertEqual(scored.call_count, 1)
+        self.assertEqual(PredictionInput.objects.get().result_model, "other-model")
+
+    @override_settings(PREDICTION_JOB_CHUNK_SIZE=10)
+    def test_job_scores_each_distinct_input_once(self):
+        from unittest import mock
+        from .views import inference
+
+        other = dict(SAMPLE_INPUT, Hvac_Efficiency=4.0)
+        resp = self.client.post(
+            "/api/jobs/", {"file": csv_upload([SAMPLE_INPUT, other, SAMPLE_INPUT, SAMPLE_INPUT, other])},
+            format="multipart",
+        )
+        job = claim_next_job("w1")
+        with mock.patch("energy_api.views.inference.score_with_optimized", wraps=inference.score_with_optimized) as scored:
+            run_job(job, "w1")
+        self.assertEqual([len(call.args[0]) for call in scored.call_args_list], [2])
+        self.assertEqual(PredictionInput.objects.count(), 2)
+        self.assertEqual(PredictionHistory.objects.filter(job_id=resp.data["job_id"]).count(), 5)
+
+
+class HistoryCompareTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user(remaining=10)
+        self.client = auth_client(self.user)
+
+    def add_history(self, inputs, energy, user=None, **fields):
+        return PredictionHistory.objects.create(
+            user=user or self.user, building_type=inputs["Building_Type"], total_energy_month_kwh=energy,
+            eui_month_kwh_m2=round(energy / float(inputs["Total_Building_Area"]), 2),
+            performance_category="Average Efficiency", inputs=inputs, **fields,
+        )
+
+    def compare(self, query, status=200):
+        resp = self.client.get(f"/api/history/compare/?{query}")
+        self.assertEqual(resp.status_code, status, resp.content)
+        return resp.data
+
+    def test_compare_fetches_requested_rows_in_one_query(self):
+        from unittest import mock
+
+        rows = [self.add_history(dict(SAMPLE_INPUT, Hvac_Efficiency=h), 1000.0 + 100 * i)
+                for i, h in enumerate((1.5, 2.0, 3.0))]
+        self.add_history(SAMPLE_INPUT, 999.0, is_deleted_by_user=True)
+        a, b, c = rows
+
+        with CaptureQueriesContext(connection) as queries, \
+                mock.patch("energy_api.views.inference.load_all", side_effect=AssertionError("model call")):
+            data = self.compare(f"ids={c.id},{a.id},{c.id}")
+        # The token lookup, then one primary-key query for the rows and their inputs.
+        self.assertEqual(len(queries), 2, [q["sql"] for q in queries])
+        self.assertIn('"id" IN', queries[1]["sql"])
+
+        self.assertEqual(data["baseline_id"], c.id)
+        self.assertEqual([item["id"] for item in data["items"]], [c.id, a.id])
+        hvac = data["features"].index("Hvac_Efficiency")
+        baseline, other = data["items"]
+        self.assertEqual(len(other["values"]), len(data["features"]))
+        self.assertEqual(other["values"][hvac], 1.5)
+        self.assertEqual(other["delta"]["values"][hvac], -1.5)
+        self.assertEqual(other["delta"]["energy"], -200.0)
+        self.assertEqual(set(baseline["delta"]["values"]), {0.0})
+        self.assertNotIn("rescored", other)
+
+    def test_compare_rejects_foreign_hidden_and_oversized_requests(self):
+        mine = self.add_history(SAMPLE_INPUT, 1000.0)
+        hidden = self.add_history(SAMPLE_INPUT, 1000.0, is_deleted_by_user=True)
+        theirs = self.add_history(SAMPLE_INPUT, 1000.0, user=make_user("bob"))
+
+        self.assertEqual(self.compare(f"ids={mine.id},{theirs.id},{hidden.id}", 404)["missing"], [theirs.id, hidden.id])
+        self.compare("ids=", 400)
+        self.compare("ids=1,two", 400)
+        with override_settings(HISTORY_COMPARE_MAX_IDS=2):
+            self.compare(f"ids={mine.id},{mine.id + 1},{mine.id + 2}", 400)
+            self.compare("ids=" + "1" * 100, 400)
+
+        staff = auth_client(make_user("admin", staff=True))
+        resp = staff.get(f"/api/history/compare/?ids={theirs.id},{hidden.id}")
+        self.assertEqual(resp.status_code, 200, resp.content)
+
+    def test_rescore_uses_one_batched_predict(self):
+        from unittest import mock
+        from .views import DEFAULT_VALUES, inference, predict_batch
+
+        payloads = [SAMPLE_INPUT, dict(SAMPLE_INPUT, Total_Building_Area=300), dict(DEFAULT_VALUES, Building_Type="Detached")]
+        rows = [self.add_history(p, 1.0) for p in payloads]
+        expected, _ = predict_batch(payloads, compare=True)
+        ids = ",".join(str(h.id) for h in rows)
+
+        with mock.patch("energy_api.views.inference.score_scaled", side_effect=AssertionError("scored alone")), \
+                mock.patch("energy_api.views.inference.model_version", return_value="v1"), \
+                mock.patch.object(inference, "score_with_optimized", wraps=inference.score_with_optimized) as scored:
+            data = self.compare(f"ids={ids}&rescore=1")
+        self.assertEqual([len(call.args[0]) for call in scored.call_args_list], [3])
+        self.assertEqual(data["model_version"], "v1")
+
+        for item, result in zip(data["items"], expected):
+            optimized = result["optimized"] or {}
+            self.assertEqual(item["rescored"]["energy"], result["total_energy_month_kwh"])
+            self.assertEqual(item["rescored"]["category"], result["performance_category"])
+            self.assertEqual(item["rescored"]["savings_kwh"], optimized.get("energy_savings_kwh"))
+        self.assertIsNone(data["items"][2]["rescored"]["optimized_energy"])
+
+        # Inputs this model version already scored are not scored again.
+        PredictionInput.objects.filter(history__in=rows[:2]).update(
+            result={"monthly": 10.0, "optimized": None}, result_model="v1",
+        )
+        with mock.patch("energy_api.views.inference.model_version", return_value="v1"), \
+                mock.patch.object(inference, "score_with_optimized", wraps=inference.score_with_optimized) as scored:
+            data = self.compare(f"ids={ids}&rescore=1")
+        self.assertEqual([len(call.args[0]) for call in scored.call_args_list], [1])
+        self.assertEqual(data["items"][0]["rescored"]["energy"], 10.0)
+
+
+class HistoryBulkMutationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.client = auth_client(self.user)
+
+    def add_rows(self, n, user=None, building_type="Detached"):
+        PredictionHistory.objects.bulk_create([
+            PredictionHistory(
+                user=user or self.user, building_type=building_type, total_energy_month_kwh=100.0,
+                eui_month_kwh_m2=1.0, performance_category="Very Efficient", inputs=SAMPLE_INPUT,
+            )
+            for _ in range(n)
+        ])
+        return list(PredictionHistory.objects.filter(user=user or self.user).order_by("-id").values_list("id", flat=True)[:n])
+
+    def mutate(self, action, body, status=200):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.post(f"/api/history/{action}/", body, format="json")
+        self.assertEqual(resp.status_code, status, resp.content)
+        statements = [q["sql"] for q in queries if "SAVEPOINT" not in q["sql"]]
+        return resp.data, statements
+
+    def test_hide_and_restore_run_one_update_for_any_number_of_ids(self):
+        few, many = self.add_rows(3), self.add_rows(250)
+        foreign = self.add_rows(2, user=make_user("bob"))
+
+        data, small = self.mutate("hide", {"ids": few + foreign})
+        self.assertEqual(data["updated"], 3)
+        data, large = self.mutate("hide", {"ids": many + few})
+        self.assertEqual(data["updated"], 250)  # `few` were already hidden
+        # The token lookup and one UPDATE, whatever the list size.
+        self.assertEqual(len(small), 2)
+        self.assertEqual(len(large), 2)
+        self.assertTrue(large[1].startswith("UPDATE"))
+        self.assertIn("user_id", large[1])
+
+        self.assertEqual(self.mutate("restore", {"ids": few})[0]["updated"], 3)
+        self.assertEqual(self.mutate("restore", {"ids": few})[0]["updated"], 0)
+        visible = PredictionHistory.objects.filter(is_deleted_by_user=False)
+        self.assertEqual(set(visible.values_list("id", flat=True)), set(few + foreign))
+
+    def test_filters_and_validation(self):
+        detached = self.add_rows(4)
+        terraced = self.add_rows(2, building_type="Terraced")
+        PredictionHistory.objects.filter(pk__in=detached[:2]).update(created_at=timezone.now() - timedelta(days=10))
+
+        self.assertEqual(self.mutate("hide", {"building_type": "terraced"})[0]["updated"], 2)
+        before = (timezone.now() - timedelta(days=5)).date().isoformat()
+        self.assertEqual(self.mutate("hide", {"created_before": before})[0]["updated"], 2)
+        self.assertEqual(self.mutate("restore", {"ids": terraced, "building_type": "Detached"})[0]["updated"], 0)
+
+        self.mutate("hide", {}, 400)
+        self.mutate("hide", {"ids": "1,2"}, 400)
+        self.mutate("hide", {"ids": [1, True]}, 400)
+        self.mutate("hide", {"created_after": "last week"}, 400)
+        with override_settings(HISTORY_BULK_MAX_IDS=3):
+            self.mutate("hide", {"ids": detached}, 400)
+
+    def test_delete_item_is_a_single_update(self):
+        mine, = self.add_rows(1)
+        theirs, = self.add_rows(1, user=make_user("bob"))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.delete(f"/api/history/delete/{mine}/").status_code, 200)
+        self.assertEqual(len([q for q in queries if "SAVEPOINT" not in q["sql"]]), 2)
+        self.assertTrue(PredictionHistory.objects.get(pk=mine).is_deleted_by_user)
+
+        self.assertEqual(self.client.delete(f"/api/history/delete/{mine}/").status_code, 200)
+        self.assertEqual(self.client.delete(f"/api/history/delete/{theirs}/").status_code, 403)
+        self.assertEqual(self.client.delete(f"/api/history/delete/{theirs + 100}/").status_code, 404)
+        self.assertFalse(PredictionHistory.objects.get(pk=theirs).is_deleted_by_user)
+
+        staff = auth_client(make_user("admin", staff=True))
+        self.assertEqual(staff.delete(f"/api/history/delete/{theirs}/").status_code, 200)
+        self.assertTrue(PredictionHistory.objects.get(pk=theirs).is_deleted_by_user)
+
+
+class HistorySyncTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.client = auth_client(self.user)
+
+    def add_history(self, user=None, **fields):
+        return PredictionHistory.objects.create(
+            user=user or self.user, building_type="Detached", total_energy_month_kwh=100.0,
+            eui_month_kwh_m2=1.0, performance_category="Very Efficient", inputs=SAMPLE_INPUT, **fields,
+        )
+
+    def sync(self, cursor=None):
+        query = f"?since={cursor}" if cursor else ""
+        resp = self.client.get(f"/api/history/changes/{query}")
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return resp.data
+
+    def test_history_limit_returns_newest_rows(self):
+        rows = [self.add_history() for _ in range(7)]
+        self.add_history(is_deleted_by_user=True)
+        resp = self.client.get("/api/history/?limit=5")
+        self.assertEqual([h["id"] for h in resp.data["history"]], [h.id for h in reversed(rows)][:5])
+        self.assertEqual(len(self.client.get("/api/history/").data["history"]), 7)
+
+    def test_expired_before_follows_archive_runs(self):
+        old = self.add_history()
+        PredictionHistory.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=400))
+        # Never archived: old rows are still history and must stay cached.
+        self.assertIsNone(self.sync()["expired_before"])
+
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir, ignore_errors=True)
+        with override_settings(HISTORY_ARCHIVE_DIR=archive_dir):
+            call_command("archive_history", days=300, stdout=open(os.devnull, "w"))
+            call_command("archive_history", days=365, dry_run=True, stdout=open(os.devnull, "w"))
+        expired = self.sync()["expired_before"]
+        self.assertAlmostEqual(
+            (timezone.now() - expired).total_seconds(), timedelta(days=300).total_seconds(), delta=60,
+        )
+
+    @override_settings(HISTORY_SYNC_OVERLAP_SECONDS=0)
+    def test_changes_and_tombstones_since_cursor(self):
+        from .views.history import format_cursor
+
+        a, b = self.add_history(), self.add_history()
+        self.add_history(is_deleted_by_user=True)
+        self.add_history(user=make_user("bob"))
+
+        first = self.sync()
+        self.assertTrue(first["reset"])
+        self.assertEqual([h["id"] for h in first["changes"]], [b.id, a.id])
+        self.assertEqual(first["changes"][0], self.client.get("/api/history/").data["history"][0])
+
+        c = self.add_history()
+        self.client.delete(f"/api/history/delete/{a.id}/")
+        second = self.sync(first["cursor"])
+        self.assertFalse(second["reset"])
+        self.assertEqual([h["id"] for h in second["changes"]], [c.id])
+        self.assertEqual(second["deleted"], [a.id])
+
+        self.client.delete("/api/history/delete-all/")
+        third = self.sync(second["cursor"])
+        self.assertEqual((third["changes"], third["deleted"]), ([], [c.id, b.id]))
+        quiet = self.sync(third["cursor"])
+        self.assertEqual((quiet["changes"], quiet["deleted"]), ([], []))
+
+        self.assertEqual(self.client.get("/api/history/changes/?since=soon").status_code, 400)
+        stale = format_cursor(timezone.now() - timedelta(days=31))
+        self.assertTrue(self.sync(stale)["reset"])
+
+    def test_row_committed_after_a_sync_is_not_missed(self):
+        from .views.history import parse_cursor
+
+        first = self.sync()
+        # Stamped before the first sync read the table, visible only after it.
+        late = self.add_history()
+        PredictionHistory.objects.filter(pk=late.pk).update(
+            updated_at=parse_cursor(first["cursor"]) + timedelta(seconds=1),
+        )
+        self.assertEqual([h["id"] for h in self.sync(first["cursor"])["changes"]], [late.id])
+
+
+class HistorySyncConcurrencyTests(TransactionTestCase):
+    def test_sync_under_concurrent_inserts_converges(self):
+        from django.db import OperationalError, transaction
+        import time
+
+        user = make_user()
+        client = auth_client(user)
+
+        def retry(fn):
+            for _ in range(1000):
+                try:
+                    return fn()
+                except OperationalError:  # SQLite: table locked by another writer
+                    time.sleep(0.002)
+            raise AssertionError("database stayed locked")
+
+        def insert():
+            with transaction.atomic():
+                h = PredictionHistory.objects.create(
+                    user=user, building_type="Detached", total_energy_month_kwh=100.0,
+                    eui_month_kwh_m2=1.0, performance_category="Very Efficient", inputs=SAMPLE_INPUT,
+                )
+                # updated_at is stamped now but only visible at commit.
+                time.sleep(0.005)
+                if h.id % 7 == 0:
+                    h.is_deleted_by_user = True
+                    h.save()
+
+        def writer():
+            try:
+                for _ in range(15):
+                    retry(insert)
+            finally:
+                connection.close()
+
+        local = {}
+        cursor = None
+
+        def sync():
+            nonlocal cursor
+            data = retry(lambda: client.get(
+                "/api/history/changes/" + (f"?since={cursor}" if cursor else "")
+            ).data)
+            if data["reset"]:
+                local.clear()
+            local.update((h["id"], h) for h in data["changes"])
+            for pk in data["deleted"]:
+                local.pop(pk, None)
+            cursor = data["cursor"]
+
+        threads = [threading.Thread(target=writer) for _ in range(3)]
+        for t in threads:
+            t.start()
+        while any(t.is_alive() for t in threads):
+            sync()
+            time.sleep(0.003)
+        for t in threads:
+            t.join()
+        sync()
+
+        visible = set(PredictionHistory.objects.filter(user=user, is_deleted_by_user=False).values_list("id", flat=True))
+        self.assertEqual(PredictionHistory.objects.filter(user=user).count(), 45)
+        self.assertEqual(set(local), visible)
+
+
+class ScenarioSimulationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user(remaining=5)
+        self.client = auth_client(self.user)
+        from .views import DEFAULT_VALUES
+        self.building = dict(DEFAULT_VALUES, Building_Type="Detached", Total_Building_Area=150)
+
+    def simulate(self, body, status=200):
+        resp = self.client.post("/api/simulate/", body, format="json")
+        self.assertEqual(resp.status_code, status, resp.content)
+        return resp.data
+
+    def test_all_scenarios_are_scored_in_one_model_call(self):
+        from unittest import mock
+        from .views import inference
+
+        profiles = self.client.get("/api/simulate/profiles/").data["profiles"]
+        with mock.patch("energy_api.views.inference.score_scaled", wraps=inference.score_scaled) as scored:
+            data = self.simulate({"building": self.building})
+        self.assertEqual([len(call.args[0]) for call in scored.call_args_list], [12 * (1 + len(profiles))])
+        self.assertEqual([s["name"] for s in data["scenarios"]], ["flat", *profiles])
+        self.assertEqual(len(data["months"]), 12)
+
+        # Without modifiers the months add up to the plain prediction.
+        flat, climate = data["scenarios"][0], data["scenarios"][1]
+        predicted = self.client.post("/api/predict/", self.building, format="json").data
+        self.assertAlmostEqual(flat["total_kwh"], predicted["total_energy_month_kwh"] * 12, delta=0.5)
+        self.assertAlmostEqual(sum(flat["monthly_kwh"]), flat["total_kwh"], delta=0.1)
+        self.assertLess(flat["monthly_kwh"][1], flat["monthly_kwh"][0])  # fewer days in February
+        # Worse heat pump efficiency in winter costs energy.
+        self.assertEqual(climate["profiles"], ["uk_climate"])
+        self.assertGreater(climate["monthly_kwh"][0], flat["monthly_kwh"][0])
+        self.assertEqual(climate["monthly_kwh"][6], flat["monthly_kwh"][6])
+
+        # A simulation is not stored but costs one prediction, like /predict/.
+        self.assertEqual(PredictionHistory.objects.count(), 1)
+        self.assertEqual(Subscription.objects.get(user=self.user).remaining_predictions, 3)
+
+    def test_simulation_is_charged(self):
+        Subscription.objects.filter(user=self.user).update(remaining_predictions=1)
+        self.simulate({"building": self.building})
+        self.assertEqual(Subscription.objects.get(user=self.user).remaining_predictions, 0)
+        self.simulate({"building": self.building}, 403)
+
+    def test_failed_scoring_gives_the_prediction_back(self):
+        from unittest import mock
+
+        with mock.patch("energy_api.views.inference.score_scaled", side_effect=RuntimeError("model gone")):
+            with self.assertRaises(RuntimeError):
+                self.client.post("/api/simulate/", {"building": self.building}, format="json")
+        self.assertEqual(Subscription.objects.get(user=self.user).remaining_predictions, 5)
+
+    def test_custom_modifiers_overrides_and_clipping(self):
+        winter = [0.5, 0.5] + [1.0] * 9 + [0.5]
+        data = self.simulate({"building": self.building, "scenarios": [
+            {"name": "retrofit", "overrides": {"Hvac_Efficiency": 4.5}},
+            {"name": "cold", "profiles": ["uk_climate"], "modifiers": {"Hvac_Efficiency": winter}},
+            {"modifiers": {"Hvac_Efficiency": [10] * 12}},
+        ]})
+        retrofit, cold, clipped = data["scenarios"]
+        self.assertLess(retrofit["total_kwh"], cold["total_kwh"])
+        self.assertEqual(cold["clipped"], [])
+        self.assertGreater(cold["monthly_kwh"][0], cold["monthly_kwh"][6])
+        self.assertEqual(clipped["name"], "Scenario 3")
+        self.assertEqual(clipped["clipped"], ["Hvac_Efficiency"])
+
+    @override_settings(THROTTLE_PLAN_RATES={"free": (100, 100)})
+    def test_invalid_requests(self):
+        self.simulate({"scenarios": []}, 400)
+        self.simulate({"building": dict(self.building, Hvac_Efficiency=99)}, 400)
+        self.simulate({"building": self.building, "scenarios": [{"profiles": ["monsoon"]}]}, 400)
+        self.simulate({"building": self.building, "scenarios": [{"modifiers": {"Occupancy_Level": [1.0] * 11}}]}, 400)
+        self.simulate({"building": self.building, "scenarios": [{"modifiers": {"Total_Building_Area": [1.0] * 12}}]}, 400)
+        self.simulate({"building": self.building, "scenarios": [{"overrides": {"Wall_Insulation": -1}}]}, 400)
+        with override_settings(SIMULATION_MAX_SCENARIOS=2):
+            self.simulate({"building": self.building, "scenarios": [{}, {}, {}]}, 400)
+
+        Subscription.objects.filter(user=self.user).update(remaining_predictions=0)
+        self.simulate({"building": self.building}, 403)
+
+
+class AnalyticsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.client = auth_client(self.user)
+
+    def add_history(self, eui, building_type="Detached", category="Very Efficient", user=None, savings=None):
+        return PredictionHistory.objects.create(
+            user=user or self.user, building_type=building_type, total_energy_month_kwh=eui * 100,
+            eui_month_kwh_m2=eui, performance_category=category, inputs=SAMPLE_INPUT,
+            energy_savings_kwh=savings,
+        )
+
+    def test_incremental_refresh_matches_full_recompute(self):
+        from .analytics import _aggregate, get_state, scope_queryset
+
+        self.add_history(5.0)
+        self.add_history(70.0, "Terraced", "Very Poor (Inefficient)")
+        get_state(self.user)
+
+        self.add_history(12.0, "terraced")
+        incremental = get_state(self.user)
+        self.assertEqual(incremental, _aggregate(scope_queryset(self.user)))
+        self.assertEqual(incremental["building_types"]["terraced"][0], 2)
+
+        # A soft delete below the watermark forces a rebuild.
+        PredictionHistory.objects.filter(eui_month_kwh_m2=70.0).update(is_deleted_by_user=True)
+        self.assertEqual(sum(get_state(self.user)["histogram"]), 2)
+
+        # So does hiding one row and restoring another, which keeps the counts.
+        self.client.post("/api/history/hide/", {"ids": [PredictionHistory.objects.get(eui_month_kwh_m2=5.0).id]}, format="json")
+        self.client.post("/api/history/restore/", {"category": "Very Poor (Inefficient)"}, format="json")
+        self.add_history(20.0)
+        self.assertEqual(get_state(self.user), _aggregate(scope_queryset(self.user)))
+
+    def test_top_savings_ranks_by_stored_savings(self):
+        from .analytics import get_state
+
+        self.add_history(60.0, savings=5.0)   # highest EUI, small saving
+        self.add_history(10.0, savings=80.0)
+        self.add_history(40.0)                # already optimal: no savings stored
+        get_state(self.user)
+        self.add_history(20.0, savings=30.0)  # merged in incrementally
+
+        resp = self.client.get("/api/analytics/top-savings/")
+        self.assertEqual([r["savings_kwh"] for r in resp.data["top_savings"]], [80.0, 30.0, 5.0])
+
+    def test_endpoints_and_scopes(self):
+        self.add_history(5.0, savings=40.0)
+        self.add_history(30.0, user=make_user("bob"), savings=25.0)
+
+        resp = self.client.get("/api/analytics/eui-histogram/")
+        self.assertEqual(sum(b["count"] for b in resp.data["bins"]), 1)
+        self.assertEqual(len(resp.data["bins"]), 25)
+
+        self.assertEqual(self.client.get("/api/analytics/?scope=all").status_code, 403)
+
+        admin = auth_client(make_user("root", staff=True))
+        resp = admin.get("/api/analytics/top-savings/?scope=all&limit=1")
+        self.assertEqual([r["savings_kwh"] for r in resp.data["top_savings"]], [40.0])
+
+        resp = admin.get("/api/analytics/timeseries/?scope=all&period=week")
+        self.assertEqual(sum(p["count"] for p in resp.data["series"]), 2)
+
+
+class ResponseEncodingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.client = auth_client(self.user)
+        PredictionHistory.objects.bulk_create([
+            PredictionHistory(
+                user=self.user, building_type="Detached", total_energy_month_kwh=100.0 + i,
+                eui_month_kwh_m2=1.0, performance_category="Very Efficient", inputs=SAMPLE_INPUT,
+            )
+            for i in range(50)
+        ])
+
+    def test_large_responses_are_gzipped_when_accepted(self):
+        plain = self.client.get("/api/history/")
+        self.assertNotIn("Content-Encoding", plain)
+
+        resp = self.client.get("/api/history/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", resp["Vary"])
+        self.assertLess(len(resp.content), len(plain.content) / 4)
+        self.assertEqual(json.loads(gzip.decompress(resp.content)), json.loads(plain.content))
+
+        resp = self.client.get("/api/history/", HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertNotIn("Content-Encoding", resp)
+
+    def test_only_api_json_and_csv_are_compressed(self):
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .middleware import CompressionMiddleware
+
+        page = "<html>" + "admin " * 1000 + "</html>"
+        middleware = CompressionMiddleware(lambda request: HttpResponse(page, content_type="text/html"))
+        for path in ("/admin/login/", "/api/history/"):
+            request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING="gzip")
+            self.assertNotIn("Content-Encoding", middleware(request), path)
+
+        body = "id,energy\n" + "1,100.0\n" * 500
+        middleware = CompressionMiddleware(lambda request: HttpResponse(body, content_type="text/csv"))
+        static = middleware(RequestFactory().get("/static/export.csv", HTTP_ACCEPT_ENCODING="gzip"))
+        self.assertNotIn("Content-Encoding", static)
+        api = middleware(RequestFactory().get("/api/export/", HTTP_ACCEPT_ENCODING="gzip"))
+        self.assertEqual(api["Content-Encoding"], "gzip")
+
+    def test_streams_use_only_an_accepted_coding(self):
+        from unittest import mock
+        from django.http import StreamingHttpResponse
+        from django.test import RequestFactory
+        from . import middleware
+
+        compress = middleware.CompressionMiddleware(
+            lambda request: StreamingHttpResponse((b"1,100.0\n" for _ in range(500)), content_type="text/csv")
+        )
+        with mock.patch.object(middleware, "brotli", mock.Mock()):
+            resp = compress(RequestFactory().get("/api/jobs/1/results/", HTTP_ACCEPT_ENCODING="br"))
+            self.assertNotIn("Content-Encoding", resp)
+            self.assertEqual(b"".join(resp.streaming_content), b"1,100.0\n" * 500)
+
+            resp = compress(RequestFactory().get("/api/jobs/1/results/", HTTP_ACCEPT_ENCODING="br, gzip"))
+            self.assertEqual(resp["Content-Encoding"], "gzip")
+            self.assertEqual(gzip.decompress(b"".join(resp.streaming_content)), b"1,100.0\n" * 500)
+
+    def test_small_responses_are_not_compressed(self):
+        resp = self.client.get("/api/defaults/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertLess(len(resp.content), 1024)
+        self.assertNotIn("Content-Encoding", resp)
+
+    def test_columnar_format(self):
+        rows = self.client.get("/api/history/").json()["history"]
+        columns = self.client.get("/api/history/?format=columns").json()["history"]
+        self.assertEqual(set(columns), set(rows[0]))
+        self.assertEqual(columns["energy"], [r["energy"] for r in rows])
+        self.assertEqual(columns["inputs"][0], rows[0]["inputs"])
+
+
+@override_settings(
+    THROTTLE_PLAN_RATES={"free": (2, 1), "basic": (4, 1), "super": (4, 1), "premium": (4, 1)},
+    THROTTLE_RATES={"predict_ip": (100, 100), "auth": (100, 100), "email": (2, 1)},
+)
+class ThrottlingTests(APITestCase):
+    def test_plan_bucket_returns_429_with_retry_after(self):
+        client = auth_client(make_user())
+        codes = [client.post("/api/predict/", SAMPLE_INPUT, format="json").status_code for _ in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+
+        resp = client.post("/api/predict/", SAMPLE_INPUT, format="json")
+        self.assertEqual(resp.status_code, 429)
+        self.assertGreater(int(resp["Retry-After"]), 0)
+
+    def test_paid_plan_gets_larger_bucket(self):
+        user = make_user()
+        Subscription.objects.filter(user=user).update(plan="basic")
+        client = auth_client(user)
+        codes = [client.post("/api/predict/", SAMPLE_INPUT, format="json").status_code for _ in range(5)]
+        self.assertEqual(codes, [200] * 4 + [429])
+
+    def test_email_endpoints_throttled_per_ip(self):
+        make_user()
+        client = APIClient()
+        codes = [
+            client.post("/api/get-username-by-email/", {"email": "alice@example.com"}, format="json").status_code
+            for _ in range(3)
+        ]
+        self.assertEqual(codes, [200, 200, 429])
+
+    def test_rotating_forwarded_for_does_not_reset_ip_bucket(self):
+        make_user()
+        client = APIClient()
+        codes = [
+            client.post(
+                "/api/get-username-by-email/", {"email": "alice@example.com"}, format="json",
+                HTTP_X_FORWARDED_FOR=f"10.0.0.{i}",
+            ).status_code
+            for i in range(3)
+        ]
+        self.assertEqual(codes, [200, 200, 429])
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "NUM_PROXIES": 1})
+    def test_behind_proxy_only_last_forwarded_hop_is_trusted(self):
+        make_user()
+        client = APIClient()
+        codes = [
+            client.post(
+                "/api/get-username-by-email/", {"email": "alice@example.com"}, format="json",
+                HTTP_X_FORWARDED_FOR=f"10.0.0.{i}, 203.0.113.7",
+            ).status_code
+            for i in range(3)
+        ]
+        self.assertEqual(codes, [200, 200, 429])
+
+    def test_memory_store_is_bounded(self):
+        from unittest import mock
+
+        store = throttling.MemoryBucketStore()
+        with mock.patch.object(throttling, "MAX_MEMORY_KEYS", 3):
+            for key in ["a", "b", "c", "a", "d"]:
+                store.consume(key, 1, 1.0)
+        self.assertEqual(len(store), 3)
+        # "b" was least recently used and starts full again; "a" kept its spent token.
+        self.assertEqual(store.consume("b", 1, 0.001), 0)
+        self.assertGreater(store.consume("a", 1, 0.001), 0)
+
+    def test_cache_store_counts_atomically_per_window(self):
+        store = throttling.CacheBucketStore()
+        waits = [store.consume("k", 3, 1.0) for _ in range(4)]
+        self.assertEqual(waits[:3], [0.0] * 3)
+        self.assertGreater(waits[3], 0)
+        self.assertLessEqual(waits[3], 3.0)
+
+    def test_cache_backend_requires_shared_cache(self):
+        with override_settings(THROTTLE_BACKEND="cache"):
+            errors = throttling.check_shared_cache(None)
+        self.assertEqual([e.id for e in errors], ["energy_api.E001"])
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": ""}}
+        with override_settings(THROTTLE_BACKEND="cache", CACHES=redis):
+            self.assertEqual(throttling.check_shared_cache(None), [])
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.server.peers.add(self.client_address)
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        order_id = f"order_{len(self.server.orders) + 1}"
+        self.server.orders.append(order_id)
+        body = json.dumps({"id": order_id, "amount": 7500, "currency": "INR"}).encode()
+        self.send_response(202 if self.path == "/v3/mail/send" else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class PooledClientTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        from .utils import clients
+
+        self.clients = clients
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self.server.peers = set()
+        self.server.orders = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        url = f"http://127.0.0.1:{self.server.server_port}"
+        override = override_settings(SENDGRID_HOST=url, RAZORPAY_BASE_URL=url + "/v1")
+        override.enable()
+        self.addCleanup(override.disable)
+        clients.reset_clients()
+        self.addCleanup(clients.reset_clients)
+
+    def test_emails_reuse_one_connection(self):
+        from .utils.emails import send_email
+
+        for i in range(5):
+            send_email(f"subject {i}", "body", "someone@example.com")
+        self.assertEqual(len(self.server.peers), 1)
+
+        self.clients.reset_clients()
+        send_email("after reset", "body", "someone@example.com")
+        self.assertEqual(len(self.server.peers), 2)
+
+    def test_razorpay_orders_reuse_one_connection(self):
+        client = auth_client(make_user())
+        for _ in range(3):
+            resp = client.post("/api/create-order/", {"plan": "basic", "amount": 75}, format="json")
+            self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertEqual(len(self.server.peers), 1)
+        self.assertEqual(PaymentOrder.objects.filter(plan="basic", status="created").count(), 3)
+
+
+@override_settings(RAZORPAY_KEY_SECRET="secret")
+class PaymentLedgerTests(TransactionTestCase):
+    def setUp(self):
+        throttling.reset()
+        self.user = make_user()
+        self.order = PaymentOrder.objects.create(
+            razorpay_order_id="order_abc", user=self.user, plan="premium", amount=30000
+        )
+
+    def callback(self, client, plan="basic"):
+        import hashlib
+        import hmac
+
+        signature = hmac.new(b"secret", b"order_abc|pay_1", hashlib.sha256).hexdigest()
+        return client.post("/api/verify-payment/", {
+            "razorpay_order_id": "order_abc",
+            "razorpay_payment_id": "pay_1",
+            "razorpay_signature": signature,
+            "plan": plan,
+        }, format="json")
+
+    def test_ledger_plan_wins_and_duplicates_are_noops(self):
+        from unittest import mock
+
+        client = auth_client(self.user)
+        with mock.patch("energy_api.views.payments.send_email") as send:
+            first = self.callback(client, plan="basic")
+            second = self.callback(client)
+
+        self.assertEqual(first.data["plan"], "premium")
+        self.assertEqual(second.data["message"], "Payment already verified")
+        self.assertEqual(send.call_count, 1)
+
+        # A later top-up must not be reset by a replayed callback.
+        Subscription.objects.filter(user=self.user).update(remaining_predictions=7)
+        self.callback(client)
+        self.assertEqual(Subscription.objects.get(user=self.user).remaining_predictions, 7)
+
+    def test_concurrent_callbacks_grant_exactly_once(self):
+        from unittest import mock
+
+        grants = []
+        original = Subscription.grant_plan
+
+        def counting_grant(sub, plan):
+            grants.append(plan)
+            return original(sub, plan)
+
+        codes = []
+
+        def worker():
+            # The in-memory test database locks whole tables, so a thread can
+            # be told to back off; it retries like a real callback would.
+            from django.db import OperationalError
+            import time
+
+            client = auth_client(self.user)
+            try:
+                for _ in range(500):
+                    try:
+                        codes.append(self.callback(client).status_code)
+                        return
+                    except OperationalError:
+                        time.sleep(0.005)
+            finally:
+                connection.close()
+
+        with mock.patch.object(Subscription, "grant_plan", counting_grant), \
+                mock.patch("energy_api.views.payments.send_email"):
+            threads = [threading.Thread(target=worker) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(codes, [200] * 8)
+        self.assertEqual(grants, ["premium"])
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.razorpay_payment_id), ("paid", "pay_1"))
+
+
+class PasswordResetOTPTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        from unittest import mock
+
+        patcher = mock.patch("energy_api.views.auth.send_email")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = make_user()
+        self.client = APIClient()
+
+    def request_code(self):
+        self.client.post("/api/forgot-password/request/", {"email": self.user.email}, format="json")
+        return PasswordResetOTP.latest_for(self.user)
+
+    def test_new_request_replaces_old_code(self):
+        first = self.request_code()
+        second = self.request_code()
+        self.assertEqual(list(PasswordResetOTP.objects.filter(user=self.user)), [second])
+        self.assertNotEqual(first.pk, second.pk)
+
+    @override_settings(PASSWORD_RESET_OTP_MAX_ATTEMPTS=2)
+    def test_code_locks_after_failed_attempts(self):
+        record = self.request_code()
+        wrong = "000000" if record.otp != "000000" else "111111"
+        for _ in range(2):
+            resp = self.client.post("/api/forgot-password/verify/", {"email": self.user.email, "otp": wrong}, format="json")
+            self.assertEqual(resp.status_code, 400)
+
+        resp = self.client.post("/api/forgot-password/verify/", {"email": self.user.email, "otp": record.otp}, format="json")
+        self.assertEqual(resp.status_code, 400)
+
+    @override_settings(PASSWORD_RESET_OTP_MAX_ATTEMPTS=2)
+    def test_attempt_is_taken_before_comparing(self):
+        from unittest import mock
+
+        from .views.auth import check_reset_otp
+
+        record = self.request_code()
+        # Requests that read the row before the other guesses landed see a
+        # stale attempts=0, but the conditional UPDATE still refuses them.
+        PasswordResetOTP.objects.filter(pk=record.pk).update(attempts=2)
+        stale = PasswordResetOTP.objects.get(pk=record.pk)
+        stale.attempts = 0
+        with mock.patch.object(PasswordResetOTP, "latest_for", return_value=stale):
+            self.assertIsNone(check_reset_otp(self.user, record.otp))
+        self.assertEqual(PasswordResetOTP.objects.get(pk=record.pk).attempts, 2)
+
+    @override_settings(PASSWORD_RESET_OTP_MAX_ATTEMPTS=2)
+    def test_correct_code_gives_attempt_back(self):
+        record = self.request_code()
+        wrong = "000000" if record.otp != "000000" else "111111"
+        self.client.post("/api/forgot-password/verify/", {"email": self.user.email, "otp": wrong}, format="json")
+        resp = self.client.post("/api/forgot-password/verify/", {"email": self.user.email, "otp": record.otp}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        resp = self.client.post("/api/forgot-password/reset/", {
+            "email": self.user.email, "otp": record.otp, "new_password": "new-pw",
+        }, format="json")
+        self.assertEqual(resp.status_code, 200)
+
+    def test_reset_consumes_code_and_purge_removes_expired(self):
+        record = self.request_code()
+        resp = self.client.post("/api/forgot-password/reset/", {
+            "email": self.user.email, "otp": record.otp, "new_password": "new-pw",
+        }, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(PasswordResetOTP.objects.exists())
+
+        stale = self.request_code()
+        PasswordResetOTP.objects.filter(pk=stale.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        call_command("purge_expired_otps", stdout=open(os.devnull, "w"))
+        self.assertFalse(PasswordResetOTP.objects.exists())
+
+
+class EmailLookupTests(APITestCase):
+    def test_lookup_is_case_insensitive_and_unique(self):
+        user = make_user()
+        client = APIClient()
+        resp = client.post("/api/get-username-by-email/", {"email": "  ALICE@Example.com "}, format="json")
+        self.assertEqual(resp.data["username"], user.username)
+
+        resp = client.post("/api/register/", {
+            "username": "alice2", "password": "pw", "email": "Alice@EXAMPLE.com",
+        }, format="json")
+        self.assertEqual(resp.data["error"], "Email already exists")
+
+    def test_index_follows_email_changes(self):
+        user = make_user()
+        user.email = "new@example.com"
+        user.save()
+        self.assertIsNone(UserEmail.find_user("alice@example.com"))
+        self.assertEqual(UserEmail.find_user("NEW@example.com"), user)
+
+    def test_legacy_shared_email_does_not_block_saves(self):
+        owner = make_user()
+        # Accounts created before the index existed may share an address.
+        legacy = make_user("bob", remaining=10)
+        User.objects.filter(pk=legacy.pk).update(email="Alice@example.com")
+        UserEmail.objects.filter(user=legacy).delete()
+        legacy.refresh_from_db()
+
+        resp = auth_client(legacy).put("/api/user/update/", {"username": "bobby"}, format="json")
+        self.assertEqual(resp.status_code, 200, resp.content)
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.username, "bobby")
+        self.assertEqual(UserEmail.find_user("alice@example.com"), owner)
+        self.assertFalse(UserEmail.objects.filter(user=legacy).exists())
+
+    def test_lookup_uses_unique_index(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("query plan assertions are written for SQLite")
+        plan = UserEmail.objects.select_related("user").filter(email="alice@example.com").explain()
+        self.assertIn("USING INDEX", plan)
+        self.assertNotIn("SCAN energy_api_useremail", plan)
+
+
+class PasswordHashingTests(APITestCase):
+    def test_legacy_pbkdf2_hash_is_upgraded_on_login(self):
+        user = make_user()
+        with override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.PBKDF2PasswordHasher"]):
+            user.set_password("pw")
+            user.save()
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$"))
+
+        resp = APIClient().post("/api/login/", {"username": "alice", "password": "pw"}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("scrypt$"))
+        self.assertTrue(user.check_password("pw"))
+
+    def test_new_users_get_a_free_subscription(self):
+        resp = APIClient().post("/api/register/", {
+            "username": "bob", "password": "pw", "email": "bob@example.com",
+        }, format="json")
+        self.assertEqual(resp.status_code, 200)
+        sub = Subscription.objects.get(user__username="bob")
+        self.assertEqual((sub.plan, sub.remaining_predictions), ("free", 10))
+
+    def test_login_does_not_touch_subscriptions(self):
+        make_user()
+        client = APIClient()
+        with CaptureQueriesContext(connection) as queries:
+            resp = client.post("/api/login/", {"username": "alice", "password": "pw"}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(queries.captured_queries)
+        self.assertFalse([q for q in queries.captured_queries if "energy_api_subscription" in q["sql"]])
+
+
+class BootImportTests(SimpleTestCase):
+    def test_boot_does_not_import_heavy_dependencies(self):
+        # Fresh interpreter: this test process has long since loaded them.
+        code = (
+            "import django, sys; django.setup();"
+            "from django.urls import get_resolver; get_resolver().url_patterns;"
+            "print(' '.join(m for m in ('pandas', 'numpy', 'joblib', 'sklearn', 'xgboost',"
+            " 'razorpay', 'sendgrid') if m in sys.modules))"
+        )
+        backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        proc = subprocess.run(
+            [sys.executable, "-c", code], cwd=backend, capture_output=True, text=True,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE="energy_backend.settings"),
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertEqual(proc.stdout.strip(), "")
+
+
+class MemoryReportTests(APITestCase):
+    def test_admin_only(self):
+        resp = auth_client(make_user()).get("/api/admin/memory/")
+        self.assertEqual(resp.status_code, 403)
+
+    def test_report_covers_workers_cache_and_sample_profile(self):
+        resp = auth_client(make_user(staff=True)).get("/api/admin/memory/?profile=1")
+        self.assertEqual(resp.status_code, 200)
+        report = resp.data
+        self.assertEqual([w["pid"] for w in report["workers"] if w["current"]], [os.getpid()])
+        self.assertGreater(report["rss"], 0)
+        self.assertEqual(report["loaded"]["model"]["type"], "XGBRegressor")
+        self.assertGreater(report["loaded"]["model"]["bytes"], 0)
+        self.assertIn("xgboost", report["heavy_modules"])
+        self.assertTrue(report["sample_profile"]["top"])
+
+    @override_settings(MEMORY_PROFILE_EVERY=2)
+    def test_predict_calls_are_sampled(self):
+        client = auth_client(make_user(remaining=5))
+        client.post("/api/predict/", SAMPLE_INPUT, format="json")
+        self.assertNotIn("predict", memory.profiles)
+        resp = client.post("/api/predict/", SAMPLE_INPUT, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(memory.profiles["predict"]["call"], 2)
+        self.assertTrue(memory.profiles["predict"]["top"])
+
+    def test_one_prediction_stays_under_the_memory_ceiling(self):
+        from django.conf import settings
+
+        from unittest import mock
+        from .views import inference
+
+        client = auth_client(make_user(remaining=10))
+        # Model load and first-call caches. Every call uses new inputs, so
+        # none is answered from the PredictionInput result cache.
+        for area in (121, 122, 123):
+            client.post("/api/predict/", dict(SAMPLE_INPUT, Total_Building_Area=area), format="json")
+        fresh = dict(SAMPLE_INPUT, Total_Building_Area=124)
+        self.assertFalse(PredictionInput.objects.filter(digest=inputs_digest(canonical_inputs(fresh))).exists())
+
+        with mock.patch("energy_api.views.inference.score_scaled", wraps=inference.score_scaled) as scored:
+            resp, profile = memory.profile_call(client.post, "/api/predict/", fresh, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(scored.call_count, 1)  # validated, scaled and scored, not reused
+        self.assertLess(profile["net_bytes"], settings.MEMORY_PREDICT_CEILING_BYTES, profile["top"])
+
+
+@override_settings(HISTORY_WRITE_BEHIND=True, HISTORY_FLUSH_ROWS=1000, HISTORY_FLUSH_MS=60000)
+class HistoryWriteBehindTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        history_buffer.writer.reset()
+        self.addCleanup(history_buffer.writer.reset)
+        self.user = make_user(remaining=5)
+
+    def test_quota_is_charged_before_the_row_is_written(self):
+        resp = auth_client(self.user).post("/api/predict/", SAMPLE_INPUT, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIsNone(resp.data["record_id"])
+        self.assertEqual(Subscription.objects.get(user=self.user).remaining_predictions, 4)
+        self.assertFalse(PredictionHistory.objects.exists())
+        self.assertEqual(history_buffer.writer.pending(), 1)
+
+        self.assertTrue(history_buffer.writer.flush())
+        record = PredictionHistory.objects.get()
+        self.assertEqual(record.total_energy_month_kwh, resp.data["total_energy_month_kwh"])
+        self.assertEqual(record.hvac_efficiency, SAMPLE_INPUT["Hvac_Efficiency"])
+
+    def test_crash_loses_buffered_rows_but_not_quota(self):
+        client = auth_client(self.user)
+        for _ in range(2):
+            client.post("/api/predict/", SAMPLE_INPUT, format="json")
+        history_buffer.writer.reset()  # the worker dies before a flush
+
+        self.assertEqual(history_buffer.writer.pending(), 0)
+        self.assertFalse(PredictionHistory.objects.exists())
+        self.assertEqual(Subscription.objects.get(user=self.user).remaining_predictions, 3)
+
+    def test_exhausted_quota_is_rejected_without_a_row(self):
+        Subscription.objects.filter(user=self.user).update(remaining_predictions=1)
+        client = auth_client(self.user)
+        self.assertEqual(client.post("/api/predict/", SAMPLE_INPUT, format="json").status_code, 200)
+        self.assertEqual(client.post("/api/predict/", SAMPLE_INPUT, format="json").status_code, 403)
+        self.assertEqual(history_buffer.writer.pending(), 1)
+
+    @override_settings(HISTORY_BUFFER_SIZE=1)
+    def test_full_buffer_writes_inline(self):
+        client = auth_client(self.user)
+        for _ in range(3):
+            client.post("/api/predict/", SAMPLE_INPUT, format="json")
+        self.assertEqual(history_buffer.writer.pending(), 1)
+        self.assertEqual(PredictionHistory.objects.count(), 2)
+
+    def test_rejected_batch_is_retried_row_by_row(self):
+        from unittest import mock
+
+        client = auth_client(self.user)
+        for _ in range(3):
+            client.post("/api/predict/", SAMPLE_INPUT, format="json")
+
+        original = PredictionHistory.objects.bulk_create
+
+        def flaky(records, *args, **kwargs):
+            if len(records) > 1:
+                raise RuntimeError("batch rejected")
+            return original(records, *args, **kwargs)
+
+        with mock.patch.object(PredictionHistory.objects, "bulk_create", side_effect=flaky), \
+                self.assertLogs("energy_api.history_buffer", "ERROR"):
+            history_buffer.writer.flush()
+        self.assertEqual(PredictionHistory.objects.count(), 3)
+
+
+@override_settings(HISTORY_WRITE_BEHIND=True, HISTORY_FLUSH_ROWS=2, HISTORY_FLUSH_MS=50)
+class HistoryWriterThreadTests(TransactionTestCase):
+    def setUp(self):
+        throttling.reset()
+        history_buffer.writer.reset()
+        self.addCleanup(history_buffer.writer.reset)
+        self.user = make_user(remaining=10)
+
+    def test_background_thread_flushes_and_close_drains(self):
+        import time
+
+        client = auth_client(self.user)
+        for _ in range(3):
+            self.assertEqual(client.post("/api/predict/", SAMPLE_INPUT, format="json").status_code, 200)
+
+        # Two rows fill a batch; the third goes out after HISTORY_FLUSH_MS.
+        deadline = time.monotonic() + 10
+        while history_buffer.writer.pending() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(PredictionHistory.objects.count(), 3)
+
+        with override_settings(HISTORY_FLUSH_MS=60000):
+            client.post("/api/predict/", SAMPLE_INPUT, format="json")
+            self.assertTrue(history_buffer.writer.close())
+        self.assertEqual(PredictionHistory.objects.count(), 4)
+        self.assertEqual(history_buffer.writer.pending(), 0)
+
+        # After close, rows are written inline.
+        client.post("/api/predict/", SAMPLE_INPUT, format="json")
+        self.assertEqual(PredictionHistory.objects.count(), 5)
+
+    def test_concurrent_quota_takes_never_overspend(self):
+        from django.db import OperationalError
+        import time
+
+        Subscription.objects.filter(user=self.user).update(remaining_predictions=3)
+        taken = []
+
+        def worker():
+            sub = Subscription.objects.get(user=self.user)
+            try:
+                for _ in range(500):
+                    try:
+                        taken.append(sub.take_predictions())
+                        return
+                    except OperationalError:
+                        time.sleep(0.005)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sorted(taken), [False] * 5 + [True] * 3)
+        self.assertEqual(Subscription.objects.get(user=self.user).remaining_predictions, 0)
@@ -0,0 +1,206 @@
+# energy_api/throttling.py
+"""
+Token-bucket throttles for DRF views.
+
+Each bucket holds up to `capacity` tokens and refills at `per_minute` tokens
+per minute; a request takes one token or is rejected with 429 and a
+Retry-After header (DRF does that from `wait()`).
+
+Buckets live in process memory by default, which costs one dict lookup under
+a lock. With THROTTLE_BACKEND = "cache" they are kept in Django's cache
+instead, so several gunicorn workers share one budget. That needs a shared
+cache with atomic incr (Redis or memcached, see CACHES); a system check
+rejects anything else.
+
+Client IPs come from DRF's get_ident, so X-Forwarded-For is only trusted for
+the NUM_PROXIES hops our own proxies add (REST_FRAMEWORK["NUM_PROXIES"]).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from .models import Subscription
+
+MAX_MEMORY_KEYS = 100000
+PLAN_CACHE_SECONDS = 60
+
+
+class MemoryBucketStore:
+    def __init__(self):
+        # Least recently used first; beyond MAX_MEMORY_KEYS the oldest bucket
+        # is dropped (it simply starts full again), so every call is O(1).
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate):
+        """Takes one token; returns 0 if allowed, else seconds until one is free."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - stamp) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > MAX_MEMORY_KEYS:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Shared buckets on atomic cache counters. A bucket is approximated by
+    fixed windows of capacity / rate seconds (the time to refill it) that
+    allow `capacity` requests each: the same long-run rate, and at most two
+    bursts back to back at a window edge. cache.add + cache.incr never
+    lose an update between workers, unlike a get/set of the bucket state.
+    """
+
+    def consume(self, key, capacity, rate):
+        # Wall clock, since the windows are shared between processes.
+        now = time.time()
+        window = max(1.0, capacity / rate)
+        index = int(now // window)
+        cache_key = f"throttle:{key}:{index}"
+        timeout = int(window) + 1
+        for _ in range(2):
+            cache.add(cache_key, 0, timeout)
+            try:
+                used = cache.incr(cache_key)
+                break
+            except ValueError:  # expired between add and incr
+                continue
+        else:
+            used = 1
+        if used <= capacity:
+            return 0.0
+        return (index + 1) * window - now
+
+    def clear(self):
+        pass
+
+
+# Backends whose incr is atomic and shared between processes.
+SHARED_CACHE_BACKENDS = (
+    "django.core.cache.backends.redis.RedisCache",
+    "django.core.cache.backends.memcached.PyMemcacheCache",
+    "django.core.cache.backends.memcached.PyLibMCCache",
+)
+
+
+@checks.register()
+def check_shared_cache(app_configs, **kwargs):
+    if settings.THROTTLE_BACKEND != "cache":
+        return []
+    backend = settings.CACHES["default"]["BACKEND"]
+    if backend in SHARED_CACHE_BACKENDS:
+        return []
+    return [checks.Error(
+        f'THROTTLE_BACKEND = "cache" needs a shared cache with atomic incr, not {backend}',
+        hint="Set CACHE_BACKEND/CACHE_LOCATION to Redis or memcached, or use THROTTLE_BACKEND = \"memory\".",
+        id="energy_api.E001",
+    )]
+
+
+_memory_store = MemoryBucketStore()
+_cache_store = CacheBucketStore()
+
+_plan_cache = {}
+_plan_lock = threading.Lock()
+
+
+def get_store():
+    return _cache_store if settings.THROTTLE_BACKEND == "cache" else _memory_store
+
+
+def reset():
+    """Forgets every in-memory bucket and cached plan (tests, after fork)."""
+    _memory_store.clear()
+    with _plan_lock:
+        _plan_cache.clear()
+
+
+def user_plan(user):
+    """Subscription plan of `user`, cached in memory for a minute."""
+    now = time.monotonic()
+    with _plan_lock:
+        cached = _plan_cache.get(user.pk)
+    if cached and cached[1] > now:
+        return cached[0]
+
+    plan = Subscription.objects.filter(user_id=user.pk).values_list("plan", flat=True).first() or "free"
+    with _plan_lock:
+        _plan_cache[user.pk] = (plan, now + PLAN_CACHE_SECONDS)
+    return plan
+
+
+def forget_plan(user):
+    with _plan_lock:
+        _plan_cache.pop(user.pk, None)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Base class: subclasses return (key, capacity, per_minute) or None."""
+
+    def get_bucket(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        bucket = self.get_bucket(request, view)
+        if bucket is None:
+            return True
+        key, capacity, per_minute = bucket
+        self._wait = get_store().consume(key, capacity, per_minute / 60.0)
+        return self._wait == 0
+
+    def wait(self):
+        return self._wait
+
+
+class IPRateThrottle(TokenBucketThrottle):
+    """Per client IP, using THROTTLE_RATES[scope]. Set `scope` on subclasses."""
+    scope = None
+
+    def get_bucket(self, request, view):
+        capacity, per_minute = settings.THROTTLE_RATES[self.scope]
+        return f"ip:{self.scope}:{self.get_ident(request)}", capacity, per_minute
+
+
+class PredictIPThrottle(IPRateThrottle):
+    scope = "predict_ip"
+
+
+class AuthIPThrottle(IPRateThrottle):
+    scope = "auth"
+
+
+class EmailIPThrottle(IPRateThrottle):
+    scope = "email"
+
+
+class PlanRateThrottle(TokenBucketThrottle):
+    """Per authenticated user, sized by Subscription.plan (THROTTLE_PLAN_RATES)."""
+
+    def get_bucket(self, request, view):
+        user = request.user
+        if not user or not user.is_authenticated or user.is_staff:
+            return None
+        plan = user_plan(user)
+        rates = settings.THROTTLE_PLAN_RATES
+        capacity, per_minute = rates.get(plan, rates["free"])
+        return f"user:{user.pk}", capacity, per_minute
@@ -8,6 +8,12 @@ from .views import (
     get_building_types,
     get_defaults,
     predict_energy,
+    get_simulation_profiles,
+    simulate_energy,
+
+    create_prediction_job,
+    prediction_job_status,
+    prediction_job_results,
 
     register_user,
     login_user,
@@ -24,10 +30,23 @@ from .views import (
     get_my_history,
     delete_all_history,
     delete_history_item,
+    hide_history,
+    restore_history,
+    compare_history,
+    history_changes,
 
     admin_all_history,
     admin_list_users,
     admin_user_history,
+    admin_input_drift,
+    admin_memory,
+
+    analytics_summary,
+    analytics_eui_histogram,
+    analytics_categories,
+    analytics_building_types,
+    analytics_timeseries,
+    analytics_top_savings,
 
     my_subscription,
     get_plans,
@@ -42,6 +61,13 @@ urlpatterns = [
     path("building-types/", get_building_types),
     path("defaults/", get_defaults),
     path("predict/", predict_energy),
+    path("simulate/", simulate_energy),
+    path("simulate/profiles/", get_simulation_profiles),
+
+    # Bulk prediction jobs
+    path("jobs/", create_prediction_job),
+    path("jobs/<int:pk>/", prediction_job_status),
+    path("jobs/<int:pk>/results/", prediction_job_results),
 
     # Auth
     path("register/", register_user),
@@ -61,6 +87,18 @@ urlpatterns = [
     path("history/", get_my_history),
     path("history/delete-all/", delete_all_history),
     path("history/delete/<int:pk>/", delete_history_item),
+    path("history/hide/", hide_history),
+    path("history/restore/", restore_history),
+    path("history/compare/", compare_history),
+    path("history/changes/", history_changes),
+
+    # Analytics
+    path("analytics/", analytics_summary),
+    path("analytics/eui-histogram/", analytics_eui_histogram),
+    path("analytics/categories/", analytics_categories),
+    path("analytics/building-types/", analytics_building_types),
+    path("analytics/timeseries/", analytics_timeseries),
+    path("analytics/top-savings/", analytics_top_savings),
 
     # Subscription
     path("subscription/", my_subscription),
@@ -73,6 +111,8 @@ urlpatterns = [
     path("admin/users/", admin_list_users),
     path("admin/user-history/<str:username>/", admin_user_history),
     path("admin/history/", admin_all_history),
+    path("admin/drift/", admin_input_drift),
+    path("admin/memory/", admin_memory),
 
     # Plans
     path("plans/", get_plans),
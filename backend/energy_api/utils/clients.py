@@ -0,0 +1,159 @@
+# energy_api/utils/clients.py
+"""
+Process-wide HTTP clients for Razorpay and SendGrid.
+
+Both are created lazily, once per process, on top of a keep-alive
+`requests.Session` with a bounded connection pool, default timeouts and a
+retry policy, so repeated payments and emails reuse warm TLS connections
+instead of paying a handshake each time. Clients are dropped in forked
+children (gunicorn workers) so no two processes share a socket.
+"""
+import os
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+_lock = threading.Lock()
+_clients = {}
+
+
+class TimeoutSession(requests.Session):
+    """Session that applies a default (connect, read) timeout to every request."""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.default_timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.default_timeout)
+        return super().request(method, url, **kwargs)
+
+
+def build_session(timeout, retries, retry_methods, status_forcelist=(), retry_reads=True):
+    """
+    Keep-alive session with a connection pool. Connection failures are
+    retried for every method; read/status failures only for `retry_methods`,
+    so non-idempotent calls are not replayed once the server may have acted.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries if retry_reads else 0,
+        status=retries,
+        backoff_factor=settings.HTTP_CLIENT_BACKOFF,
+        status_forcelist=status_forcelist,
+        allowed_methods=frozenset(retry_methods),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.HTTP_CLIENT_POOL_SIZE,
+        pool_maxsize=settings.HTTP_CLIENT_POOL_SIZE,
+        max_retries=retry,
+    )
+    session = TimeoutSession(timeout)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _get(name, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+
+def reset_clients():
+    """Closes and forgets every client; the next call builds fresh ones."""
+    with _lock:
+        for client in _clients.values():
+            session = getattr(client, "session", None)
+            if session is not None:
+                session.close()
+        _clients.clear()
+
+
+def reset_after_fork():
+    """
+    Forgets every client without closing it: the sockets belong to the
+    parent process. The parent's lock may be held at fork time, so the
+    child gets a fresh one.
+    """
+    global _lock
+    _lock = threading.Lock()
+    _clients.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_after_fork)
+
+
+# -------------------------
+# Razorpay
+# -------------------------
+def _build_razorpay():
+    import razorpay
+
+    session = build_session(
+        timeout=settings.RAZORPAY_TIMEOUT,
+        retries=settings.RAZORPAY_RETRIES,
+        retry_methods={"GET"},
+        status_forcelist=(502, 503, 504),
+    )
+    options = {}
+    if settings.RAZORPAY_BASE_URL:
+        options["base_url"] = settings.RAZORPAY_BASE_URL
+    return razorpay.Client(
+        session=session,
+        auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET),
+        **options,
+    )
+
+
+def get_razorpay_client():
+    return _get("razorpay", _build_razorpay)
+
+
+# -------------------------
+# SendGrid
+# -------------------------
+class SendGridClient:
+    """
+    Minimal v3 mail/send client on a pooled session. (The official SDK opens
+    a new urllib connection per request.)
+    """
+
+    def __init__(self, api_key, host, session):
+        self.url = f"{host.rstrip('/')}/v3/mail/send"
+        self.session = session
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        })
+
+    def send(self, mail):
+        payload = mail if isinstance(mail, dict) else mail.get()
+        return self.session.post(self.url, json=payload)
+
+
+def _build_sendgrid():
+    session = build_session(
+        timeout=settings.SENDGRID_TIMEOUT,
+        retries=settings.SENDGRID_RETRIES,
+        # 429/503 responses mean the message was not accepted, so a POST
+        # retry cannot send it twice.
+        retry_methods={"POST"},
+        status_forcelist=(429, 503),
+        retry_reads=False,
+    )
+    return SendGridClient(os.getenv("SENDGRID_API_KEY"), settings.SENDGRID_HOST, session)
+
+
+def get_sendgrid_client():
+    return _get("sendgrid", _build_sendgrid)
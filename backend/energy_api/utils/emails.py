@@ -1,11 +1,14 @@
 # energy_api/utils/email.py
-import os
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
 from django.conf import settings
 
 
 def send_email(subject, message, to_email):
+    # The SendGrid helpers and the pooled HTTP client (requests) are only
+    # needed once an email is actually sent.
+    from sendgrid.helpers.mail import Mail
+
+    from .clients import get_sendgrid_client
+
     try:
         html_message = message.replace("\n", "<br>")
         email = Mail(
@@ -16,11 +19,10 @@ def send_email(subject, message, to_email):
             html_content=html_message
         )
 
-        sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
-        response = sg.send(email)
+        response = get_sendgrid_client().send(email)
 
         if response.status_code not in [200, 202]:
-            raise Exception(f"SendGrid failed: {response.body}")
+            raise Exception(f"SendGrid failed: {response.text}")
 
     except Exception as e:
         raise Exception(f"Email failed: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,106 @@
+# energy_api/validation.py
+"""
+Prediction input validation, compiled once per loaded model.
+
+InputSchema precomputes everything the per-request check needs: the feature
+order, a case-insensitive building type -> label code dict (instead of
+calling LabelEncoder.transform, which raises on unknown values) and the
+(min, max) bounds from FEATURE_RANGES. Validating a payload is then a flat
+loop of dict lookups and comparisons that collects every problem instead of
+stopping at the first one, and raises no exceptions for bad input.
+"""
+import math
+import re
+from collections.abc import Mapping
+
+_NUMBER = re.compile(r"\s*[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?\s*")
+_match_number = _NUMBER.fullmatch
+
+
+def to_number(value):
+    """float(value) for numbers and numeric strings, else None."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and _match_number(value):
+        return float(value)
+    return None
+
+
+class InputSchema:
+    def __init__(self, features, building_types, ranges):
+        self.features = list(features)
+        # LabelEncoder codes are positions in the sorted `classes_`.
+        self.building_types = {str(name).strip().lower(): code for code, name in enumerate(building_types)}
+        self.checks = []
+        for position, feature in enumerate(self.features):
+            if feature == "Building_Type":
+                self.type_position = position
+                continue
+            low, high = ranges.get(feature, (-math.inf, math.inf))
+            self.checks.append((position, feature, float(low), float(high)))
+
+    def validate(self, data):
+        """
+        Returns (row, errors): `row` is the encoded feature vector in model
+        order (None if anything is wrong); `errors` maps field -> message.
+        """
+        if not isinstance(data, Mapping):
+            return None, {"__all__": "Expected an object of feature values"}
+
+        row = [None] * len(self.features)
+        errors = {}
+
+        value = data.get("Building_Type")
+        if not value:
+            errors["Building_Type"] = "Missing Building_Type"
+        else:
+            code = self.building_types.get(str(value).strip().lower())
+            if code is None:
+                errors["Building_Type"] = f"Invalid Building_Type: {value}"
+            row[self.type_position] = code
+
+        for position, feature, low, high in self.checks:
+            value = data.get(feature)
+            if value is None or value == "":
+                errors[feature] = f"Missing feature: {feature}"
+                continue
+            # Inlined fast paths for the common JSON/CSV types.
+            kind = type(value)
+            if kind is float or kind is int:
+                number = float(value)
+            elif kind is str:
+                number = float(value) if _match_number(value) else None
+            else:
+                number = to_number(value)
+            if number is None:
+                errors[feature] = f"Invalid value for {feature}: {value}"
+            elif not low <= number <= high:
+                errors[feature] = f"{feature} must be between {low:g} and {high:g} (got {value})"
+            row[position] = number
+
+        if errors:
+            return None, errors
+        return row, {}
+
+    def validate_many(self, rows):
+        """
+        Batch form of `validate`. Returns (valid, errors) where `valid` is a
+        list of (index, data, row) and `errors` a list of
+        {"row": index, "error": message, "fields": {...}}.
+        """
+        valid = []
+        failed = []
+        for i, data in enumerate(rows):
+            row, errors = self.validate(data)
+            if errors:
+                failed.append({"row": i, "error": error_message(errors), "fields": errors})
+            else:
+                valid.append((i, data, row))
+        return valid, failed
+
+
+def error_message(errors):
+    """All field errors as one readable string."""
+    return "; ".join(errors.values())
@@ -0,0 +1,78 @@
+# energy_api/views/__init__.py
+"""
+API views, one module per domain:
+
+* inference: model loading, scoring, /predict/, bulk jobs, simulation, drift report
+* auth: register, login, password reset, profile
+* history: prediction history, admin listings, analytics
+* payments: subscriptions, plans, Razorpay
+
+Heavy dependencies (pandas, joblib, the model, payment and email SDKs)
+are imported inside the functions that use them, so importing this
+package (every worker boot, every management command) stays cheap.
+`python -m benchmarks.import_time` checks that.
+"""
+from .common import User, health_check, query_flag
+from .inference import (
+    FEATURE_RANGES,
+    DEFAULT_VALUES,
+    OPTIMAL_TARGETS,
+    load_all,
+    get_schema,
+    get_ensemble,
+    score_scaled,
+    predict_batch,
+    sample_prediction,
+    monthly_category,
+    get_feature_recommendations,
+    compute_optimized_performance,
+    optimize_batch,
+    score_with_optimized,
+    recommendation_codes,
+    is_already_optimized,
+    get_building_types,
+    get_defaults,
+    predict_energy,
+    get_simulation_profiles,
+    simulate_energy,
+    create_prediction_job,
+    prediction_job_status,
+    prediction_job_results,
+    admin_input_drift,
+    admin_memory,
+)
+from .auth import (
+    register_user,
+    login_user,
+    forgot_password_request,
+    verify_otp,
+    reset_password,
+    get_profile,
+    update_user,
+    get_username_by_email,
+)
+from .history import (
+    get_my_history,
+    delete_all_history,
+    delete_history_item,
+    hide_history,
+    restore_history,
+    compare_history,
+    history_changes,
+    admin_list_users,
+    admin_user_history,
+    admin_all_history,
+    analytics_summary,
+    analytics_eui_histogram,
+    analytics_categories,
+    analytics_building_types,
+    analytics_timeseries,
+    analytics_top_savings,
+)
+from .payments import (
+    PLANS,
+    my_subscription,
+    get_plans,
+    create_razorpay_order,
+    verify_razorpay_payment,
+)
@@ -0,0 +1,314 @@
+# energy_api/views/auth.py
+import secrets
+import hmac
+from django.contrib.auth import authenticate
+from django.db import IntegrityError, transaction
+
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
+
+from ..models import PredictionHistory, Subscription, PasswordResetOTP, UserEmail
+from ..utils.emails import send_email
+from ..throttling import AuthIPThrottle, EmailIPThrottle
+from .common import User
+
+
+# -------------------------
+# AUTH: register / login
+# -------------------------
+@api_view(["POST"])
+@throttle_classes([AuthIPThrottle])
+def register_user(request):
+    username = request.data.get("username")
+    password = request.data.get("password")
+    email = request.data.get("email")
+
+    if not username or not password or not email:
+        return Response({"error": "username, email and password required"}, status=400)
+
+    if User.objects.filter(username=username).exists():
+        return Response({"error": "User already exists"}, status=400)
+
+    if UserEmail.is_taken(email):
+        return Response({"error": "Email already exists"}, status=400)
+
+    try:
+        # The email index is written by a post_save signal inside this
+        # transaction; a concurrent signup with the same address fails here.
+        with transaction.atomic():
+            user = User.objects.create_user(username=username, password=password, email=email)
+    except IntegrityError:
+        return Response({"error": "Email already exists"}, status=400)
+    # The free Subscription is created by the post_save signal.
+    token, _ = Token.objects.get_or_create(user=user)
+
+    try:
+        send_email(
+            subject="Welcome — Your account has been created",
+            message = f"""
+                Hello {username},
+
+                Welcome to Enlite! Your account has been successfully created.
+
+                Thank you for choosing us as your partner in building intelligence. With Enlite, you can now leverage advanced analytics to predict building measurements and gain deep insights into energy consumption patterns. 
+
+                Our platform is designed not only to track your current usage but to provide actionable paths for future efficiency improvements.
+
+                We are excited to help you start your journey toward smarter energy management.
+
+                Best regards,
+
+                Rajoli Srinivas
+                The Enlite Team
+                """,
+            to_email=email
+        )
+
+    except:
+        pass
+
+    return Response({
+        "message": "User registered successfully",
+        "token": token.key,
+        "username": user.username,
+        "is_admin": user.is_staff
+    })
+
+
+@api_view(["POST"])
+@throttle_classes([AuthIPThrottle])
+def login_user(request):
+    username = request.data.get("username")
+    password = request.data.get("password")
+
+    if not username or not password:
+        return Response({"error": "username and password required"}, status=400)
+
+    user = authenticate(username=username, password=password)
+    if not user:
+        return Response({"error": "Invalid credentials"}, status=400)
+
+    token, _ = Token.objects.get_or_create(user=user)
+
+    return Response({
+        "message": "Login successful",
+        "token": token.key,
+        "username": user.username,
+        "is_admin": user.is_staff
+    })
+
+
+# -------------------------
+# FORGOT PASSWORD (OTP Flow)
+# -------------------------
+@api_view(["POST"])
+@throttle_classes([EmailIPThrottle])
+def forgot_password_request(request):
+    username = request.data.get("username")
+    email = request.data.get("email")
+    if not email:
+        return Response({"error": "Email required"}, status=400)
+
+    user = UserEmail.find_user(email)
+    if not user:
+        return Response({"error": "Email not found"}, status=404)
+
+    otp = str(secrets.randbelow(900000) + 100000)
+    # One live code per user: a new request replaces any previous one.
+    with transaction.atomic():
+        PasswordResetOTP.objects.filter(user=user).delete()
+        PasswordResetOTP.objects.create(user=user, otp=otp)
+
+    try:
+        send_email(
+            subject="Your Password Reset OTP",
+            message = f"""
+                Hello {user.username},
+
+                We received a request to reset the password for your Enlite account. To proceed, please use the verification code provided below:
+
+                ------------------------------------
+                    VERIFICATION CODE: {otp}
+                ------------------------------------
+
+                This code is required to verify your identity. Please enter this code on the reset page within the application.
+
+                Security Note: If you did not request a password reset, please ignore this email or contact our support team immediately.
+
+                Best regards,
+                The Enlite Security Team
+                """,
+            to_email=email
+        )
+    except Exception as e:
+        print("❌ OTP EMAIL FAILED:", repr(e))
+        raise e   # ⬅️ VERY IMPORTANT
+
+    except:
+        return Response({"error": "Failed to send OTP"}, status=500)
+
+    return Response({"message": "OTP sent"})
+
+
+def check_reset_otp(user, otp):
+    """
+    Validates `otp` against the user's newest code. Every guess takes an
+    attempt first; a correct one gives it back, so verify followed by reset
+    costs nothing. Returns the record, or None if the code is wrong, expired
+    or locked after too many attempts.
+    """
+    record = PasswordResetOTP.latest_for(user)
+    if not record or record.is_expired() or not record.take_attempt():
+        return None
+    if not hmac.compare_digest(record.otp, str(otp)):
+        return None
+    record.return_attempt()
+    return record
+
+
+@api_view(["POST"])
+@throttle_classes([AuthIPThrottle])
+def verify_otp(request):
+    email = request.data.get("email")
+    otp = request.data.get("otp")
+
+    if not email or not otp:
+        return Response({"error": "email and otp required"}, status=400)
+
+    user = UserEmail.find_user(email)
+    if not user:
+        return Response({"error": "Invalid email"}, status=404)
+
+    record = check_reset_otp(user, otp)
+    if not record:
+        return Response({"error": "Invalid or expired OTP"}, status=400)
+
+    return Response({"message": "OTP verified"})
+
+
+@api_view(["POST"])
+@throttle_classes([AuthIPThrottle])
+def reset_password(request):
+    email = request.data.get("email")
+    otp = request.data.get("otp")
+    new_password = request.data.get("new_password")
+
+    if not email or not otp or not new_password:
+        return Response({"error": "email, otp and new_password required"}, status=400)
+
+    user = UserEmail.find_user(email)
+    if not user:
+        return Response({"error": "Invalid email"}, status=404)
+
+    record = check_reset_otp(user, otp)
+    if not record:
+        return Response({"error": "Invalid or expired OTP"}, status=400)
+
+    user.set_password(new_password)
+    user.save()
+
+    PasswordResetOTP.objects.filter(user=user).delete()
+
+    return Response({"message": "Password reset successful"})
+
+
+# -------------------------
+# PROFILE
+# -------------------------
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_profile(request):
+    user = request.user
+
+    total_predictions = PredictionHistory.objects.filter(user=user).count()
+    last = PredictionHistory.objects.filter(user=user).order_by("-created_at").first()
+
+    last_data = None
+    if last:
+        last_data = {
+            "id": last.id,
+            "building_type": last.building_type,
+            "energy": last.total_energy_month_kwh,
+            "eui": last.eui_month_kwh_m2,
+            "category": last.performance_category,
+            "inputs": last.feature_inputs(),
+            "date": last.created_at,
+        }
+
+    try:
+        sub = Subscription.objects.get(user=user)
+        subscription_data = {
+            "plan": sub.plan,
+            "allowed_predictions": sub.allowed_predictions,
+            "remaining_predictions": sub.remaining_predictions,
+            "active": sub.active,
+            "start_date": sub.start_date,
+            "end_date": sub.end_date,
+        }
+    except:
+        subscription_data = None
+
+    return Response({
+    "username": user.username,
+    "email": user.email,          # ✅ ADD THIS LINE
+    "is_admin": user.is_staff,
+    "joined_on": user.date_joined,
+    "total_predictions": total_predictions,
+    "last_prediction": last_data,
+    "subscription": subscription_data
+})
+
+
+
+# -------------------------
+# Update user account
+# -------------------------
+@api_view(["PUT", "PATCH"])
+@permission_classes([IsAuthenticated])
+def update_user(request):
+    user = request.user
+    data = request.data
+    changes = {}
+
+    new_username = data.get("username")
+    if new_username and new_username != user.username:
+        if User.objects.filter(username=new_username).exclude(pk=user.pk).exists():
+            return Response({"error": "Username already taken"}, status=400)
+        user.username = new_username
+        changes["username"] = new_username
+
+    current_password = data.get("password")
+    new_password = data.get("new_password")
+
+    if new_password:
+        if not current_password:
+            return Response({"error": "Current password required"}, status=400)
+        if not user.check_password(current_password):
+            return Response({"error": "Current password incorrect"}, status=400)
+        user.set_password(new_password)
+        changes["password_changed"] = True
+
+    if changes:
+        user.save()
+        return Response({"message": "Updated successfully", "changes": changes})
+
+    return Response({"message": "No changes"})
+
+
+# -------------------------
+# Lookup username by email
+# -------------------------
+@api_view(["POST"])
+@throttle_classes([EmailIPThrottle])
+def get_username_by_email(request):
+    email = request.data.get("email")
+    if not email:
+        return Response({"error": "email required"}, status=400)
+
+    user = UserEmail.find_user(email)
+    if not user:
+        return Response({"error": "Not found"}, status=404)
+
+    return Response({"username": user.username})
@@ -0,0 +1,14 @@
+# energy_api/views/common.py
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+
+User = get_user_model()
+
+
+def health_check(request):
+    return JsonResponse({"status": "ok"})
+
+
+def query_flag(request, name):
+    """True for ?name=1 / true / yes."""
+    return request.query_params.get(name, "").lower() in ("1", "true", "yes")
@@ -0,0 +1,546 @@
+# energy_api/views/history.py
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from ..models import FEATURE_COLUMNS, HistoryArchiveRun, PredictionHistory, Subscription
+from ..validation import to_number
+from ..archive import load_archived_history
+from .. import analytics
+from .common import User, query_flag
+
+
+# -------------------------
+# HISTORY endpoints
+# -------------------------
+def history_item(h):
+    """One /history/ list entry."""
+    return {
+        "id": h.id,
+        "building_type": h.building_type,
+        "energy": h.total_energy_month_kwh,
+        "eui": h.eui_month_kwh_m2,
+        "category": h.performance_category,
+        "inputs": h.feature_inputs(),
+        "date": h.created_at,
+        **h.comparison(),
+    }
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_my_history(request):
+    """?limit=N returns only the N newest rows (e.g. the profile page's recent list)."""
+    history = (
+        PredictionHistory.objects.filter(user=request.user, is_deleted_by_user=False)
+        .order_by("-created_at")
+    )
+    if request.query_params.get("limit"):
+        history = history[:_int_param(request, "limit", 5, 1, 1000)]
+    return Response({"history": [history_item(h) for h in PredictionHistory.prefetch_inputs(history)]})
+
+
+@api_view(["DELETE"])
+@permission_classes([IsAuthenticated])
+def delete_all_history(request):
+    count = PredictionHistory.objects.filter(user=request.user, is_deleted_by_user=False).update(
+        is_deleted_by_user=True, updated_at=timezone.now(),
+    )
+    return Response({"message": f"Hidden {count} items from your history"})
+
+
+@api_view(["DELETE"])
+@permission_classes([IsAuthenticated])
+def delete_history_item(request, pk):
+    rows = PredictionHistory.objects.filter(pk=pk)
+    if not request.user.is_staff:
+        rows = rows.filter(user=request.user)
+    if not rows.filter(is_deleted_by_user=False).update(is_deleted_by_user=True, updated_at=timezone.now()):
+        # Nothing changed: tell a missing or foreign row from one already hidden.
+        owner = get_object_or_404(PredictionHistory.objects.values_list("user_id", flat=True), pk=pk)
+        if owner != request.user.id and not request.user.is_staff:
+            return Response({"error": "Not allowed"}, status=403)
+    return Response({"message": "Deleted successfully"})
+
+
+# Filters accepted by the bulk endpoints, as queryset lookups.
+HISTORY_FILTERS = {
+    "building_type": "building_type__iexact",
+    "category": "performance_category",
+    "created_after": "created_at__gte",
+    "created_before": "created_at__lt",
+}
+
+
+def _parse_moment(value):
+    """An aware datetime from an ISO date or datetime string, else None."""
+    moment = parse_datetime(value) if isinstance(value, str) else None
+    if moment is None:
+        day = parse_date(value) if isinstance(value, str) else None
+        if day is None:
+            return None
+        moment = datetime.combine(day, datetime.min.time())
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+def _selection(request):
+    """
+    The caller's history rows picked by the request body: "ids" (a list)
+    and/or HISTORY_FILTERS, combined with AND. Only the caller's own rows
+    are ever selected. Returns (queryset, None) or (None, error_response).
+    """
+    body = request.data if isinstance(request.data, dict) else {}
+    ids = body.get("ids")
+    filters = {key: body[key] for key in HISTORY_FILTERS if body.get(key) not in (None, "")}
+    if ids is None and not filters:
+        return None, Response({"error": f"Pass ids or a filter ({', '.join(HISTORY_FILTERS)})"}, status=400)
+
+    rows = PredictionHistory.objects.filter(user=request.user)
+    if ids is not None:
+        if not isinstance(ids, list) or not all(type(pk) is int for pk in ids):
+            return None, Response({"error": "ids must be a list of history ids"}, status=400)
+        if len(ids) > settings.HISTORY_BULK_MAX_IDS:
+            return None, Response({"error": f"At most {settings.HISTORY_BULK_MAX_IDS} ids per request"}, status=400)
+        rows = rows.filter(id__in=set(ids))
+
+    for key, value in filters.items():
+        if key.startswith("created_"):
+            value = _parse_moment(value)
+            if value is None:
+                return None, Response({"error": f"{key} must be an ISO date or datetime"}, status=400)
+        rows = rows.filter(**{HISTORY_FILTERS[key]: value})
+    return rows, None
+
+
+def _set_hidden(request, hidden):
+    rows, error = _selection(request)
+    if error:
+        return error
+    # One UPDATE that skips rows already in the target state.
+    updated = rows.filter(is_deleted_by_user=not hidden).update(
+        is_deleted_by_user=hidden, updated_at=timezone.now(),
+    )
+    return Response({"updated": updated})
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def hide_history(request):
+    """Hides the selected rows (see _selection); returns how many were hidden."""
+    return _set_hidden(request, True)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def restore_history(request):
+    """Un-hides the selected rows (see _selection); returns how many were restored."""
+    return _set_hidden(request, False)
+
+
+# -------------------------
+# HISTORY sync
+# -------------------------
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def format_cursor(moment):
+    """Opaque sync cursor: microseconds since the epoch."""
+    return str((moment - _EPOCH) // timedelta(microseconds=1))
+
+
+def parse_cursor(cursor):
+    """The datetime of a format_cursor value; ValueError if malformed."""
+    micros = int(cursor)
+    if micros < 0:
+        raise ValueError(cursor)
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def history_changes(request):
+    """
+    Incremental /history/ for clients that keep a local copy.
+
+    Without ?since (or with a cursor older than HISTORY_SYNC_TOMBSTONE_DAYS)
+    it returns every visible row and "reset": true, and the client replaces
+    its copy. Otherwise it returns the rows created or changed after the
+    cursor in "changes" (upsert by id) and the ids hidden since then in
+    "deleted". Either way the client stores the new "cursor" and drops rows
+    dated before "expired_before", the cutoff of the latest archive_history
+    run (None if history was never archived).
+    """
+    # Taken before the query: anything committed by then is in the result.
+    now = timezone.now()
+    since = None
+    if request.query_params.get("since"):
+        try:
+            since = parse_cursor(request.query_params["since"])
+        except (ValueError, OverflowError):
+            return Response({"error": "Invalid cursor"}, status=400)
+    reset = since is None or since < now - timedelta(days=settings.HISTORY_SYNC_TOMBSTONE_DAYS)
+
+    rows = PredictionHistory.objects.filter(user=request.user)
+    if reset:
+        rows = rows.filter(is_deleted_by_user=False)
+    else:
+        rows = rows.filter(updated_at__gt=since)
+
+    changes, deleted = [], []
+    for h in PredictionHistory.prefetch_inputs(rows.order_by("-created_at")):
+        if h.is_deleted_by_user:
+            deleted.append(h.id)
+        else:
+            changes.append(history_item(h))
+
+    # Writes stamp updated_at before they commit, so a row stamped shortly
+    # before `now` can become visible after this query. The cursor trails
+    # by HISTORY_SYNC_OVERLAP_SECONDS (which also absorbs small clock skew
+    # between workers); rows in that window are sent again.
+    cursor = now - timedelta(seconds=settings.HISTORY_SYNC_OVERLAP_SECONDS)
+    if not reset:
+        cursor = max(cursor, since)
+
+    return Response({
+        "reset": reset,
+        "cursor": format_cursor(cursor),
+        "expired_before": HistoryArchiveRun.archived_before(),
+        "changes": changes,
+        "deleted": deleted,
+    })
+
+
+# -------------------------
+# HISTORY comparison
+# -------------------------
+COMPARE_FEATURES = list(FEATURE_COLUMNS)
+
+
+def _compare_ids(request):
+    """
+    The ids of ?ids=3,7,12 in request order without repeats, at most
+    HISTORY_COMPARE_MAX_IDS of them. Returns (ids, None) or (None, error_response).
+    """
+    limit = settings.HISTORY_COMPARE_MAX_IDS
+    raw = request.query_params.get("ids", "")
+    # Refuse oversized lists before parsing them.
+    if len(raw) > limit * 20:
+        return None, Response({"error": f"Compare at most {limit} items"}, status=400)
+    try:
+        ids = list(dict.fromkeys(int(part) for part in raw.split(",") if part.strip()))
+    except ValueError:
+        return None, Response({"error": "ids must be a comma-separated list of history ids"}, status=400)
+    if not ids:
+        return None, Response({"error": "ids is required"}, status=400)
+    if len(ids) > limit:
+        return None, Response({"error": f"Compare at most {limit} items"}, status=400)
+    return ids, None
+
+
+def _delta(value, base):
+    if value is None or base is None:
+        return None
+    return round(value - base, 2)
+
+
+def _rescore(records, inputs):
+    """
+    Current-model performance of `records`, keyed by id. Results cached on
+    the PredictionInput for this model version are reused; the rest are
+    scored together in one score_with_optimized call. Nothing is written.
+    """
+    from .inference import get_schema, model_version, monthly_category, score_with_optimized
+
+    version = model_version()
+    valid, errors = get_schema().validate_many(inputs)
+    rescored = {records[e["row"]].id: {"error": e["error"]} for e in errors}
+
+    scores = {i: records[i].input_set.result_for(version) for i, _, _ in valid}
+    todo = [(i, row) for i, _, row in valid if scores[i] is None]
+    if todo:
+        for (i, _), result in zip(todo, score_with_optimized([row for _, row in todo])):
+            scores[i] = result
+
+    for i, data, _ in valid:
+        monthly = scores[i]["monthly"]
+        optimized = scores[i]["optimized"] or {}
+        area = float(data.get("Total_Building_Area") or 0)
+        eui = monthly / area if area else None
+        rescored[records[i].id] = {
+            "energy": round(monthly, 2),
+            "eui": round(eui, 2) if eui else None,
+            "category": monthly_category(eui),
+            "optimized_energy": optimized.get("optimized_energy_month_kwh"),
+            "savings_kwh": optimized.get("energy_savings_kwh"),
+            "savings_percent": optimized.get("energy_savings_percent"),
+            "optimized_category": optimized.get("optimized_category"),
+        }
+    return version, rescored
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def compare_history(request):
+    """
+    Side-by-side view of a few history rows, ?ids=3,7,12 (the first is the
+    baseline for deltas). One query fetches exactly those rows; feature
+    values are aligned to "features". ?rescore=1 adds each row scored under
+    the current model version, in one batched predict.
+    """
+    ids, error = _compare_ids(request)
+    if error:
+        return error
+
+    rows = PredictionHistory.objects.filter(pk__in=ids)
+    if not request.user.is_staff:
+        rows = rows.filter(user=request.user, is_deleted_by_user=False)
+    # input_set holds the raw inputs of rows without typed columns and the
+    # cached scores used by ?rescore=1.
+    found = {h.id: h for h in rows.select_related("input_set")}
+    missing = [pk for pk in ids if pk not in found]
+    if missing:
+        return Response({"error": "History items not found", "missing": missing}, status=404)
+
+    records = [found[pk] for pk in ids]
+    inputs = [h.feature_inputs() for h in records]
+    inputs = [data if isinstance(data, dict) else {} for data in inputs]
+    rescored = {}
+    version = None
+    if query_flag(request, "rescore"):
+        version, rescored = _rescore(records, inputs)
+
+    items = []
+    for h, data in zip(records, inputs):
+        items.append({
+            "id": h.id,
+            "building_type": h.building_type,
+            "energy": h.total_energy_month_kwh,
+            "eui": h.eui_month_kwh_m2,
+            "category": h.performance_category,
+            "date": h.created_at,
+            "values": [to_number(data.get(feature)) for feature in COMPARE_FEATURES],
+            **h.comparison(),
+        })
+        if version:
+            items[-1]["rescored"] = rescored[h.id]
+
+    base = items[0]
+    for item in items:
+        item["delta"] = {
+            "energy": _delta(item["energy"], base["energy"]),
+            "eui": _delta(item["eui"], base["eui"]),
+            "savings_kwh": _delta(item["savings_kwh"], base["savings_kwh"]),
+            "values": [_delta(v, b) for v, b in zip(item["values"], base["values"])],
+        }
+
+    response = {"baseline_id": base["id"], "features": COMPARE_FEATURES, "items": items}
+    if version:
+        response["model_version"] = version
+    return Response(response)
+
+
+# -------------------------
+# ADMIN endpoints
+# -------------------------
+def archived_page(request, user_id=None):
+    """
+    With ?include_archived=1, one page of archived rows (newest first,
+    ?limit= and ?offset=) and the offset of the next page (None at the end).
+    Returns ([], None) otherwise.
+    """
+    if not query_flag(request, "include_archived"):
+        return [], None
+    limit = _int_param(
+        request, "limit", settings.HISTORY_ARCHIVE_PAGE_SIZE, 1, settings.HISTORY_ARCHIVE_MAX_PAGE_SIZE,
+    )
+    offset = _int_param(request, "offset", 0, 0, 10 ** 9)
+    rows = load_archived_history(user_id=user_id, limit=limit + 1, offset=offset)
+    return rows[:limit], (offset + limit if len(rows) > limit else None)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def admin_list_users(request):
+    if not request.user.is_staff:
+        return Response({"error": "Access denied"}, status=403)
+
+    users = User.objects.annotate(
+        prediction_count=Count("predictionhistory")
+    ).order_by("-date_joined")
+
+    data = []
+    for u in users:
+        try:
+            sub = Subscription.objects.get(user=u)
+            plan = sub.plan.upper()
+            active = sub.active
+        except Subscription.DoesNotExist:
+            plan = "FREE"
+            active = False
+
+        data.append({
+            "username": u.username,
+            "joined_on": u.date_joined,
+            "is_admin": u.is_staff,
+            "prediction_count": u.prediction_count,
+            "plan": plan,
+            "active": active,
+        })
+
+    return Response({"users": data})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def admin_user_history(request, username):
+    if not request.user.is_staff:
+        return Response({"error": "Access denied"}, status=403)
+
+    user = get_object_or_404(User, username=username)
+    history = PredictionHistory.objects.filter(user=user).order_by("-created_at")
+
+    data = [{
+        "id": h.id,
+        "building_type": h.building_type,
+        "energy": h.total_energy_month_kwh,
+        "eui": h.eui_month_kwh_m2,
+        "category": h.performance_category,
+        "inputs": h.feature_inputs(),
+        "date": h.created_at,
+        **h.comparison(),
+    } for h in PredictionHistory.prefetch_inputs(history)]
+
+    archived, next_offset = archived_page(request, user_id=user.id)
+    if archived:
+        data += archived
+        data.sort(key=lambda d: d["date"], reverse=True)
+
+    return Response({"username": user.username, "history": data, "archived_next_offset": next_offset})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def admin_all_history(request):
+    if not request.user.is_staff:
+        return Response({"error": "Access denied"}, status=403)
+
+    records = PredictionHistory.objects.select_related("user").order_by("-created_at")
+
+    data = [{
+        "id": h.id,
+        "user": h.user.username,
+        "building_type": h.building_type,
+        "energy": h.total_energy_month_kwh,
+        "eui": h.eui_month_kwh_m2,
+        "category": h.performance_category,
+        "inputs": h.feature_inputs(),
+        "date": h.created_at,
+        **h.comparison(),
+    } for h in PredictionHistory.prefetch_inputs(records)]
+
+    archived, next_offset = archived_page(request)
+    if archived:
+        data += archived
+        data.sort(key=lambda d: d["date"], reverse=True)
+
+    return Response({"all_history": data, "archived_next_offset": next_offset})
+
+
+# -------------------------
+# ANALYTICS (aggregated server-side)
+# -------------------------
+def _analytics_state(request):
+    """
+    ?scope=me (default) covers the caller's visible history;
+    ?scope=all covers every user and is admin only.
+    Returns (state, None) or (None, error_response).
+    """
+    scope = request.query_params.get("scope", "me")
+    if scope == "all":
+        if not request.user.is_staff:
+            return None, Response({"error": "Access denied"}, status=403)
+        return analytics.get_state(), None
+    if scope != "me":
+        return None, Response({"error": "scope must be 'me' or 'all'"}, status=400)
+    return analytics.get_state(request.user), None
+
+
+def _int_param(request, name, default, low, high):
+    try:
+        value = int(request.query_params.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    return max(low, min(high, value))
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def analytics_summary(request):
+    state, error = _analytics_state(request)
+    if error:
+        return error
+    return Response({
+        "eui_histogram": analytics.eui_histogram(state),
+        "categories": analytics.category_counts(state),
+        "building_types": analytics.building_type_averages(state),
+        "timeseries": analytics.time_series(state, "day", 30),
+        "top_savings": analytics.top_savings(state, 5),
+    })
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def analytics_eui_histogram(request):
+    state, error = _analytics_state(request)
+    if error:
+        return error
+    return Response({"bin_width": analytics.EUI_BIN_WIDTH, "bins": analytics.eui_histogram(state)})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def analytics_categories(request):
+    state, error = _analytics_state(request)
+    if error:
+        return error
+    return Response({"categories": analytics.category_counts(state)})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def analytics_building_types(request):
+    state, error = _analytics_state(request)
+    if error:
+        return error
+    return Response({"building_types": analytics.building_type_averages(state)})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def analytics_timeseries(request):
+    state, error = _analytics_state(request)
+    if error:
+        return error
+    period = request.query_params.get("period", "day")
+    if period not in ("day", "week"):
+        return Response({"error": "period must be 'day' or 'week'"}, status=400)
+    days = _int_param(request, "days", 90, 1, 730)
+    return Response({"period": period, "days": days, "series": analytics.time_series(state, period, days)})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def analytics_top_savings(request):
+    state, error = _analytics_state(request)
+    if error:
+        return error
+    limit = _int_param(request, "limit", 10, 1, analytics.TOP_SAVINGS_LIMIT)
+    return Response({"top_savings": analytics.top_savings(state, limit)})
@@ -0,0 +1,910 @@
+# energy_api/views/inference.py
+"""
+Model loading, scoring and the prediction endpoints (single, bulk jobs,
+drift report). pandas, joblib and the model stack are imported on first
+use, not at boot: management commands and workers that never score a row
+do not pay for them.
+"""
+import os
+import csv
+import hashlib
+import traceback
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import F
+from django.http import StreamingHttpResponse
+
+from rest_framework.decorators import api_view, permission_classes, parser_classes, throttle_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.response import Response
+
+from ..models import (
+    PredictionHistory, PredictionInput, PredictionJob, Subscription, canonical_inputs, inputs_digest,
+)
+from ..jobs import parse_upload
+from ..validation import InputSchema, error_message
+from .. import drift, history_buffer, memory, simulation
+from ..throttling import PlanRateThrottle, PredictIPThrottle
+from .common import query_flag
+
+
+# -------------------------
+# Model files / paths
+# -------------------------
+MODEL_DIR = os.path.join(settings.BASE_DIR, "energy_api", "models")
+MODEL_PATH = os.path.join(MODEL_DIR, "model.pkl")
+LE_PATH = os.path.join(MODEL_DIR, "model1.pkl")
+SC_PATH = os.path.join(MODEL_DIR, "model2.pkl")
+
+_loaded = {
+    "model": None, "le": None, "sc": None, "features": None, "schema": None, "ensemble": None, "version": None,
+}
+
+FEATURE_RANGES = {
+    "Floor_Insulation": (0.15, 1.60),
+    "Door_Insulation": (0.81, 5.70),
+    "Roof_Insulation": (0.07, 2.28),
+    "Window_Insulation": (0.73, 5.75),
+    "Wall_Insulation": (0.10, 2.40),
+    "Hvac_Efficiency": (0.30, 4.50),
+    "Domestic_Hot_Water_Usage": (0.50, 3.50),
+    "Lighting_Density": (1, 9),
+    "Occupancy_Level": (1, 6),
+    "Equipment_Density": (1, 21),
+    "Window_To_Wall_Ratio": (0, 70),
+    "Total_Building_Area": (85.91, 10000),
+}
+
+DEFAULT_VALUES = {
+    "Floor_Insulation": 0.20,
+            "Door_Insulation": 1.00,
+            "Roof_Insulation": 0.15,
+            "Window_Insulation": 1.20,
+            "Wall_Insulation": 0.25,
+            "Hvac_Efficiency": 3.5,
+            "Domestic_Hot_Water_Usage": 1.50,
+            "Lighting_Density": 3,
+            "Occupancy_Level": 3,
+            "Equipment_Density": 8,
+            "Window_To_Wall_Ratio": 30,
+            "Total_Building_Area": 85.91
+}
+
+# Optimal reference values (your standard): recommendation thresholds and
+# the inputs of the "optimized" prediction.
+OPTIMAL_TARGETS = {
+    "Floor_Insulation": 0.20,
+    "Door_Insulation": 1.00,
+    "Roof_Insulation": 0.15,
+    "Window_Insulation": 1.20,
+    "Wall_Insulation": 0.25,
+    "Hvac_Efficiency": 3.5,
+    "Domestic_Hot_Water_Usage": 1.50,
+    "Lighting_Density": 3,
+    "Occupancy_Level": 3,
+    "Equipment_Density": 8,
+    "Window_To_Wall_Ratio": 30
+}
+
+# -------------------------
+# Helpers: load model & metadata
+# -------------------------
+def load_all():
+    """Loads model, label encoder and scaler once and caches them."""
+    import joblib
+
+    if _loaded["model"] is None:
+        # Includes importing xgboost/sklearn, which the first load pulls in.
+        with memory.track_rss("model"):
+            _loaded["model"] = joblib.load(MODEL_PATH)
+    if _loaded["le"] is None:
+        _loaded["le"] = joblib.load(LE_PATH)
+    if _loaded["sc"] is None:
+        _loaded["sc"] = joblib.load(SC_PATH)
+    if _loaded["features"] is None:
+        sc = _loaded["sc"]
+        if hasattr(sc, "feature_names_in_"):
+            _loaded["features"] = list(sc.feature_names_in_)
+        else:
+            _loaded["features"] = [
+                "Building_Type",
+                "Floor_Insulation",
+                "Door_Insulation",
+                "Roof_Insulation",
+                "Window_Insulation",
+                "Wall_Insulation",
+                "Hvac_Efficiency",
+                "Domestic_Hot_Water_Usage",
+                "Lighting_Density",
+                "Occupancy_Level",
+                "Equipment_Density",
+                "Window_To_Wall_Ratio",
+                "Total_Building_Area",
+            ]
+    return _loaded["model"], _loaded["le"], _loaded["sc"], _loaded["features"]
+
+
+def model_version():
+    """
+    Digest of the model, encoder and scaler files. Cached results
+    (PredictionInput.result) are only reused for the same version.
+    """
+    if _loaded["version"] is None:
+        digest = hashlib.sha256()
+        for path in (MODEL_PATH, LE_PATH, SC_PATH):
+            with open(path, "rb") as fh:
+                for chunk in iter(lambda: fh.read(1 << 20), b""):
+                    digest.update(chunk)
+        _loaded["version"] = digest.hexdigest()[:16]
+    return _loaded["version"]
+
+
+def get_schema():
+    """The compiled input validator for the loaded model (see validation.py)."""
+    if _loaded["schema"] is None:
+        _, le, _, features = load_all()
+        _loaded["schema"] = InputSchema(features, le.classes_, FEATURE_RANGES)
+    return _loaded["schema"]
+
+
+def get_ensemble():
+    """Leaf-level view of the booster for uncertainty estimates (see ensemble.py)."""
+    if _loaded["ensemble"] is None:
+        from ..ensemble import TreeEnsemble
+
+        model, _, _, _ = load_all()
+        _loaded["ensemble"] = TreeEnsemble(model.get_booster())
+    return _loaded["ensemble"]
+
+
+def score_scaled(scaled, uncertainty=False, explain=False):
+    """
+    Yearly predictions for scaled rows plus optional per-row extras:
+    "spread"/"support" with uncertainty=True (one pred_leaf pass) and
+    "contributions"/"baseline" with explain=True (one pred_contribs pass,
+    whose row sums are the predictions). Plain scoring is one model.predict.
+    """
+    extras = {}
+    yearly = None
+    if explain:
+        yearly, extras["contributions"], extras["baseline"] = get_ensemble().contributions(scaled)
+    if uncertainty:
+        leaf_yearly, extras["spread"], extras["support"] = get_ensemble().score(scaled)
+        if yearly is None:
+            yearly = leaf_yearly
+    if yearly is None:
+        model, _, _, _ = load_all()
+        yearly = model.predict(scaled)
+    return yearly, extras
+
+
+def predict_batch(rows, uncertainty=False, explain=False, compare=False, cache=False):
+    """
+    Scores a list of input dicts with a single vectorized model call.
+    Returns (results, errors); both carry the original row index. With
+    uncertainty=True every result also gets an "uncertainty" interval, with
+    explain=True an "explanation" of per-feature contributions, with
+    compare=True the "optimized" performance (one more model call for the
+    whole batch) and "recommendation_codes". With cache=True (and neither
+    uncertainty nor explain) results are reused from, and stored to,
+    PredictionInput, so each distinct input is scored once per model.
+    """
+    import pandas as pd
+    from ..ensemble import explanation, interval
+
+    model, le, sc, features = load_all()
+    valid, errors = get_schema().validate_many(rows)
+    for _, _, row in valid:
+        drift.observe_row(features, row)
+    for error in errors:
+        drift.observe_payload(rows[error["row"]])
+
+    results = []
+    if not valid:
+        return results, errors
+
+    if cache and not (uncertainty or explain):
+        scored = cached_scores(valid)
+        monthlies = [r["monthly"] for r in scored]
+        optimized = [r["optimized"] for r in scored]
+    else:
+        df = pd.DataFrame([row for _, _, row in valid], columns=features)
+        yearly, extras = score_scaled(sc.transform(df), uncertainty, explain)
+        monthlies = [float(y) / 12.0 for y in yearly]
+        if compare:
+            optimized = optimize_batch([row for _, _, row in valid], monthlies)
+
+    for k, ((i, data, row), monthly) in enumerate(zip(valid, monthlies)):
+        area = float(data.get("Total_Building_Area") or 0)
+        eui = monthly / area if area else None
+        result = {
+            "row": i,
+            "inputs": data,
+            "building_type": data.get("Building_Type"),
+            "total_energy_month_kwh": round(monthly, 2),
+            "eui_month_kwh_m2": round(eui, 2) if eui else None,
+            "performance_category": monthly_category(eui),
+        }
+        if uncertainty:
+            result["uncertainty"] = interval(monthly, float(extras["spread"][k]) / 12.0, extras["support"][k])
+        if explain:
+            values = dict(zip(features, row), Building_Type=data.get("Building_Type"))
+            result["explanation"] = explanation(features, values, extras["contributions"][k], extras["baseline"][k])
+        if compare:
+            result["optimized"] = optimized[k]
+            result["recommendation_codes"] = recommendation_codes(
+                get_feature_recommendations(dict(zip(features, row)))
+            )
+        results.append(result)
+    return results, errors
+
+
+def cached_scores(valid):
+    """
+    {"monthly", "optimized"} for each validated (index, data, row), taken
+    from PredictionInput when the current model already scored the same
+    canonical inputs. Each distinct uncached input is scored once (one
+    score_with_optimized call for all of them) and stored.
+    """
+    version = model_version()
+    canonicals = [canonical_inputs(data) for _, data, _ in valid]
+    digests = [inputs_digest(c) for c in canonicals]
+    stored = PredictionInput.objects.in_bulk(set(digests), field_name="digest")
+    results = {d: p.result_for(version) for d, p in stored.items() if p.result_for(version)}
+
+    todo = {}
+    for (_, _, row), digest, canonical in zip(valid, digests, canonicals):
+        if digest not in results and digest not in todo:
+            todo[digest] = (row, canonical)
+    if todo:
+        fresh = dict(zip(todo, score_with_optimized([row for row, _ in todo.values()])))
+        PredictionInput.store_results(
+            {digest: (todo[digest][1], result) for digest, result in fresh.items()}, version
+        )
+        results.update(fresh)
+    return [results[d] for d in digests]
+
+
+def sample_prediction(data=None):
+    """
+    The scoring work of one /predict/ call (validate, scale, score,
+    recommendations, optimized performance) without the history write or
+    drift monitoring. Returns the monthly kWh. Used for memory profiles.
+    """
+    import pandas as pd
+
+    model, _, sc, features = load_all()
+    data = data or dict(DEFAULT_VALUES, Building_Type="Detached")
+    row, errors = get_schema().validate(data)
+    if errors:
+        raise ValueError(error_message(errors))
+
+    df = pd.DataFrame([row], columns=features)
+    yearly, _ = score_scaled(sc.transform(df))
+    user_vals = df.iloc[0].to_dict()
+    user_vals["__current_monthly_energy__"] = float(yearly[0]) / 12.0
+    get_feature_recommendations(user_vals)
+    if not is_already_optimized(user_vals):
+        compute_optimized_performance(user_vals, model, sc)
+    return user_vals["__current_monthly_energy__"]
+
+
+# -------------------------
+# EUI Category (Option A — Script scale)
+# -------------------------
+def monthly_category(eui):
+    if eui is None:
+        return "Unknown"
+    if eui <= 12.50:
+        return "Very Efficient"
+    if eui <= 20.83:
+        return "Average Efficiency"
+    if eui <= 29.17:
+        return "Moderately High"
+    if eui <= 41.67:
+        return "High Energy Consumption"
+    return "Very Poor (Inefficient)"
+
+
+# -------------------------
+# Recommendation generator
+# -------------------------
+def get_feature_recommendations(user_vals):
+    """(feature, issue, recommendation) for every input outside its target."""
+    found = []
+
+    # Material suggestions for insulation
+    insulation_materials = {
+        "Floor_Insulation": "rigid PIR/XPS boards, mineral wool, or spray foam",
+        "Door_Insulation": "thermally insulated doors with good sealing",
+        "Roof_Insulation": "PIR boards, rockwool, cellulose, or spray foam",
+        "Window_Insulation": "double-glazed low-E glass with argon filling",
+        "Wall_Insulation": "mineral wool, EPS/XPS boards, or external insulated cladding"
+    }
+
+    for feature, opt in OPTIMAL_TARGETS.items():
+        try:
+            val = float(user_vals.get(feature, 0))
+        except Exception:
+            val = 0.0
+
+        # ------------------- INSULATION (Detailed) -------------------
+        if feature in [
+            "Floor_Insulation", "Door_Insulation", "Roof_Insulation",
+            "Window_Insulation", "Wall_Insulation"
+        ]:
+            if val > opt * 1.5:
+                found.append((
+                    feature,
+                    f"{feature.replace('_', ' ')} is too high (poor insulation).",
+                    f"Improve the {feature.replace('_',' ').lower()} (target: {opt}). "
+                    f"Use: {insulation_materials[feature]}."
+                ))
+
+        # ------------------- HVAC -------------------
+        elif feature == "Hvac_Efficiency":
+            if val < opt:
+                found.append((
+                    feature,
+                    "Low HVAC efficiency.",
+                    f"Upgrade HVAC to COP {opt} or higher for improved performance."
+                ))
+
+        # ------------------- Hot Water -------------------
+        elif feature == "Domestic_Hot_Water_Usage":
+            if val > opt * 1.3:
+                found.append((
+                    feature,
+                    "High domestic hot water usage.",
+                    f"Use low-flow taps/showers or install a solar water heater (recommended target: {opt})."
+                ))
+
+        # ------------------- Lighting -------------------
+        elif feature == "Lighting_Density":
+            if val > opt * 1.4:
+                found.append((
+                    feature,
+                    "Lighting density is high.",
+                    f"Switch to LED lights or reduce lighting levels (target: {opt} W/m²)."
+                ))
+
+        # ------------------- Occupancy -------------------
+        elif feature == "Occupancy_Level":
+            if val > opt * 1.5:
+                found.append((
+                    feature,
+                    "High occupancy load.",
+                    f"Avoid overcrowding and spread activities throughout the day (ideal level: {opt})."
+                ))
+
+        # ------------------- Equipment -------------------
+        elif feature == "Equipment_Density":
+            if val > opt * 1.4:
+                found.append((
+                    feature,
+                    "High equipment density.",
+                    f"Use energy-efficient appliances (recommended load: {opt} W/m²)."
+                ))
+
+        # ------------------- WWR -------------------
+        elif feature == "Window_To_Wall_Ratio":
+            if val > 50:
+                found.append((
+                    feature,
+                    "High window-to-wall ratio.",
+                    f"Use external shading or better glazing to reduce heat gain (target: {opt}%)."
+                ))
+
+    return found
+
+
+# -------------------------
+# Optimized performance calculator
+# -------------------------
+def compute_optimized_performance(user_vals, model, sc):
+    import pandas as pd
+
+    optimized_vals = user_vals.copy()
+
+    # Apply optimal values
+    for feature, val in OPTIMAL_TARGETS.items():
+        optimized_vals[feature] = val
+
+    # ❗ Remove helper keys NOT used during model training
+    optimized_vals = {k: v for k, v in optimized_vals.items() if not k.startswith("__")}
+
+    # Convert to DataFrame
+    df_opt = pd.DataFrame([optimized_vals])
+
+    # Scale + Predict
+    scaled_opt = sc.transform(df_opt)
+    yearly_opt = float(model.predict(scaled_opt)[0])
+
+    return optimized_fields(
+        yearly_opt / 12.0,
+        user_vals.get("__current_monthly_energy__", None),
+        float(user_vals.get("Total_Building_Area") or 0),
+    )
+
+
+def optimized_fields(monthly_opt, current_monthly, area):
+    optimized_eui = monthly_opt / area if area else None
+
+    if current_monthly:
+        saved_kwh = current_monthly - monthly_opt
+        saved_percent = (saved_kwh / current_monthly) * 100 if current_monthly > 0 else 0
+    else:
+        saved_kwh = None
+        saved_percent = None
+
+    return {
+        "optimized_energy_month_kwh": round(monthly_opt, 2),
+        "energy_savings_kwh": round(saved_kwh, 2) if saved_kwh is not None else None,
+        "energy_savings_percent": round(saved_percent, 2) if saved_percent is not None else None,
+        "optimized_eui_kwh_m2": round(optimized_eui, 2) if optimized_eui else None,
+        "optimized_category": monthly_category(optimized_eui)
+    }
+
+
+def optimize_batch(rows, current_monthly):
+    """
+    compute_optimized_performance for many validated rows (feature order)
+    with one scale + predict call. `current_monthly` holds each row's
+    current kWh/month. Returns one result per row, None for rows that are
+    already optimized.
+    """
+    import pandas as pd
+
+    model, _, sc, features = load_all()
+    df = pd.DataFrame(rows, columns=features)
+    todo, df_opt = _optimized_frame(df)
+    results = [None] * len(df)
+    if not todo:
+        return results
+
+    yearly_opt = model.predict(sc.transform(df_opt))
+    areas = df_opt["Total_Building_Area"].astype(float).tolist()
+    for i, yearly, area in zip(todo, yearly_opt, areas):
+        results[i] = optimized_fields(float(yearly) / 12.0, current_monthly[i], area)
+    return results
+
+
+def score_with_optimized(rows):
+    """
+    Current and optimized performance of validated rows (feature order)
+    from a single scale + predict call: the rows and their optimized
+    variants are stacked into one frame. Returns a {"monthly", "optimized"}
+    dict per row; "optimized" is None for rows that are already optimized.
+    """
+    import pandas as pd
+
+    model, _, sc, features = load_all()
+    df = pd.DataFrame(rows, columns=features)
+    todo, df_opt = _optimized_frame(df)
+    yearly = model.predict(sc.transform(pd.concat([df, df_opt], ignore_index=True)))
+
+    monthly = [float(y) / 12.0 for y in yearly[:len(df)]]
+    results = [{"monthly": m, "optimized": None} for m in monthly]
+    areas = df_opt["Total_Building_Area"].astype(float).tolist()
+    for i, yearly_opt, area in zip(todo, yearly[len(df):], areas):
+        results[i]["optimized"] = optimized_fields(float(yearly_opt) / 12.0, monthly[i], area)
+    return results
+
+
+def _optimized_frame(df):
+    """Indexes of the rows of `df` that are not already optimized, and those rows at OPTIMAL_TARGETS."""
+    todo = [i for i, vals in enumerate(df.to_dict("records")) if not is_already_optimized(vals)]
+    df_opt = df.iloc[todo].copy()
+    for feature, val in OPTIMAL_TARGETS.items():
+        df_opt[feature] = val
+    return todo, df_opt
+
+
+def recommendation_codes(found):
+    """Stable codes (the feature names) for get_feature_recommendations output."""
+    return [feature for feature, _, _ in found]
+
+
+# -------------------------
+# BASIC: building types / defaults
+# -------------------------
+@api_view(["GET"])
+def get_building_types(request):
+    _, le, _, _ = load_all()
+    try:
+        classes = [bt.title() for bt in le.classes_]
+    except:
+        classes = []
+    return Response({"building_types": classes})
+
+
+@api_view(["GET"])
+def get_defaults(request):
+    _, _, _, features = load_all()
+    return Response({
+        "features": features,
+        "feature_ranges": FEATURE_RANGES,
+        "defaults": DEFAULT_VALUES
+    })
+
+
+# -------------------------
+# PREDICT WITH RECOMMENDATIONS + OPTIMIZED PERFORMANCE
+# -------------------------
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@throttle_classes([PlanRateThrottle, PredictIPThrottle])
+@memory.sampled("predict")
+def predict_energy(request):
+    import pandas as pd
+    from ..ensemble import explanation, interval, rank_by_impact
+
+    user = request.user
+
+    sub, _ = Subscription.objects.get_or_create(
+        user=user,
+        defaults={"plan": "free", "allowed_predictions": 10, "remaining_predictions": 10, "active": False},
+    )
+
+    if sub.remaining_predictions is not None and sub.remaining_predictions <= 0:
+        return Response({"error": "TRIAL_EXPIRED"}, status=403)
+
+    try:
+        model, le, sc, features = load_all()
+    except Exception as e:
+        return Response({"error": "Model loading failed", "details": str(e)}, status=500)
+
+    try:
+        data = request.data
+        row, errors = get_schema().validate(data)
+        if errors:
+            drift.observe_payload(data)
+            return Response({"error": error_message(errors), "errors": errors}, status=400)
+
+        drift.observe_row(features, row)
+
+        with_uncertainty = query_flag(request, "uncertainty")
+        with_explanation = query_flag(request, "explain")
+
+        # Identical inputs (after canonical_inputs) share one stored input
+        # row and, for the same model, its cached result.
+        canonical = canonical_inputs(data)
+        digest = inputs_digest(canonical)
+        stored = PredictionInput.objects.filter(digest=digest).first()
+        cached = stored.result_for(model_version()) if stored else None
+        reuse = cached is not None and not with_uncertainty and not with_explanation
+
+        if reuse:
+            monthly = cached["monthly"]
+        else:
+            df = pd.DataFrame([row], columns=features)
+            scaled = sc.transform(df)
+            yearly, extras = score_scaled(scaled, with_uncertainty, with_explanation)
+            monthly = float(yearly[0]) / 12.0
+        area = float(data.get("Total_Building_Area") or 0)
+        eui = monthly / area if area else None
+
+        user_vals = dict(zip(features, row))
+        user_vals["__current_monthly_energy__"] = monthly
+
+        found = get_feature_recommendations(user_vals)
+        ranked = None
+        if with_explanation:
+            # Biggest modelled energy driver first, instead of rule order.
+            ranked = rank_by_impact(found, features, extras["contributions"][0])
+            found = [(r["feature"], r["issue"], r["recommendation"]) for r in ranked]
+        issues = [issue for _, issue, _ in found]
+        recs = [rec for _, _, rec in found]
+        impacting = issues if issues else ["No major issues detected."]
+
+        if reuse:
+            optimized = cached["optimized"]
+        else:
+            optimized = None
+            if not is_already_optimized(user_vals):
+                optimized = compute_optimized_performance(user_vals, model, sc)
+            if cached is None:
+                PredictionInput.store_results(
+                    {digest: (canonical, {"monthly": monthly, "optimized": optimized})}, model_version()
+                )
+
+        record = PredictionHistory(
+            user=user,
+            building_type=data.get("Building_Type"),
+            total_energy_month_kwh=round(monthly, 2),
+            eui_month_kwh_m2=round(eui, 2) if eui else None,
+            performance_category=monthly_category(eui),
+        )
+        if stored is not None:
+            record.input_set = stored
+        else:
+            record.inputs = data
+        record.set_comparison(optimized, recommendation_codes(found))
+
+        with transaction.atomic():
+            # The quota is always charged synchronously, so concurrent
+            # requests cannot overspend it; only the history insert may be
+            # deferred (record_id is then None).
+            if not user.is_staff and not sub.take_predictions():
+                return Response({"error": "TRIAL_EXPIRED"}, status=403)
+            if settings.HISTORY_WRITE_BEHIND:
+                history_buffer.writer.add(record)
+            else:
+                record.save()
+
+        extra_fields = {}
+        if with_uncertainty:
+            extra_fields["uncertainty"] = interval(monthly, float(extras["spread"][0]) / 12.0, extras["support"][0])
+        if with_explanation:
+            values = dict(zip(features, row), Building_Type=data.get("Building_Type"))
+            extra_fields["explanation"] = explanation(features, values, extras["contributions"][0], extras["baseline"][0])
+            extra_fields["ranked_recommendations"] = ranked
+
+        return Response({
+            "record_id": record.id,
+            "total_energy_month_kwh": record.total_energy_month_kwh,
+            "eui_month_kwh_m2": record.eui_month_kwh_m2,
+            "performance_category": record.performance_category,
+            "impacting_factors": impacting,
+            "recommendations": recs,
+
+            # -------- NEW OPTIMIZED PERFORMANCE --------
+            "optimized_energy_month_kwh": optimized["optimized_energy_month_kwh"] if optimized else None,
+"energy_savings_kwh": optimized["energy_savings_kwh"] if optimized else None,
+"energy_savings_percent": optimized["energy_savings_percent"] if optimized else None,
+"optimized_eui_kwh_m2": optimized["optimized_eui_kwh_m2"] if optimized else None,
+"optimized_category": optimized["optimized_category"] if optimized else None,
+
+            # Only with ?uncertainty=1 / ?explain=1
+            **extra_fields,
+        })
+
+    except Exception as e:
+        return Response({"error": str(e), "trace": traceback.format_exc()}, status=500)
+
+
+# -------------------------
+# BULK PREDICTION JOBS
+# -------------------------
+def serialize_job(job):
+    return {
+        "id": job.id,
+        "status": job.status,
+        "filename": job.filename,
+        "total_rows": job.total_rows,
+        "processed_rows": job.processed_rows,
+        "failed_rows": job.failed_rows,
+        "progress": job.progress(),
+        "errors": job.errors[:100],
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+        "results_url": f"/api/jobs/{job.id}/results/" if job.status == "completed" else None,
+    }
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+@throttle_classes([PlanRateThrottle, PredictIPThrottle])
+def create_prediction_job(request):
+    upload = request.FILES.get("file")
+    if not upload:
+        return Response({"error": "file required"}, status=400)
+
+    try:
+        rows = parse_upload(upload)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    if not rows:
+        return Response({"error": "File contains no rows"}, status=400)
+    if len(rows) > settings.PREDICTION_JOB_MAX_ROWS:
+        return Response({"error": f"Too many rows (max {settings.PREDICTION_JOB_MAX_ROWS})"}, status=400)
+
+    with transaction.atomic():
+        # The whole upload is taken from the quota now, so concurrent
+        # submissions cannot overspend it; the worker gives back failed rows.
+        reserved = 0
+        if not request.user.is_staff:
+            sub, _ = Subscription.objects.get_or_create(
+                user=request.user,
+                defaults={"plan": "free", "allowed_predictions": 10, "remaining_predictions": 10, "active": False},
+            )
+            if sub.remaining_predictions is not None:
+                if not sub.take_predictions(len(rows)):
+                    sub.refresh_from_db(fields=["remaining_predictions"])
+                    return Response({
+                        "error": "TRIAL_EXPIRED" if sub.remaining_predictions <= 0 else "INSUFFICIENT_PREDICTIONS",
+                        "remaining_predictions": sub.remaining_predictions,
+                        "rows": len(rows),
+                    }, status=403)
+                reserved = len(rows)
+
+        job = PredictionJob.objects.create(
+            user=request.user,
+            filename=upload.name[:255],
+            rows=rows,
+            total_rows=len(rows),
+            reserved_predictions=reserved,
+        )
+    return Response({"job_id": job.id, "status_url": f"/api/jobs/{job.id}/"}, status=202)
+
+
+def _get_job_for(request, pk):
+    job = get_object_or_404(PredictionJob, pk=pk)
+    if job.user_id != request.user.id and not request.user.is_staff:
+        return None
+    return job
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def prediction_job_status(request, pk):
+    job = _get_job_for(request, pk)
+    if job is None:
+        return Response({"error": "Not allowed"}, status=403)
+    return Response(serialize_job(job))
+
+
+class _Echo:
+    """File-like object whose write() just returns the value, for streaming csv."""
+    def write(self, value):
+        return value
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def prediction_job_results(request, pk):
+    job = _get_job_for(request, pk)
+    if job is None:
+        return Response({"error": "Not allowed"}, status=403)
+    if job.status != "completed":
+        return Response({"error": "Job not completed", "status": job.status}, status=409)
+
+    _, _, _, features = load_all()
+    header = ["id", "building_type", "total_energy_month_kwh", "eui_month_kwh_m2", "performance_category"]
+    input_cols = [f for f in features if f != "Building_Type"]
+
+    def rows():
+        writer = csv.writer(_Echo())
+        yield writer.writerow(header + input_cols)
+        records = (
+            PredictionHistory.objects.filter(job=job)
+            .order_by("id")
+            .values_list("id", "building_type", "total_energy_month_kwh",
+                         "eui_month_kwh_m2", "performance_category", "input_set__inputs")
+            .iterator(chunk_size=2000)
+        )
+        for *fields, inputs in records:
+            yield writer.writerow(fields + [inputs.get(c) for c in input_cols])
+
+    response = StreamingHttpResponse(rows(), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="job-{job.id}-results.csv"'
+    return response
+
+
+# -------------------------
+# SCENARIO SIMULATION (see simulation.py)
+# -------------------------
+@api_view(["GET"])
+def get_simulation_profiles(request):
+    return Response(simulation.builtin_profiles())
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@throttle_classes([PlanRateThrottle, PredictIPThrottle])
+def simulate_energy(request):
+    """
+    Monthly breakdown of a building under several scenarios:
+    {"building": {...inputs...}, "scenarios": [{"name", "profiles",
+    "modifiers", "overrides"}, ...]}. Without "scenarios" the building is
+    simulated flat and under each built-in profile. Every scenario month is
+    one row of a single batched predict. Nothing is stored; a valid request
+    costs one prediction from the quota, given back if scoring fails.
+    """
+    import pandas as pd
+
+    sub, _ = Subscription.objects.get_or_create(
+        user=request.user,
+        defaults={"plan": "free", "allowed_predictions": 10, "remaining_predictions": 10, "active": False},
+    )
+    if not request.user.is_staff and sub.remaining_predictions <= 0:
+        return Response({"error": "TRIAL_EXPIRED"}, status=403)
+
+    _, _, sc, features = load_all()
+    building = request.data.get("building") if isinstance(request.data, dict) else None
+    if not isinstance(building, dict):
+        return Response({"error": "building must be an object of feature values"}, status=400)
+    specs = request.data.get("scenarios")
+    if specs is None:
+        specs = [{"name": "flat"}] + [
+            {"name": name, "profiles": [name]} for name in simulation.builtin_profiles()["profiles"]
+        ]
+
+    modifiable = [f for f in features if f in FEATURE_RANGES and f != "Total_Building_Area"]
+    try:
+        scenarios = simulation.parse_scenarios(specs, modifiable)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    schema = get_schema()
+    rows, areas = [], []
+    for scenario in scenarios:
+        data = {**building, **scenario["overrides"]}
+        row, errors = schema.validate(data)
+        if errors:
+            return Response(
+                {"error": f"{scenario['name']}: {error_message(errors)}", "errors": errors}, status=400,
+            )
+        rows.append(row)
+        areas.append(float(data.get("Total_Building_Area") or 0))
+
+    matrix, clipped = simulation.expand(rows, scenarios, features, FEATURE_RANGES)
+    charged = not request.user.is_staff
+    # Charged like /predict/: one conditional UPDATE, so concurrent calls
+    # cannot overspend the quota.
+    if charged and not sub.take_predictions():
+        return Response({"error": "TRIAL_EXPIRED"}, status=403)
+    try:
+        yearly, _ = score_scaled(sc.transform(pd.DataFrame(matrix, columns=features)))
+    except Exception:
+        if charged:
+            Subscription.objects.filter(pk=sub.pk).update(remaining_predictions=F("remaining_predictions") + 1)
+        raise
+
+    results = simulation.breakdown(yearly, scenarios, areas, clipped)
+    for result, area in zip(results, areas):
+        average = result["average_month_kwh"]
+        result["performance_category"] = monthly_category(average / area if area else None)
+    return Response({"months": simulation.months(), "scenarios": results})
+
+
+# -------------------------
+# ADMIN: input drift
+# -------------------------
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def admin_input_drift(request):
+    if not request.user.is_staff:
+        return Response({"error": "Access denied"}, status=403)
+
+    # Other workers flush on their own schedule (DRIFT_FLUSH_SECONDS).
+    drift.monitor.flush()
+    return Response(drift.drift_report())
+
+
+# -------------------------
+# ADMIN: memory
+# -------------------------
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def admin_memory(request):
+    """
+    Memory of the worker that serves this request and its siblings; with
+    ?profile=1 also a tracemalloc profile of one sample prediction.
+    """
+    if not request.user.is_staff:
+        return Response({"error": "Access denied"}, status=403)
+
+    profile = None
+    if query_flag(request, "profile"):
+        sample_prediction()  # warm: the first call also loads the model
+        _, profile = memory.profile_call(sample_prediction, top=settings.MEMORY_PROFILE_TOP)
+
+    report = memory.report()
+    if profile:
+        report["sample_profile"] = profile
+    return Response(report)
+
+
+def is_already_optimized(user_vals):
+    for k, opt in OPTIMAL_TARGETS.items():
+        try:
+            if abs(float(user_vals.get(k, 0)) - opt) > 0.01:
+                return False
+        except:
+            return False
+    return True
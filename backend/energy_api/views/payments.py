@@ -0,0 +1,180 @@
+# energy_api/views/payments.py
+import hmac
+import hashlib
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from ..models import Subscription, PaymentOrder
+from ..utils.emails import send_email
+from ..throttling import forget_plan
+
+
+# -------------------------
+# Subscription
+# -------------------------
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def my_subscription(request):
+    try:
+        sub = Subscription.objects.get(user=request.user)
+    except Subscription.DoesNotExist:
+        sub = Subscription.objects.create(
+            user=request.user,
+            plan="free",
+            allowed_predictions=10,
+            remaining_predictions=10,
+            active=False
+        )
+
+    return Response({
+        "subscription": {
+            "plan": sub.plan,
+            "allowed_predictions": sub.allowed_predictions,
+            "remaining_predictions": sub.remaining_predictions,
+            "active": sub.active,
+            "start_date": sub.start_date,
+            "end_date": sub.end_date,
+        }
+    })
+
+
+# -------------------------
+# Plans (static)
+# -------------------------
+PLANS = {
+    "basic": {"price": 75, "predictions": 100},
+    "super": {"price": 175, "predictions": 300},
+    "premium": {"price": 300, "predictions": 500},
+}
+
+
+@api_view(["GET"])
+def get_plans(request):
+    return Response({"plans": PLANS})
+
+
+# -------------------------
+# Razorpay
+# -------------------------
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def create_razorpay_order(request):
+    plan = (request.data.get("plan") or "").lower()
+
+    if not plan:
+        return Response({"error": "plan required"}, status=400)
+    if plan not in PLANS:
+        return Response({"error": f"Unknown plan: {plan}"}, status=400)
+
+    try:
+        from ..utils.clients import get_razorpay_client
+
+        client = get_razorpay_client()
+
+        # Price comes from the server-side plan table, not the client.
+        order_data = {
+            "amount": PLANS[plan]["price"] * 100,   # convert to paise
+            "currency": "INR",
+            "payment_capture": 1
+        }
+
+        order = client.order.create(order_data)
+
+        PaymentOrder.objects.create(
+            razorpay_order_id=order["id"],
+            user=request.user,
+            plan=plan,
+            amount=order["amount"],
+            currency=order["currency"],
+        )
+
+        return Response({
+            "order_id": order["id"],
+            "amount": order["amount"],
+            "currency": order["currency"],
+            "key": settings.RAZORPAY_KEY_ID,
+            "plan": plan
+        })
+
+    except Exception as e:
+        return Response({"error": str(e)}, status=500)
+
+
+def _send_plan_email(user, sub, amount_paid):
+    try:
+        send_email(
+            subject="✅ Your Enlite Subscription is Active",
+            message=(
+                f"Hello {user.username},\n\n"
+                f"Your payment was successful.\n\n"
+                f"Plan: {sub.plan.upper()}\n"
+                f"Amount Paid: ₹{amount_paid}\n"
+                f"Predictions Allowed: {sub.allowed_predictions}\n\n"
+                f"Thank you for choosing Enlite!"
+            ),
+            to_email=user.email
+        )
+    except Exception as e:
+        print("Email failed:", e)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def verify_razorpay_payment(request):
+    razorpay_order_id = request.data.get("razorpay_order_id")
+    razorpay_payment_id = request.data.get("razorpay_payment_id")
+    razorpay_signature = request.data.get("razorpay_signature")
+
+    if not all([razorpay_order_id, razorpay_payment_id, razorpay_signature]):
+        return Response({"error": "Missing payment fields"}, status=400)
+
+    # 🔐 Verify Razorpay signature (OFFICIAL METHOD)
+    generated_signature = hmac.new(
+        settings.RAZORPAY_KEY_SECRET.encode(),
+        f"{razorpay_order_id}|{razorpay_payment_id}".encode(),
+        hashlib.sha256
+    ).hexdigest()
+
+    if not hmac.compare_digest(generated_signature, str(razorpay_signature)):
+        return Response({"error": "Payment verification failed"}, status=400)
+
+    order = PaymentOrder.objects.filter(razorpay_order_id=razorpay_order_id, user=request.user).first()
+    if not order:
+        return Response({"error": "Unknown order"}, status=404)
+
+    already = {
+        "message": "Payment already verified",
+        "plan": order.plan,
+    }
+    if order.status == "paid":
+        # Duplicate or retried callback: nothing to do.
+        return Response(already)
+
+    # ✅ created -> paid, exactly once
+    with transaction.atomic():
+        moved = PaymentOrder.objects.filter(pk=order.pk, status="created").update(
+            status="paid",
+            razorpay_payment_id=razorpay_payment_id,
+            paid_at=timezone.now(),
+        )
+        if not moved:
+            return Response(already)
+
+        sub, _ = Subscription.objects.get_or_create(user=request.user)
+        sub.grant_plan(order.plan)
+
+    forget_plan(request.user)
+
+    # 📧 Email (non-blocking)
+    _send_plan_email(request.user, sub, order.amount // 100)
+
+    return Response({
+        "message": "Payment verified and plan activated",
+        "plan": sub.plan,
+        "remaining_predictions": sub.remaining_predictions,
+    })
@@ -46,9 +46,24 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.TokenAuthentication",
-    ]
+    ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "energy_api.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+        # ?format=columns: one array per field for list payloads
+        "energy_api.renderers.ColumnarJSONRenderer",
+    ],
+    # Reverse proxies in front of gunicorn (1 on Railway/Render). Client IPs
+    # for throttling are taken that many hops from the end of
+    # X-Forwarded-For; 0 uses REMOTE_ADDR and ignores the header entirely.
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", 0)),
 }
 
+# Responses smaller than this are sent uncompressed (brotli is used instead
+# of gzip when the optional `brotli` package is installed).
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 5))
+
 
 # -------------------
 # MIDDLEWARE
@@ -57,6 +72,9 @@ REST_FRAMEWORK = {
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
 
+    # gzip/brotli for API responses above COMPRESSION_MIN_BYTES
+    'energy_api.middleware.CompressionMiddleware',
+
     # Required for static files on Railway
     'whitenoise.middleware.WhiteNoiseMiddleware',
 
@@ -111,7 +129,22 @@ WSGI_APPLICATION = 'energy_backend.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv("SQLITE_PATH", BASE_DIR / 'db.sqlite3'),
+    }
+}
+
+
+# -------------------
+# CACHE
+# -------------------
+
+# Per-process by default. THROTTLE_BACKEND = "cache" needs a shared one, e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CACHE_LOCATION=redis://host:6379/0
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
     }
 }
 
@@ -122,6 +155,22 @@ DATABASES = {
 
 AUTH_PASSWORD_VALIDATORS = []
 
+# scrypt first: memory-hard and, at these parameters, about half the CPU of
+# Django's 1M-iteration PBKDF2. Older hashes still verify and are rehashed
+# to scrypt on the user's next successful login.
+PASSWORD_HASHERS = [
+    "energy_api.hashers.TunedScryptPasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+]
+
+# N = 2**14, r = 8 -> 16 MiB per hash; measure with benchmarks/login_throughput.py
+PASSWORD_SCRYPT_WORK_FACTOR = 2 ** int(os.getenv("PASSWORD_SCRYPT_LOG2_N", 14))
+PASSWORD_SCRYPT_BLOCK_SIZE = int(os.getenv("PASSWORD_SCRYPT_BLOCK_SIZE", 8))
+PASSWORD_SCRYPT_PARALLELISM = int(os.getenv("PASSWORD_SCRYPT_PARALLELISM", 1))
+
 
 # -------------------
 # INTERNATIONALIZATION
@@ -158,6 +207,23 @@ RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
 # Brevo Email API
 BREVO_API_KEY = os.getenv("BREVO_API_KEY")
 
+# -------------------
+# OUTBOUND HTTP CLIENTS (energy_api/utils/clients.py)
+# -------------------
+
+# Keep-alive connections kept per host, per worker process
+HTTP_CLIENT_POOL_SIZE = int(os.getenv("HTTP_CLIENT_POOL_SIZE", 10))
+HTTP_CLIENT_BACKOFF = float(os.getenv("HTTP_CLIENT_BACKOFF", 0.3))
+
+# (connect, read) timeouts in seconds
+RAZORPAY_TIMEOUT = (3.05, float(os.getenv("RAZORPAY_READ_TIMEOUT", 15)))
+RAZORPAY_RETRIES = int(os.getenv("RAZORPAY_RETRIES", 2))
+RAZORPAY_BASE_URL = os.getenv("RAZORPAY_BASE_URL")  # None = Razorpay's default
+
+SENDGRID_TIMEOUT = (3.05, float(os.getenv("SENDGRID_READ_TIMEOUT", 10)))
+SENDGRID_RETRIES = int(os.getenv("SENDGRID_RETRIES", 2))
+SENDGRID_HOST = os.getenv("SENDGRID_HOST", "https://api.sendgrid.com")
+
 # -------------------
 # EMAIL CONFIGURATION
 # -------------------
@@ -180,6 +246,154 @@ DEFAULT_FROM_EMAIL = os.getenv(
 )
 
 
+# -------------------
+# BULK PREDICTION JOBS
+# -------------------
+
+# Rows scored (and written to PredictionHistory) per worker transaction
+PREDICTION_JOB_CHUNK_SIZE = int(os.getenv("PREDICTION_JOB_CHUNK_SIZE", 500))
+
+# Largest upload accepted by /api/jobs/
+PREDICTION_JOB_MAX_ROWS = int(os.getenv("PREDICTION_JOB_MAX_ROWS", 50000))
+
+# A running job whose worker has not checked in for this long is picked up again
+PREDICTION_JOB_STALE_SECONDS = int(os.getenv("PREDICTION_JOB_STALE_SECONDS", 300))
+
+
+# -------------------
+# HISTORY RETENTION
+# -------------------
+
+# `manage.py archive_history` moves rows older than this into cold storage
+HISTORY_RETENTION_DAYS = int(os.getenv("HISTORY_RETENTION_DAYS", 365))
+
+# Monthly compressed archive partitions are written here
+HISTORY_ARCHIVE_DIR = os.getenv("HISTORY_ARCHIVE_DIR", BASE_DIR / "archive")
+
+# Decoded partitions each worker keeps in memory (least recently read go first)
+HISTORY_ARCHIVE_CACHE_PARTITIONS = int(os.getenv("HISTORY_ARCHIVE_CACHE_PARTITIONS", 6))
+
+# Archived rows per admin history request (?include_archived=1&limit=&offset=)
+HISTORY_ARCHIVE_PAGE_SIZE = int(os.getenv("HISTORY_ARCHIVE_PAGE_SIZE", 200))
+HISTORY_ARCHIVE_MAX_PAGE_SIZE = int(os.getenv("HISTORY_ARCHIVE_MAX_PAGE_SIZE", 2000))
+
+# Buffer /predict/ history rows in memory and insert them from a background
+# thread (energy_api/history_buffer.py); quota updates stay synchronous
+HISTORY_WRITE_BEHIND = os.getenv("HISTORY_WRITE_BEHIND", "False").lower() in ("true", "1", "yes")
+
+# Rows buffered per worker before requests write their own row inline
+HISTORY_BUFFER_SIZE = int(os.getenv("HISTORY_BUFFER_SIZE", 1000))
+
+# Flush once this many rows are buffered, or the oldest is this many ms old
+HISTORY_FLUSH_ROWS = int(os.getenv("HISTORY_FLUSH_ROWS", 100))
+HISTORY_FLUSH_MS = int(os.getenv("HISTORY_FLUSH_MS", 200))
+
+# /api/history/changes/ cursors trail the newest change by this much, so a
+# write stamped before a sync but committed after it is still sent
+HISTORY_SYNC_OVERLAP_SECONDS = int(os.getenv("HISTORY_SYNC_OVERLAP_SECONDS", 5))
+
+# Hidden rows stay in the table (as sync tombstones) this long before
+# archive_history moves them; older cursors get a full resync
+HISTORY_SYNC_TOMBSTONE_DAYS = int(os.getenv("HISTORY_SYNC_TOMBSTONE_DAYS", 30))
+
+# Most ids /api/history/hide/ and /restore/ accept in one request
+HISTORY_BULK_MAX_IDS = int(os.getenv("HISTORY_BULK_MAX_IDS", 1000))
+
+# Most rows /api/history/compare/ accepts in one request
+HISTORY_COMPARE_MAX_IDS = int(os.getenv("HISTORY_COMPARE_MAX_IDS", 20))
+
+
+# -------------------
+# SCENARIO SIMULATION (/api/simulate/)
+# -------------------
+
+# Scenarios per request; each adds 12 rows to the single batched predict
+SIMULATION_MAX_SCENARIOS = int(os.getenv("SIMULATION_MAX_SCENARIOS", 8))
+
+
+# -------------------
+# ANALYTICS
+# -------------------
+
+# Cached aggregates are refreshed incrementally; this only bounds staleness
+# of entries nobody asks for.
+ANALYTICS_CACHE_TIMEOUT = int(os.getenv("ANALYTICS_CACHE_TIMEOUT", 3600))
+
+
+# -------------------
+# THROTTLING (token buckets, see energy_api/throttling.py)
+# -------------------
+
+# "memory" keeps buckets per process; "cache" shares them through CACHES,
+# which must then be Redis or memcached (checked at startup)
+THROTTLE_BACKEND = os.getenv("THROTTLE_BACKEND", "memory")
+
+# scope: (burst capacity, tokens refilled per minute), keyed by client IP
+THROTTLE_RATES = {
+    "predict_ip": (60, 120),
+    "auth": (10, 20),
+    "email": (3, 5),
+}
+
+# Subscription.plan: (burst capacity, tokens refilled per minute), per user
+THROTTLE_PLAN_RATES = {
+    "free": (5, 10),
+    "basic": (20, 30),
+    "super": (40, 60),
+    "premium": (60, 120),
+}
+
+
+# -------------------
+# PASSWORD RESET
+# -------------------
+
+PASSWORD_RESET_OTP_EXPIRY_SECONDS = int(os.getenv("PASSWORD_RESET_OTP_EXPIRY_SECONDS", 300))
+
+# Wrong guesses allowed against one code before it stops working
+PASSWORD_RESET_OTP_MAX_ATTEMPTS = int(os.getenv("PASSWORD_RESET_OTP_MAX_ATTEMPTS", 5))
+
+
+# -------------------
+# INPUT DRIFT MONITORING
+# -------------------
+
+DRIFT_MONITORING = os.getenv("DRIFT_MONITORING", "True").lower() in ("true", "1", "yes")
+
+# How often each worker merges its in-memory counters into the database
+DRIFT_FLUSH_SECONDS = int(os.getenv("DRIFT_FLUSH_SECONDS", 60))
+
+# Histogram bins per feature across FEATURE_RANGES (plus below/above bins)
+DRIFT_HISTOGRAM_BINS = int(os.getenv("DRIFT_HISTOGRAM_BINS", 10))
+
+
+# -------------------
+# PREDICTION UNCERTAINTY (?uncertainty=1, see energy_api/ensemble.py)
+# -------------------
+
+UNCERTAINTY_LEVEL = float(os.getenv("UNCERTAINTY_LEVEL", 0.9))
+
+# Share of the last boosting rounds whose corrections estimate the spread
+UNCERTAINTY_LATE_FRACTION = float(os.getenv("UNCERTAINTY_LATE_FRACTION", 0.34))
+
+# Leaf cover (training rows) below which a prediction is flagged low_support
+UNCERTAINTY_MIN_SUPPORT = int(os.getenv("UNCERTAINTY_MIN_SUPPORT", 100))
+
+
+# -------------------
+# MEMORY
+# -------------------
+
+# Run every Nth /predict/ call of a worker under tracemalloc (0 = off)
+MEMORY_PROFILE_EVERY = int(os.getenv("MEMORY_PROFILE_EVERY", 0))
+
+# Allocation sites kept per profile
+MEMORY_PROFILE_TOP = int(os.getenv("MEMORY_PROFILE_TOP", 10))
+
+# Ceiling on memory one /predict/ call may leave allocated (enforced by tests)
+MEMORY_PREDICT_CEILING_BYTES = int(os.getenv("MEMORY_PREDICT_CEILING_BYTES", 256 * 1024))
+
+
 # -------------------
 # AUTO FIELD
 # -------------------
@@ -0,0 +1,161 @@
+# gunicorn.conf.py
+"""
+Gunicorn settings for the API, read with `gunicorn --config gunicorn.conf.py`
+from backend/ (Dockerfile, Procfile and gunicorn_start.sh all do).
+
+The workload is mixed: /predict/ is CPU bound (pandas + XGBoost), payment
+and email calls mostly wait on the network. So:
+
+* workers follow the CPU count (one per core plus one to cover the time a
+  worker spends in I/O), capped by how many fit in the memory budget;
+* every worker runs at least four threads (gthread), so a slow
+  Razorpay/SendGrid call parks a thread instead of a whole worker. When
+  memory allows fewer workers than that, threads make up the total
+  concurrency of about 2 * cpus + 1;
+* the app and the model are loaded once in the master (preload_app) and
+  forked, so a worker starts, and is recycled by max_requests, without
+  re-importing pandas/xgboost or unpickling the model;
+* OpenMP runs one thread per prediction, since workers and threads already
+  use every core.
+
+Everything can be overridden from the environment (GUNICORN_*), which is
+what benchmarks/server_sweep.py does to compare configurations.
+"""
+import math
+import os
+
+
+def _cgroup_cpus():
+    """CPU quota of the container (cgroup v2 or v1), None when unlimited."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as fh:
+            quota, period = fh.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as fh:
+            quota = int(fh.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as fh:
+            period = int(fh.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def cpu_count():
+    if os.getenv("GUNICORN_CPUS"):
+        return max(1, int(os.getenv("GUNICORN_CPUS")))
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    quota = _cgroup_cpus()
+    if quota:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+def memory_budget_mb():
+    """GUNICORN_MEMORY_MB, else the container limit, else physical memory."""
+    if os.getenv("GUNICORN_MEMORY_MB"):
+        return int(os.getenv("GUNICORN_MEMORY_MB"))
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as fh:
+                value = fh.read().strip()
+            # cgroup v1 reports "unlimited" as a huge number.
+            if value != "max" and int(value) < 1 << 60:
+                return int(value) // (1024 * 1024)
+        except (OSError, ValueError):
+            pass
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+
+
+def derive(cpus, memory_mb, worker_mb, reserved_mb):
+    """(workers, threads) for `cpus` cores and a memory budget."""
+    fits = max(1, (memory_mb - reserved_mb) // worker_mb)
+    workers = max(1, min(cpus + 1, fits))
+    threads = max(4, math.ceil((2 * cpus + 1) / workers))
+    return workers, threads
+
+
+# Resident memory of one worker with the model loaded
+# (`manage.py memory_report --profile` prints it) and of the master.
+WORKER_MB = int(os.getenv("GUNICORN_WORKER_MB", 200))
+RESERVED_MB = int(os.getenv("GUNICORN_RESERVED_MB", 200))
+
+_workers, _threads = derive(cpu_count(), memory_budget_mb(), WORKER_MB, RESERVED_MB)
+
+wsgi_app = "energy_backend.wsgi:application"
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+workers = int(os.getenv("GUNICORN_WORKERS", _workers))
+threads = int(os.getenv("GUNICORN_THREADS", _threads))
+worker_class = "gthread" if threads > 1 else "sync"
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "True").lower() in ("true", "1", "yes")
+PRELOAD_MODEL = os.getenv("GUNICORN_PRELOAD_MODEL", "True").lower() in ("true", "1", "yes")
+
+# Recycle workers to bound slow leaks; jitter keeps them from restarting together.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 180))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# Heartbeat files on tmpfs: overlay filesystems can stall workers' fchmod.
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+# Before the app (and numpy/xgboost) is imported.
+os.environ.setdefault("OMP_NUM_THREADS", os.getenv("GUNICORN_OMP_THREADS", "1"))
+
+
+def when_ready(server):
+    server.log.info(
+        "workers=%s threads=%s class=%s preload_app=%s max_requests=%s+%s",
+        workers, threads, worker_class, preload_app, max_requests, max_requests_jitter,
+    )
+    if preload_app and PRELOAD_MODEL:
+        from energy_api.views import load_all
+
+        load_all()
+        server.log.info("Model loaded in the master; workers share it copy-on-write")
+
+
+def pre_fork(server, worker):
+    # The master must not hand an open database connection to its children.
+    if preload_app:
+        from django.db import connections
+
+        connections.close_all()
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from django.db import connections
+
+    from energy_api.utils import clients
+
+    # Nothing should be open after pre_fork; this covers connections opened
+    # by the master since. Each worker opens its own on first use.
+    connections.close_all()
+    # Pooled Razorpay/SendGrid sessions belong to the master's sockets.
+    clients.reset_after_fork()
+
+
+def worker_exit(server, worker):
+    # Write-behind history rows still buffered in this worker (HISTORY_WRITE_BEHIND).
+    from energy_api import drift, history_buffer
+
+    if not history_buffer.writer.close():
+        server.log.warning("History buffer not drained: %s rows pending", history_buffer.writer.pending())
+    # Drift counters observed since the last periodic flush (recycled by
+    # max_requests or shut down while idle).
+    drift.monitor.flush()
@@ -1,2 +1,3 @@
 #!/bin/bash
-gunicorn backend.wsgi:application --bind 0.0.0.0:$PORT
+cd "$(dirname "$0")"
+exec gunicorn --config gunicorn.conf.py
@@ -45,6 +45,15 @@ export function setAuthToken(token) {
   }
 }
 
+// Per-user copies of the history kept by lib/historySync.js
+export const HISTORY_CACHE_PREFIX = "historyCache_";
+
+export function clearHistoryCache() {
+  Object.keys(localStorage)
+    .filter((key) => key.startsWith(HISTORY_CACHE_PREFIX))
+    .forEach((key) => localStorage.removeItem(key));
+}
+
 export function clearAuthToken() {
   delete api.defaults.headers.common["Authorization"];
 
@@ -53,6 +62,7 @@ export function clearAuthToken() {
   localStorage.removeItem("username");
   localStorage.removeItem("isAdmin");
   localStorage.removeItem("postLoginRedirect");
+  clearHistoryCache();
 
   sessionStorage.clear();
 }
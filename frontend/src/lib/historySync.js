@@ -0,0 +1,53 @@
+// src/lib/historySync.js
+import { apiGet, HISTORY_CACHE_PREFIX } from "./api";
+
+// -----------------------------------------
+// HISTORY CACHE
+// A local copy of /history/ kept current through /history/changes/, so
+// repeat visits only download rows added, changed or hidden since the
+// last one. Cleared on logout by clearHistoryCache() in api.js.
+// -----------------------------------------
+function cacheKey() {
+  return `${HISTORY_CACHE_PREFIX}${localStorage.getItem("username") || ""}`;
+}
+
+function readCache() {
+  try {
+    return JSON.parse(localStorage.getItem(cacheKey()));
+  } catch {
+    return null;
+  }
+}
+
+// Whether a synced copy exists, i.e. syncHistory() only fetches a delta.
+export function hasHistoryCache() {
+  return Boolean(readCache()?.cursor);
+}
+
+// Returns the visible history, newest first (same items as /history/).
+export async function syncHistory() {
+  const cached = readCache();
+  const query = cached?.cursor ? `?since=${encodeURIComponent(cached.cursor)}` : "";
+  const res = await apiGet(`/history/changes/${query}`);
+
+  const byId = new Map(
+    res.reset || !cached ? [] : cached.history.map((item) => [item.id, item])
+  );
+  res.changes.forEach((item) => byId.set(item.id, item));
+  res.deleted.forEach((id) => byId.delete(id));
+
+  // Rows created before the last archive run's cutoff have moved to the
+  // archive (null: history was never archived).
+  const expired = res.expired_before ? new Date(res.expired_before) : null;
+  const history = [...byId.values()]
+    .filter((item) => !expired || new Date(item.date) >= expired)
+    .sort((a, b) => new Date(b.date) - new Date(a.date));
+
+  try {
+    localStorage.setItem(cacheKey(), JSON.stringify({ cursor: res.cursor, history }));
+  } catch {
+    // Storage full: drop the copy, the next visit does a full sync.
+    localStorage.removeItem(cacheKey());
+  }
+  return history;
+}
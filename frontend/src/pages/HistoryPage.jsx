@@ -1,6 +1,7 @@
 // src/pages/HistoryPage.jsx
 import React, { useEffect, useState } from "react";
-import { apiGet, apiDelete } from "../lib/api";
+import { apiDelete } from "../lib/api";
+import { syncHistory } from "../lib/historySync";
 import { 
     ArrowLeft, Zap, Ruler, Tally4, 
     Home, Package, Thermometer, Info 
@@ -260,8 +261,7 @@ export default function HistoryPage() {
 
   async function load() {
     try {
-      const res = await apiGet("/history/");
-      setHistory(res.history || []);
+      setHistory(await syncHistory());
       setSelectedItem(null);
     } catch (err) {
       console.error(err);
@@ -393,6 +393,17 @@ export default function HistoryPage() {
                                                 {fmt2(item.eui)}
                                             </p>
                                         </div>
+                                        {item.savings_kwh !== null && item.savings_kwh !== undefined && (
+                                            <div className="flex justify-between items-center bg-green-50 p-2 rounded-md">
+                                                <p className="text-gray-600 font-medium">
+                                                    <Zap className="inline-block h-4 w-4 mr-1 text-green-500" />
+                                                    Potential savings:
+                                                </p>
+                                                <p className="font-bold text-lg text-green-700">
+                                                    {fmt2(item.savings_kwh)} kWh ({fmt2(item.savings_percent)}%)
+                                                </p>
+                                            </div>
+                                        )}
                                     </div>
                                     
                                     <div className="mt-4 pt-3 border-t border-gray-100 flex justify-between items-center">
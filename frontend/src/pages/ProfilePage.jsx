@@ -1,6 +1,7 @@
 // src/pages/ProfilePage.jsx
 import React, { useEffect, useState } from "react";
 import { apiGet } from "../lib/api";
+import { hasHistoryCache, syncHistory } from "../lib/historySync";
 import { motion } from "framer-motion"; // Import motion for animation
 import { CheckCircle, XCircle } from "lucide-react"; // Import icons
 
@@ -32,11 +33,13 @@ export default function ProfilePage() {
   async function load() {
     try {
       const p = await apiGet("/profile/");
-      const h = await apiGet("/history/");
+      // Reuse the history page's synced copy when there is one; otherwise
+      // fetch just the rows shown instead of syncing the whole history.
+      const h = hasHistoryCache() ? await syncHistory() : (await apiGet("/history/?limit=5")).history;
       const sub = await apiGet("/subscription/"); // ✅ FIXED ROUTE
 
       setProfile(p);
-      setHistory(h.history.slice(0, 5));
+      setHistory(h.slice(0, 5));
       setSubscription(sub.subscription);
 
       // Save subscription for global use